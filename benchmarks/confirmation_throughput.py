@@ -0,0 +1,157 @@
+"""
+Confirmations per second when 1k/10k students go for one hot event.
+
+Runs against a live server plus direct access to its (scratch) PostgreSQL
+database, which it uses to seed bench-client-N students (kept between runs,
+removed with --cleanup) and to create the event:
+
+    python benchmarks/confirmation_throughput.py --base-url http://localhost:8000 \
+        --database-url postgresql://localhost/event_api_bench
+
+Access tokens are minted locally with event_api.auth, so the server must run
+with the same SECRET_KEY. For each size, every student posts one confirmation
+for a fresh event of --capacity seats, --concurrency requests at a time. It
+prints confirmations/sec, p50/p99 latency and the status breakdown (200
+confirmed or waitlisted, 409 full, 503 shed by the admission gate), then checks
+that the event's seat count matches its CONFIRMED rows. Standard library only,
+apart from the repo itself.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from event_api import crud, models, schemas
+from event_api.auth import create_access_token
+
+BENCH_PREFIX = "bench-client-"
+
+
+def seed_students(db, total: int):
+    have = db.execute(
+        select(func.count()).select_from(models.User).where(models.User.username.like(f"{BENCH_PREFIX}%"))
+    ).scalar()
+    if have < total:
+        db.execute(text(
+            "INSERT INTO users (id, username, email, full_name, hashed_password, role, is_active, created_at, updated_at) "
+            "SELECT gen_random_uuid(), :prefix || n, :prefix || n || '@example.com', NULL, 'x', 'STUDENT', true, now(), now() "
+            "FROM generate_series(:start, :stop) AS n"
+        ), {"prefix": BENCH_PREFIX, "start": have + 1, "stop": total})
+        db.commit()
+    return db.execute(
+        select(models.User.id, models.User.email)
+        .where(models.User.username.like(f"{BENCH_PREFIX}%"))
+        .order_by(models.User.id)
+        .limit(total)
+    ).all()
+
+
+def _token(student) -> str:
+    return create_access_token(
+        data={"sub": student.email, "user_id": str(student.id), "user_role": models.RoleEnum.STUDENT.value},
+        expires_delta=timedelta(hours=1)
+    )
+
+
+def _confirm(url, event_id, token):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"event_id": event_id, "note": None}).encode("utf-8"),
+        method="POST",
+        headers={"Content-Type": "application/json", "Authorization": "Bearer " + token},
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return status, (time.perf_counter() - started) * 1000
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(db, args, size: int) -> None:
+    students = seed_students(db, size)
+    tokens = [_token(student) for student in students]
+    event = crud.create_event(
+        db,
+        schemas.EventCreate(
+            title=f"Confirmation benchmark {size} {datetime.utcnow().isoformat()}",
+            description=None,
+            location=None,
+            department=None,
+            start_time=datetime.utcnow() + timedelta(days=30),
+            end_time=None,
+            capacity=args.capacity,
+            is_public=True,
+        ),
+        creator_id=None,
+        creator_role=models.RoleEnum.ADMIN,
+    )
+    url = args.base_url + "/student/event_confirmations/"
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda token: _confirm(url, str(event.id), token), tokens))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = [latency for _, latency in results]
+    db.expire_all()
+    count = db.execute(select(models.Event.confirmation_count).where(models.Event.id == event.id)).scalar()
+    confirmed = db.execute(
+        select(func.count()).select_from(models.EventConfirmation).where(
+            models.EventConfirmation.event_id == event.id,
+            models.EventConfirmation.status == models.ConfirmationStatusEnum.CONFIRMED
+        )
+    ).scalar()
+    print(
+        f"{size:>6} clients: {statuses.get(200, 0) / elapsed:8.1f} confirmations/s, "
+        f"p50={statistics.median(latencies):.1f}ms p99={_percentile(latencies, 0.99):.1f}ms | "
+        f"statuses {dict(sorted(statuses.items()))} | seats {count}/{args.capacity}, "
+        f"{'consistent' if count == confirmed else f'DRIFT: {confirmed} confirmed rows'}"
+    )
+
+
+def cleanup(db) -> None:
+    db.execute(delete(models.Event).where(models.Event.title.like("Confirmation benchmark %")))
+    db.execute(delete(models.User).where(models.User.username.like(f"{BENCH_PREFIX}%")))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", required=True, help="The server's scratch database; never point this at production")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--capacity", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--cleanup", action="store_true", help="Remove the benchmark users and events and exit")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        if args.cleanup:
+            cleanup(db)
+            return
+        for size in sorted(int(value) for value in args.sizes.split(",")):
+            run(db, args, size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
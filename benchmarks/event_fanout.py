@@ -0,0 +1,112 @@
+"""
+Cost of notifying every student about a new event, at 10k/100k/1M students.
+
+Runs against a scratch PostgreSQL database; it creates the schema there and
+adds bench-student-N users (kept between runs, removed with --cleanup):
+
+    python benchmarks/event_fanout.py --database-url postgresql://localhost/event_api_bench
+
+For each size it creates an event, then times the student fan-out
+(crud.send_event_notifications_to_students, what the outbox worker runs) and
+records its peak Python allocation with tracemalloc. It also times the read
+side a student pays for it: the unread count and the first feed page. Fan-out
+time and memory should stay flat as the student count grows.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from event_api import crud, models, schemas
+
+BENCH_PREFIX = "bench-student-"
+
+
+def seed_students(db, total: int) -> None:
+    have = db.execute(
+        select(func.count()).select_from(models.User).where(models.User.username.like(f"{BENCH_PREFIX}%"))
+    ).scalar()
+    if have >= total:
+        return
+    # Server-side, so seeding 1M users does not go through the ORM either
+    db.execute(text(
+        "INSERT INTO users (id, username, email, full_name, hashed_password, role, is_active, created_at, updated_at) "
+        "SELECT gen_random_uuid(), :prefix || n, :prefix || n || '@example.com', NULL, 'x', 'STUDENT', true, now(), now() "
+        "FROM generate_series(:start, :stop) AS n"
+    ), {"prefix": BENCH_PREFIX, "start": have + 1, "stop": total})
+    db.commit()
+
+
+def timed(fn, *args, **kwargs):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(db, size: int) -> None:
+    seed_students(db, size)
+    event = crud.create_event(
+        db,
+        schemas.EventCreate(
+            title=f"Fan-out benchmark {size} {datetime.utcnow().isoformat()}",
+            description=None,
+            location=None,
+            department=None,
+            start_time=datetime.utcnow() + timedelta(days=30),
+            end_time=None,
+            capacity=None,
+            is_public=True,
+        ),
+        creator_id=None,
+        creator_role=models.RoleEnum.ADMIN,
+    )
+    _, fanout_ms, fanout_peak = timed(
+        crud.send_event_notifications_to_students, db, event_id=event.id, title=event.title, description="Benchmark"
+    )
+    student = db.execute(
+        select(models.User).where(models.User.username == f"{BENCH_PREFIX}1")
+    ).scalar_one()
+    unread, unread_ms, _ = timed(crud.count_unread_notifications, db, student)
+    _, feed_ms, _ = timed(crud.get_notification_feed, db, student, limit=20)
+    print(
+        f"{size:>9} students: fan-out {fanout_ms:8.1f} ms, peak {fanout_peak / 1024:8.1f} KiB | "
+        f"unread count {unread_ms:6.1f} ms ({unread}), first feed page {feed_ms:6.1f} ms"
+    )
+
+
+def cleanup(db) -> None:
+    db.execute(delete(models.BroadcastNotification).where(models.BroadcastNotification.body == "Benchmark"))
+    db.execute(delete(models.Event).where(models.Event.title.like("Fan-out benchmark %")))
+    db.execute(delete(models.User).where(models.User.username.like(f"{BENCH_PREFIX}%")))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="Scratch database; never point this at production")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--cleanup", action="store_true", help="Remove the benchmark users, events and broadcasts and exit")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if args.cleanup:
+            cleanup(db)
+            return
+        for size in sorted(int(value) for value in args.sizes.split(",")):
+            run(db, size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
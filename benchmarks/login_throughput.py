@@ -0,0 +1,100 @@
+"""
+Latency of unrelated routes while logins saturate the bcrypt pool.
+
+Runs against a live server, e.g. one started with
+`uvicorn event_api.main:app --workers 1` and seeded by event_api.initial_data:
+
+    python benchmarks/login_throughput.py --base-url http://localhost:8000 --duration 30
+
+It measures a probe route (GET /student/events/ by default) twice: first on
+its own, then while --login-concurrency clients post to /login in a loop.
+For each phase it prints the probe's p50/p99 latency, plus login throughput
+and the share of logins shed with 503. With the hashing pool working as
+intended, the probe latency under load stays close to the baseline.
+Standard library only.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def _request(method, url, body=None, headers=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json", **(headers or {})})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.read()
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _probe(url, headers, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        _request("GET", url, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def _login_loop(url, credentials, stop, outcomes, lock):
+    while not stop.is_set():
+        status, _ = _request("POST", url, body=credentials)
+        with lock:
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+
+def run_phase(args, headers, login_clients):
+    stop = threading.Event()
+    latencies, outcomes, lock = [], {}, threading.Lock()
+    credentials = {"email": args.email, "password": args.password}
+    threads = [threading.Thread(target=_probe, args=(args.base_url + args.probe_path, headers, stop, latencies))]
+    threads += [
+        threading.Thread(target=_login_loop, args=(args.base_url + "/login", credentials, stop, outcomes, lock))
+        for _ in range(login_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes
+
+
+def report(name, latencies, outcomes, duration):
+    line = f"{name:>10}: probe p50={statistics.median(latencies):.1f}ms p99={_percentile(latencies, 0.99):.1f}ms n={len(latencies)}"
+    if outcomes:
+        total = sum(outcomes.values())
+        line += f" | logins {outcomes.get(200, 0) / duration:.1f}/s ok, {outcomes.get(503, 0) / total:.1%} shed (503)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="student@example.com")
+    parser.add_argument("--password", default="studentpass")
+    parser.add_argument("--probe-path", default="/student/events/")
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    status, body = _request("POST", args.base_url + "/login", body={"email": args.email, "password": args.password})
+    if status != 200:
+        raise SystemExit(f"Login failed ({status}): {body[:200]!r}")
+    headers = {"Authorization": "Bearer " + json.loads(body)["access_token"]}
+
+    report("baseline", *run_phase(args, headers, 0), args.duration)
+    report("saturated", *run_phase(args, headers, args.login_concurrency), args.duration)
+
+
+if __name__ == "__main__":
+    main()
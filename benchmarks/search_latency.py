@@ -0,0 +1,118 @@
+"""
+Search latency at 1M events, checked against the 20 ms target.
+
+Runs against a scratch PostgreSQL database; it creates the schema there and
+adds "Search benchmark" events plus a bench-search-student user (kept between
+runs, removed with --cleanup):
+
+    python benchmarks/search_latency.py --database-url postgresql://localhost/event_api_bench
+
+It times crud.search as a student (public events plus their confirmations)
+for a few queries, first page and the page after following the rank cursor
+--depth times, and prints p50/p99 per query. The exit status is 1 when any
+p99 is above --target-ms, so the run can gate a release.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, delete, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from event_api import crud, models
+from event_api.pagination import decode_cursor, encode_cursor
+
+BENCH_TITLE = "Search benchmark"
+BENCH_STUDENT = "bench-search-student"
+WORDS = ["robotics", "painting", "chess", "finance", "biology", "poetry", "startup", "hiking", "jazz", "chemistry"]
+QUERIES = ["robotics", "jazz poetry", "startup -finance", '"machine learning"']
+
+
+def seed(db, total: int):
+    have = db.execute(
+        select(func.count()).select_from(models.Event).where(models.Event.title.like(f"{BENCH_TITLE}%"))
+    ).scalar()
+    if have < total:
+        # Server-side; search_vector is generated by PostgreSQL on insert
+        db.execute(text(
+            "INSERT INTO events (id, title, description, department, start_time, is_public, creator_role, "
+            "confirmation_count, created_at, updated_at) "
+            "SELECT gen_random_uuid(), :title || ' ' || n || ' ' || (:words)[1 + n % 10], "
+            "'About ' || (:words)[1 + (n / 10) % 10] || CASE WHEN n % 97 = 0 THEN ' machine learning' ELSE '' END, "
+            "'Dept ' || n % 50, now() + n * interval '1 minute', n % 3 <> 0, 'HEAD', 0, now(), now() "
+            "FROM generate_series(:start, :stop) AS n"
+        ), {"title": BENCH_TITLE, "words": WORDS, "start": have + 1, "stop": total})
+        db.commit()
+        db.execute(text("ANALYZE events"))
+        db.commit()
+    student = db.execute(select(models.User).where(models.User.username == BENCH_STUDENT)).scalar_one_or_none()
+    if student is None:
+        student = models.User(username=BENCH_STUDENT, email=f"{BENCH_STUDENT}@example.com", hashed_password="x", role=models.RoleEnum.STUDENT)
+        db.add(student)
+        db.commit()
+    return student
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(db, student, q: str, depth: int, runs: int, limit: int):
+    first, deep = [], []
+    for _ in range(runs):
+        cursor = None
+        for page_number in range(depth + 1):
+            started = time.perf_counter()
+            page = crud.search(db, user=student, q=q, limit=limit, cursor=cursor)
+            elapsed = (time.perf_counter() - started) * 1000
+            (first if page_number == 0 else deep).append(elapsed)
+            if len(page) < limit:
+                break
+            cursor = decode_cursor(encode_cursor(page[-1].rank, page[-1].id))
+    return first, deep
+
+
+def cleanup(db) -> None:
+    db.execute(delete(models.Event).where(models.Event.title.like(f"{BENCH_TITLE}%")))
+    db.execute(delete(models.User).where(models.User.username == BENCH_STUDENT))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="Scratch database; never point this at production")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=5, help="Cursor pages to follow after the first")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    parser.add_argument("--cleanup", action="store_true", help="Remove the benchmark events and user and exit")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if args.cleanup:
+            cleanup(db)
+            return
+        student = seed(db, args.rows)
+        within_target = True
+        for q in QUERIES:
+            first, deep = measure(db, student, q, args.depth, args.runs, args.limit)
+            worst = max(_percentile(first, 0.99), _percentile(deep, 0.99) if deep else 0)
+            within_target &= worst <= args.target_ms
+            line = f"{q!r:>22}: first page p50={statistics.median(first):.1f}ms p99={_percentile(first, 0.99):.1f}ms"
+            if deep:
+                line += f" | cursor pages p50={statistics.median(deep):.1f}ms p99={_percentile(deep, 0.99):.1f}ms"
+            print(line + ("" if worst <= args.target_ms else f"  (over {args.target_ms:g} ms)"))
+    finally:
+        db.close()
+    if not within_target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from fastapi import HTTPException, status
+
+from event_api.cache import LRUCache
+
+# Requests past capacity join the waitlist (PENDING) instead of getting 409
+WAITLIST_ENABLED = os.getenv("WAITLIST_ENABLED", "true").lower() == "true"
+
+# Per-process admission control for confirmations of a single event
+ADMISSION_MAX_INFLIGHT_PER_EVENT = int(os.getenv("ADMISSION_MAX_INFLIGHT_PER_EVENT", "8"))
+ADMISSION_FULL_TTL_SECONDS = float(os.getenv("ADMISSION_FULL_TTL_SECONDS", "5"))
+
+
+class AdmissionGate:
+    """
+    Bounds how many confirmations of one event a worker sends to the database
+    at once. Every seat reservation locks the same events row, so a burst on a
+    hot event otherwise parks one pooled connection per request on that lock.
+    Requests past the bound get a 503 straight away: the routes run on the
+    threadpool, and waiting for a slot there would hold a thread per request
+    just the same.
+
+    Without a waitlist, events seen full are also remembered for a few seconds
+    so further attempts are rejected without a round trip.
+    """
+
+    def __init__(self, max_inflight: int, full_ttl: float):
+        self.max_inflight = max_inflight
+        self.admitted = 0
+        self.rejected = 0
+        # event id -> confirmations of it currently in flight
+        self._inflight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._full_events = LRUCache(maxsize=10000, ttl=full_ttl)
+
+    @contextmanager
+    def admit(self, event_id):
+        key = str(event_id)
+        with self._lock:
+            inflight = self._inflight.get(key, 0)
+            if inflight >= self.max_inflight:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many confirmations for this event right now, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._inflight[key] = inflight + 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._inflight[key] == 1:
+                    del self._inflight[key]
+                else:
+                    self._inflight[key] -= 1
+
+    def is_full(self, event_id) -> bool:
+        return self._full_events.get(str(event_id), False)
+
+    def mark_full(self, event_id) -> None:
+        self._full_events.set(str(event_id), True)
+
+    def mark_available(self, event_id) -> None:
+        self._full_events.delete(str(event_id))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_inflight_per_event": self.max_inflight,
+                "active_events": len(self._inflight),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+admission_gate = AdmissionGate(ADMISSION_MAX_INFLIGHT_PER_EVENT, ADMISSION_FULL_TTL_SECONDS)
@@ -1,3 +1,9 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -9,11 +15,13 @@ from fastapi.security import OAuth2PasswordBearer
 
 from event_api.models import User, RoleEnum
 from event_api.schemas import UserRead
+from event_api.cache import get_cached_user, cache_user
 
 # Configuration for JWT
 SECRET_KEY = "your-secret-key" # In a real app, use environment variables
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -24,6 +32,74 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt is CPU bound, so it runs in a dedicated process pool instead of the
+# request threadpool. Work beyond HASH_WORKERS + HASH_QUEUE_LIMIT is rejected.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.pending += 1
+            executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args):
+        """
+        Await fn(*args) in the hashing pool without holding a threadpool slot.
+        Handlers that hash are async for this reason and run their database
+        work with run_in_threadpool.
+        """
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+password_hasher = PasswordHasher(workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,6 +110,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token():
+    """
+    Returns (token, token_hash). Only the hash is stored; refresh tokens are
+    high-entropy random strings, so a plain sha256 is enough for lookup.
+    """
+    token = secrets.token_urlsafe(48)
+    return token, hash_refresh_token(token)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -64,7 +151,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    # Serve the user from the per-worker cache to skip a database round trip
+    cached_user = get_cached_user(user_id)
+    if cached_user is not None:
+        return cached_user
+
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
@@ -72,7 +164,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    return cache_user(user)
 
 def get_current_admin_user(current_user: UserRead = Depends(get_current_user)):
     if current_user.role != RoleEnum.ADMIN:
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from event_api.schemas import UserRead
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU cache with an optional per-entry TTL.
+    Each worker process keeps its own instance.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# ---------- Authenticated user cache ----------
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+def get_cached_user(user_id) -> Optional[UserRead]:
+    return user_cache.get(str(user_id))
+
+def cache_user(user) -> UserRead:
+    cached = UserRead.model_validate(user)
+    user_cache.set(str(cached.id), cached)
+    return cached
+
+def invalidate_cached_user(user_id) -> None:
+    user_cache.delete(str(user_id))
+
+
+# ---------- Head dashboard cache ----------
+# Figures may lag writes by up to the TTL; 0 disables the cache
+HEAD_DASHBOARD_CACHE_SIZE = int(os.getenv("HEAD_DASHBOARD_CACHE_SIZE", "1000"))
+HEAD_DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("HEAD_DASHBOARD_CACHE_TTL_SECONDS", "30"))
+
+# Department -> HeadDashboardData
+head_dashboard_cache = LRUCache(maxsize=HEAD_DASHBOARD_CACHE_SIZE, ttl=HEAD_DASHBOARD_CACHE_TTL_SECONDS)
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import func
+
+# Clients may keep responses but must revalidate them before reuse
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    fingerprint = ":".join(str(part) for part in parts)
+    return '"' + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _modified_since(request: Request, last_modified: datetime) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return True
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds; stored datetimes are naive UTC
+    return last_modified.replace(microsecond=0, tzinfo=timezone.utc) > since
+
+def not_modified(request: Request, response: Response, etag: str, last_modified: Optional[datetime]) -> Optional[Response]:
+    """
+    Set the validators on the response, and return a 304 to send instead when
+    the client's copy is current. If-None-Match takes precedence over
+    If-Modified-Since.
+    """
+    headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    response.headers.update(headers)
+    if request.headers.get("if-none-match"):
+        current = etag_matches(request, etag)
+    else:
+        current = last_modified is not None and "if-modified-since" in request.headers and not _modified_since(request, last_modified)
+    if current:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+def resource_not_modified(request: Request, response: Response, resource) -> Optional[Response]:
+    """Conditional GET for one row; the validators come from its updated_at."""
+    return not_modified(
+        request, response,
+        make_etag(type(resource).__name__, resource.id, resource.updated_at.isoformat()),
+        resource.updated_at
+    )
+
+def listing_not_modified(request: Request, response: Response, query, updated_column, *scope) -> Optional[Response]:
+    """
+    Conditional GET for a listing, checked before any row is loaded. The
+    ETag comes from count and max(updated_at) over the unpaginated query, so
+    inserts, updates and deletes in scope all change it. `scope` names whatever
+    else the filter depends on (department, user), and the query string selects
+    the page. No Last-Modified: a delete does not move max(updated_at).
+    """
+    count, latest = query.with_entities(func.count(), func.max(updated_column)).order_by(None).one()
+    etag = make_etag(request.url.path, request.url.query, *scope, count, latest.isoformat() if latest else None)
+    return not_modified(request, response, etag, None)
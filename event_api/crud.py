@@ -1,22 +1,41 @@
-from sqlalchemy.orm import Session
-from uuid import UUID
+from sqlalchemy import and_, cast, delete, exists, func, literal, or_, select, true, tuple_, union, union_all, update
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from uuid import UUID, uuid4
+from collections import Counter
 from datetime import datetime
 
-from event_api import models, schemas
-from typing import Optional # Import Optional
+from event_api import models, recurrence, schemas
+from event_api.cache import invalidate_cached_user
+from event_api.pagination import paginate
+from event_api.response_cache import invalidate_responses
+from typing import List, NamedTuple, Optional, Tuple # Import Optional
 
 # --- User CRUD ---
 def get_user(db: Session, user_id: UUID):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+def rotate_feed_nonce(db: Session, user_id: UUID) -> int:
+    """Revoke the user's calendar feed URLs. Returns the new nonce."""
+    nonce = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(feed_nonce=models.User.feed_nonce + 1)
+        .returning(models.User.feed_nonce)
+    ).scalar()
+    db.commit()
+    return nonce
+
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.User)
+    return paginate(query, models.User.created_at, models.User.id, skip, limit, cursor).all()
 
 def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     db_user = models.User(
@@ -38,8 +57,11 @@ def update_user(db: Session, db_user: models.User, user_update: schemas.UserCrea
             db_user.hashed_password = hashed_password if hashed_password else db_user.hashed_password
         else:
             setattr(db_user, key, value)
+    if hashed_password:
+        revoke_refresh_tokens_for_user(db, user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
+    invalidate_cached_user(db_user.id)
     return db_user
 
 def delete_user(db: Session, user_id: UUID):
@@ -47,46 +69,506 @@ def delete_user(db: Session, user_id: UUID):
     if db_user:
         db.delete(db_user)
         db.commit()
+        # The database nulls creator_id/posted_by_id in cached listings
+        invalidate_responses("events")
+        invalidate_responses("opportunities")
+        invalidate_cached_user(user_id)
     return db_user
 
+# --- RefreshToken CRUD ---
+def create_refresh_token(db: Session, user_id: UUID, token_hash: str, expires_at: datetime):
+    db_token = models.RefreshToken(user_id=user_id, token_hash=token_hash, expires_at=expires_at)
+    db.add(db_token)
+    db.commit()
+    return db_token
+
+def rotate_refresh_token(db: Session, token_hash: str, new_token_hash: str, new_expires_at: datetime):
+    """
+    Revoke a live refresh token and store its replacement in one transaction.
+    Returns the owning user_id, or None if the token is unknown, expired or revoked.
+    Presenting an already rotated token revokes every token of that user.
+    """
+    now = datetime.utcnow()
+    user_id = db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.revoked_at.is_(None),
+            models.RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(models.RefreshToken.user_id)
+    ).scalar()
+    if user_id is None:
+        reused = db.query(models.RefreshToken.user_id).filter(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.revoked_at.isnot(None),
+        ).first()
+        if reused:
+            revoke_refresh_tokens_for_user(db, user_id=reused.user_id)
+            db.commit()
+        return None
+    db.add(models.RefreshToken(user_id=user_id, token_hash=new_token_hash, expires_at=new_expires_at))
+    db.commit()
+    return user_id
+
+def revoke_refresh_tokens_for_user(db: Session, user_id: UUID):
+    """Revoke all live refresh tokens of a user. The caller commits."""
+    return db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.user_id == user_id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    ).rowcount
+
 # --- Event CRUD ---
 def get_event(db: Session, event_id: UUID):
     return db.query(models.Event).filter(models.Event.id == event_id).first()
 
-def get_events(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Event).offset(skip).limit(limit).all()
+# Columns served by the calendar_view endpoints (schemas.EventCalendarRead)
+CALENDAR_COLUMNS = (
+    models.Event.id,
+    models.Event.title,
+    models.Event.start_time,
+    models.Event.end_time,
+    models.Event.location,
+    models.Event.department,
+)
+
+class CalendarEntry(NamedTuple):
+    id: UUID
+    title: str
+    start_time: datetime
+    end_time: Optional[datetime]
+    location: Optional[str]
+    department: Optional[str]
+    occurrence_start: Optional[datetime] = None
+    is_recurring: bool = False
+
+def _occurrence_entry(series, occurrence: datetime, override=None) -> Optional[CalendarEntry]:
+    duration = series.end_time - series.start_time if series.end_time else None
+    entry = CalendarEntry(
+        series.id, series.title, occurrence, occurrence + duration if duration else None,
+        series.location, series.department, occurrence, True
+    )
+    if override is None:
+        return entry
+    if override.cancelled:
+        return None
+    start = override.start_time or occurrence
+    return entry._replace(
+        title=override.title or entry.title,
+        location=override.location or entry.location,
+        start_time=start,
+        end_time=override.end_time or (start + duration if duration else None)
+    )
+
+def _series_occurrences(series, overrides: dict, start_time: datetime, end_time: datetime, cursor, count: int):
+    """Up to `count` occurrences of one series in the window and past the cursor, with overrides applied."""
+    rule = recurrence.parse_rule(series.rule)
+    entries = []
+    for occurrence in recurrence.occurrences(rule, series.start_time, start_time, end_time):
+        entry = _occurrence_entry(series, occurrence, overrides.get((series.id, occurrence)))
+        if entry is None or not start_time <= entry.start_time <= end_time:
+            continue
+        if cursor is not None and (entry.start_time, entry.id) <= cursor:
+            continue
+        entries.append(entry)
+        if len(entries) >= count:
+            break
+    return entries
+
+def student_visible_events(student_id: UUID):
+    """
+    Events a student sees, as alternatives for calendar_entries: public ones
+    (ix_events_public_start) and ones they have a confirmation for
+    (ix_event_confirmations_student). Kept apart because an OR of the two
+    cannot use either index.
+    """
+    return (
+        models.Event.is_public == True,
+        exists().where(
+            models.EventConfirmation.event_id == models.Event.id,
+            models.EventConfirmation.student_id == student_id
+        ),
+    )
+
+def _series_query(db: Session):
+    return db.query(*CALENDAR_COLUMNS, models.EventRecurrence.rule).join(
+        models.EventRecurrence, models.EventRecurrence.event_id == models.Event.id
+    )
+
+def _calendar_events_statement(start_time: datetime, end_time: datetime, alternatives, wanted: int, cursor):
+    """First `wanted` plain (non-recurring) events in the window past the cursor, in (start_time, id) order."""
+    is_series = exists().where(models.EventRecurrence.event_id == models.Event.id)
+    branches = [
+        paginate(
+            select(*CALENDAR_COLUMNS).where(
+                models.Event.start_time >= start_time,
+                models.Event.start_time <= end_time,
+                alternative,
+                ~is_series
+            ),
+            models.Event.start_time, models.Event.id, 0, wanted, cursor, descending=False
+        )
+        for alternative in alternatives
+    ]
+    if len(branches) == 1:
+        return branches[0]
+    # Each branch is wrapped so its ORDER BY ... LIMIT stays inside it
+    combined = union(*(select(branch.subquery()) for branch in branches)).subquery("visible_events")
+    return select(combined).order_by(combined.c.start_time, combined.c.id).limit(wanted)
+
+def calendar_entries(db: Session, start_time: datetime, end_time: datetime, visible, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    """
+    One chronological page of the calendar window for events matching `visible`.
+    Plain events come from the (start_time, id) indexes; a recurring event is one
+    row whose occurrences are expanded here, inside the window only, and never
+    stored. Moved and cancelled occurrences follow their overrides.
+
+    `visible` is a filter, or a tuple of filters meaning any of them: each is
+    then its own top-N range scan and the plain events are combined with UNION.
+    """
+    start_time, end_time = recurrence.to_naive_utc(start_time), recurrence.to_naive_utc(end_time)
+    if cursor is not None:
+        cursor = (recurrence.to_naive_utc(cursor[0]), cursor[1])
+    wanted = limit if cursor is not None else skip + limit
+    alternatives = visible if isinstance(visible, tuple) else (visible,)
+    visible = or_(*alternatives)
+    entries = [CalendarEntry(*row) for row in db.execute(
+        _calendar_events_statement(start_time, end_time, alternatives, wanted, cursor)
+    )]
+
+    series_rows = _series_query(db).filter(
+        visible,
+        models.Event.start_time <= end_time,
+        # A range on ix_event_recurrences_until: every series ends, at the horizon at the latest
+        models.EventRecurrence.until >= start_time
+    ).all()
+    if series_rows:
+        overrides = {
+            (override.event_id, override.occurrence_start): override
+            for override in db.query(models.EventOccurrenceOverride).filter(
+                models.EventOccurrenceOverride.event_id.in_([series.id for series in series_rows]),
+                models.EventOccurrenceOverride.occurrence_start >= start_time,
+                models.EventOccurrenceOverride.occurrence_start <= end_time
+            )
+        }
+        for series in series_rows:
+            entries.extend(_series_occurrences(series, overrides, start_time, end_time, cursor, wanted))
+
+    # Occurrences moved into the window from outside it
+    moved = db.query(models.EventOccurrenceOverride).join(
+        models.Event, models.Event.id == models.EventOccurrenceOverride.event_id
+    ).filter(
+        visible,
+        models.EventOccurrenceOverride.cancelled == False,
+        models.EventOccurrenceOverride.start_time >= start_time,
+        models.EventOccurrenceOverride.start_time <= end_time,
+        or_(models.EventOccurrenceOverride.occurrence_start < start_time, models.EventOccurrenceOverride.occurrence_start > end_time)
+    ).all()
+    if moved:
+        moved_series = {series.id: series for series in _series_query(db).filter(
+            models.Event.id.in_({override.event_id for override in moved})
+        )}
+        for override in moved:
+            series = moved_series.get(override.event_id)
+            if series is None or not recurrence.is_occurrence(recurrence.parse_rule(series.rule), series.start_time, override.occurrence_start):
+                continue
+            entry = _occurrence_entry(series, override.occurrence_start, override)
+            if cursor is None or (entry.start_time, entry.id) > cursor:
+                entries.append(entry)
+
+    entries.sort(key=lambda entry: (entry.start_time, entry.id))
+    return entries[0 if cursor is not None else skip:][:limit]
+
+def feed_scope(since: datetime, department: Optional[str] = None, student_id: Optional[UUID] = None):
+    """
+    Events in a calendar feed: a department's events, or a student's public and
+    confirmed events. Plain events from `since` on, series still running then.
+
+    Each combination of audience and period is its own index scan and the event
+    ids are combined with UNION; an OR across them would scan every event on
+    each poll.
+    """
+    if department is not None:
+        audiences = (models.Event.department == department,)
+    else:
+        audiences = (
+            models.Event.is_public == True,
+            exists().where(
+                models.EventConfirmation.event_id == models.Event.id,
+                models.EventConfirmation.student_id == student_id,
+                models.EventConfirmation.status == models.ConfirmationStatusEnum.CONFIRMED
+            ),
+        )
+    periods = (
+        models.Event.start_time >= since,
+        exists().where(
+            models.EventRecurrence.event_id == models.Event.id,
+            models.EventRecurrence.until >= since
+        ),
+    )
+    return models.Event.id.in_(union(*(
+        select(models.Event.id).where(audience, period) for audience in audiences for period in periods
+    )))
+
+def feed_version(db: Session, scope, student_id: Optional[UUID] = None):
+    """
+    Cheap fingerprint of a feed's inputs, answered from indexes in one round
+    trip: event count and latest change, latest occurrence override and, for a
+    student feed, the latest confirmation change.
+    """
+    latest_override = select(func.max(models.EventOccurrenceOverride.updated_at)).join(
+        models.Event, models.Event.id == models.EventOccurrenceOverride.event_id
+    ).where(scope).scalar_subquery()
+    columns = [func.count(models.Event.id), func.max(models.Event.updated_at), latest_override]
+    if student_id is not None:
+        columns.append(
+            select(func.max(models.EventConfirmation.updated_at))
+            .where(models.EventConfirmation.student_id == student_id)
+            .scalar_subquery()
+        )
+    return tuple(db.execute(select(*columns).where(scope)).one())
+
+def feed_events(db: Session, scope, since: datetime):
+    """The feed's events in start order, and the overrides of its series keyed by event id."""
+    events = db.query(models.Event).filter(scope).order_by(models.Event.start_time, models.Event.id).all()
+    series_ids = [event.id for event in events if event.recurrence is not None]
+    overrides = {}
+    if series_ids:
+        for override in db.query(models.EventOccurrenceOverride).filter(
+            models.EventOccurrenceOverride.event_id.in_(series_ids),
+            models.EventOccurrenceOverride.occurrence_start >= since
+        ).order_by(models.EventOccurrenceOverride.occurrence_start):
+            overrides.setdefault(override.event_id, []).append(override)
+    return events, overrides
+
+def get_events(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.Event)
+    return paginate(query, models.Event.created_at, models.Event.id, skip, limit, cursor).all()
+
+def _naive_times(values: dict) -> dict:
+    """Event and override times are stored as naive UTC."""
+    for key in ("start_time", "end_time"):
+        if key in values:
+            values[key] = recurrence.to_naive_utc(values[key])
+    return values
+
+def _set_recurrence(db_event: models.Event, rule: Optional[str]):
+    if rule != db_event.recurrence_rule:
+        # The rule is part of the event's representation and ETag
+        db_event.updated_at = datetime.utcnow()
+    if rule is None:
+        db_event.recurrence = None
+        return
+    until = recurrence.series_end(recurrence.parse_rule(rule), db_event.start_time)
+    if db_event.recurrence is None:
+        db_event.recurrence = models.EventRecurrence(rule=rule, until=until)
+    else:
+        db_event.recurrence.rule = rule
+        db_event.recurrence.until = until
+
+class DuplicateEventError(Exception):
+    def __init__(self, duplicates: List[Tuple[str, datetime]]):
+        super().__init__("Duplicate events")
+        self.duplicates = duplicates
+
+def _existing_events(db: Session, keys) -> List[Tuple[str, datetime]]:
+    """The (title, start_time) keys already taken by live events; deleted ones do not hold uq_event_title_start."""
+    return [tuple(row) for row in db.query(models.Event.title, models.Event.start_time).filter(
+        tuple_(models.Event.title, models.Event.start_time).in_(set(keys))
+    ).all()]
+
+def _duplicate_error(db: Session, error: IntegrityError, keys) -> Exception:
+    """
+    After a rolled-back write that hit a unique violation: the DuplicateEventError
+    to raise when it was uq_event_title_start (a concurrent create took the title),
+    otherwise the original error.
+    """
+    duplicates = _existing_events(db, keys)
+    return DuplicateEventError(duplicates) if duplicates else error
 
-def create_event(db: Session, event: schemas.EventCreate, creator_id: UUID, creator_role: models.RoleEnum):
+def create_event(db: Session, event: schemas.EventCreate, creator_id: UUID, creator_role: models.RoleEnum, notification_body: Optional[str] = None):
+    """
+    Create one event. A title already taken at the same start time by a live
+    event raises DuplicateEventError.
+    """
+    # A recurring event is a single row, so students are notified once per series
+    values = _naive_times(event.dict())
+    rule = values.pop("recurrence_rule", None)
     db_event = models.Event(
-        **event.dict(),
+        **values,
         creator_id=creator_id,
         creator_role=creator_role
     )
+    if rule is not None:
+        _set_recurrence(db_event, rule)
     db.add(db_event)
-    db.commit()
+    try:
+        if notification_body is not None:
+            # Queue the student fan-out in the same transaction; the outbox worker sends it
+            db.flush()
+            enqueue_event_notification(db, event_id=db_event.id, title=db_event.title, body=notification_body)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _duplicate_error(db, e, [(values["title"], values["start_time"])])
+    invalidate_responses("events")
     db.refresh(db_event)
     return db_event
 
+# Titles listed in a batch announcement before it says "and N more"
+BATCH_NOTIFICATION_TITLES = 20
+
+def create_events(db: Session, events: List[schemas.EventCreate], creator_id: UUID, creator_role: models.RoleEnum, notification_body: Optional[str] = None):
+    """
+    Create a batch of events in one transaction: one multi-row INSERT for the
+    events and one for their recurrence rules, and a single outbox record, so
+    students get one combined announcement. Titles already taken at the same
+    start time (uq_event_title_start), in the batch or by a live event, raise
+    DuplicateEventError before anything is written.
+    """
+    keys = [(event.title, recurrence.to_naive_utc(event.start_time)) for event in events]
+    duplicates = sorted(key for key, count in Counter(keys).items() if count > 1)
+    duplicates += _existing_events(db, keys)
+    if duplicates:
+        raise DuplicateEventError(duplicates)
+
+    now = datetime.utcnow()
+    rows, recurrences = [], []
+    for event in events:
+        values = _naive_times(event.dict())
+        rule = values.pop("recurrence_rule", None)
+        row = {**values, "id": uuid4(), "creator_id": creator_id, "creator_role": creator_role,
+               "confirmation_count": 0, "created_at": now, "updated_at": now}
+        if row["is_public"] is None:
+            row["is_public"] = True
+        rows.append(row)
+        if rule is not None:
+            until = recurrence.series_end(recurrence.parse_rule(rule), row["start_time"])
+            recurrences.append({"event_id": row["id"], "rule": rule, "until": until})
+    try:
+        db.execute(models.Event.__table__.insert().values(rows))
+        if recurrences:
+            db.execute(models.EventRecurrence.__table__.insert().values(recurrences))
+        if notification_body is not None:
+            titles = [row["title"] for row in sorted(rows, key=lambda row: row["start_time"])]
+            listed = "\n".join(titles[:BATCH_NOTIFICATION_TITLES])
+            if len(titles) > BATCH_NOTIFICATION_TITLES:
+                listed += f"\n...and {len(titles) - BATCH_NOTIFICATION_TITLES} more"
+            enqueue_event_notification(
+                db,
+                event_id=rows[0]["id"],
+                title=(titles[0] if len(titles) == 1 else f"{titles[0]} and {len(titles) - 1} more")[:255],
+                body=f"{notification_body}\n\n{listed}",
+                event_count=len(rows)
+            )
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _duplicate_error(db, e, keys)
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_responses("events")
+    return db.query(models.Event).filter(
+        models.Event.id.in_([row["id"] for row in rows])
+    ).order_by(models.Event.start_time, models.Event.id).all()
+
+def _series_has_dependents(db: Session, event_id: UUID) -> bool:
+    """Whether a series has occurrence overrides or active occurrence confirmations, both keyed by occurrence start."""
+    return db.execute(select(or_(
+        exists().where(models.EventOccurrenceOverride.event_id == event_id),
+        exists().where(
+            models.EventOccurrenceConfirmation.event_id == event_id,
+            models.EventOccurrenceConfirmation.status != models.ConfirmationStatusEnum.CANCELLED
+        )
+    ))).scalar()
+
 def update_event(db: Session, db_event: models.Event, event_update: schemas.EventCreate):
-    for key, value in event_update.dict(exclude_unset=True).items():
+    """
+    Apply an event edit. Seats added by raising (or removing) the capacity go to
+    the waitlist in the same transaction. A series with overrides or occurrence
+    confirmations keeps its start time and rule: raises SeriesHasDependentsError.
+    Moving onto the title and start time of another live event raises
+    DuplicateEventError. Returns (event, promotion notifications).
+    """
+    values = _naive_times(event_update.dict(exclude_unset=True))
+    rule = values.pop("recurrence_rule", db_event.recurrence_rule)
+    reshaped = rule != db_event.recurrence_rule or values.get("start_time", db_event.start_time) != db_event.start_time
+    if db_event.recurrence is not None and reshaped and _series_has_dependents(db, db_event.id):
+        raise SeriesHasDependentsError()
+    confirmed = None
+    if "capacity" in values:
+        # Lock the event as _take_seat does, so the count stays current until commit
+        confirmed = db.execute(
+            select(models.Event.confirmation_count).where(models.Event.id == db_event.id).with_for_update()
+        ).scalar()
+    for key, value in values.items():
         setattr(db_event, key, value)
-    db.commit()
+    # The stored series end depends on both the rule and the first occurrence
+    if rule is not None or db_event.recurrence is not None:
+        _set_recurrence(db_event, rule)
+    promotions = []
+    if confirmed is not None:
+        seats = None if db_event.capacity is None else db_event.capacity - confirmed
+        if seats is None or seats > 0:
+            promotions = _promote_many_from_waitlist(db, db_event.id, db_event.title, seats)
+        db_event.confirmation_count = confirmed + len(promotions)
+    key = (db_event.title, db_event.start_time)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _duplicate_error(db, e, [key])
+    invalidate_responses("events")
     db.refresh(db_event)
-    return db_event
+    return db_event, promotions
 
 def delete_event(db: Session, event_id: UUID):
-    db_event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if db_event:
-        db.delete(db_event)
-        db.commit()
-    return db_event
+    """
+    Soft-delete: a single-row update, however many confirmations the event has.
+    The event disappears from every query at once; retention.purge_deleted_event
+    removes it and its dependents in batches afterwards.
+    """
+    deleted = db.execute(
+        update(models.Event)
+        .where(models.Event.id == event_id, models.Event.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow())
+        .returning(models.Event.id)
+    ).scalar()
+    db.commit()
+    if deleted is not None:
+        invalidate_responses("events")
+    return deleted
+
+def _is_occurrence(db_event: models.Event, occurrence_start: datetime) -> bool:
+    if db_event.recurrence is None:
+        return False
+    return recurrence.is_occurrence(recurrence.parse_rule(db_event.recurrence.rule), db_event.start_time, occurrence_start)
+
+def set_occurrence_override(db: Session, db_event: models.Event, occurrence_start: datetime, override: schemas.EventOccurrenceOverrideUpdate):
+    """Replace the override of one occurrence of a series. Raises OccurrenceNotFoundError."""
+    occurrence_start = recurrence.to_naive_utc(occurrence_start)
+    if not _is_occurrence(db_event, occurrence_start):
+        raise OccurrenceNotFoundError()
+    table = models.EventOccurrenceOverride.__table__
+    values = _naive_times(override.dict())
+    insert_stmt = pg_insert(table).values(event_id=db_event.id, occurrence_start=occurrence_start, updated_at=datetime.utcnow(), **values)
+    db.execute(insert_stmt.on_conflict_do_update(
+        index_elements=[table.c.event_id, table.c.occurrence_start],
+        set_={**{key: insert_stmt.excluded[key] for key in values}, "updated_at": insert_stmt.excluded.updated_at}
+    ))
+    db.commit()
+    return db.get(models.EventOccurrenceOverride, (db_event.id, occurrence_start))
 
 # --- Opportunity CRUD ---
 def get_opportunity(db: Session, opportunity_id: UUID):
     return db.query(models.Opportunity).filter(models.Opportunity.id == opportunity_id).first()
 
-def get_opportunities(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Opportunity).offset(skip).limit(limit).all()
+def get_opportunities(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.Opportunity)
+    return paginate(query, models.Opportunity.created_at, models.Opportunity.id, skip, limit, cursor).all()
 
 def create_opportunity(db: Session, opportunity: schemas.OpportunityCreate, posted_by_id: UUID, posted_by_role: models.RoleEnum):
     db_opportunity = models.Opportunity(
@@ -96,6 +578,7 @@ def create_opportunity(db: Session, opportunity: schemas.OpportunityCreate, post
     )
     db.add(db_opportunity)
     db.commit()
+    invalidate_responses("opportunities")
     db.refresh(db_opportunity)
     return db_opportunity
 
@@ -103,6 +586,7 @@ def update_opportunity(db: Session, db_opportunity: models.Opportunity, opportun
     for key, value in opportunity_update.dict(exclude_unset=True).items():
         setattr(db_opportunity, key, value)
     db.commit()
+    invalidate_responses("opportunities")
     db.refresh(db_opportunity)
     return db_opportunity
 
@@ -111,17 +595,47 @@ def delete_opportunity(db: Session, opportunity_id: UUID):
     if db_opportunity:
         db.delete(db_opportunity)
         db.commit()
+        invalidate_responses("opportunities")
     return db_opportunity
 
 # --- EventConfirmation CRUD ---
 def get_event_confirmation(db: Session, confirmation_id: UUID):
     return db.query(models.EventConfirmation).filter(models.EventConfirmation.id == confirmation_id).first()
 
-def get_event_confirmations_for_event(db: Session, event_id: UUID):
-    return db.query(models.EventConfirmation).filter(models.EventConfirmation.event_id == event_id).all()
+def get_event_confirmations_for_event(db: Session, event_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.EventConfirmation).filter(models.EventConfirmation.event_id == event_id)
+    return paginate(query, models.EventConfirmation.confirmed_at, models.EventConfirmation.id, skip, limit, cursor).all()
+
+def get_event_confirmations_for_student(db: Session, student_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.EventConfirmation).filter(models.EventConfirmation.student_id == student_id)
+    return paginate(query, models.EventConfirmation.confirmed_at, models.EventConfirmation.id, skip, limit, cursor).all()
 
-def get_event_confirmations_for_student(db: Session, student_id: UUID):
-    return db.query(models.EventConfirmation).filter(models.EventConfirmation.student_id == student_id).all()
+ROSTER_FIELDS = ("confirmation_id", "student_id", "username", "full_name", "email", "status", "note", "confirmed_at")
+
+def stream_event_roster(db: Session, event_id: UUID, fetch_size: int = 1000):
+    """
+    Confirmations of an event joined with student details, as plain rows in
+    ROSTER_FIELDS order. Rows come from a server-side cursor fetch_size at a
+    time, so the roster is never held in memory at once.
+    """
+    confirmation = models.EventConfirmation
+    query = (
+        select(
+            confirmation.id,
+            confirmation.student_id,
+            models.User.username,
+            models.User.full_name,
+            models.User.email,
+            confirmation.status,
+            confirmation.note,
+            confirmation.confirmed_at,
+        )
+        .join(models.User, models.User.id == confirmation.student_id)
+        .where(confirmation.event_id == event_id)
+        .order_by(confirmation.confirmed_at, confirmation.id)
+        .execution_options(yield_per=fetch_size)
+    )
+    return db.execute(query)
 
 def get_event_confirmation_by_student_and_event(db: Session, event_id: UUID, student_id: UUID):
     return db.query(models.EventConfirmation).filter(
@@ -129,42 +643,551 @@ def get_event_confirmation_by_student_and_event(db: Session, event_id: UUID, stu
         models.EventConfirmation.student_id == student_id
     ).first()
 
-def create_event_confirmation(db: Session, confirmation: schemas.EventConfirmationCreate, student_id: UUID):
-    # Explicitly extract fields to avoid potential dict parsing issues
-    db_confirmation = models.EventConfirmation(
-        event_id=confirmation.event_id,
-        student_id=student_id,
-        status=confirmation.status or models.ConfirmationStatusEnum.CONFIRMED,
-        note=confirmation.note
+class EventNotFoundError(Exception):
+    pass
+
+class EventFullError(Exception):
+    pass
+
+class AlreadyConfirmedError(Exception):
+    pass
+
+class ConfirmationNotFoundError(Exception):
+    pass
+
+class OccurrenceNotFoundError(Exception):
+    pass
+
+class SeriesHasDependentsError(Exception):
+    """Moving a series or changing its rule would orphan its overrides and occurrence confirmations."""
+    pass
+
+def _event_has_seat():
+    return or_(models.Event.capacity.is_(None), models.Event.confirmation_count < models.Event.capacity)
+
+def _take_seat(db: Session, event_id: UUID) -> bool:
+    """
+    Reserve a seat if one is left. Either way the event row ends up locked, which
+    serialises confirmations and cancellations of the same event until commit.
+    Returns whether a seat was taken.
+
+    While seats are left this is a single UPDATE. Only a full (or missing) event
+    costs two more statements, lock and re-check: an UPDATE that matches no row
+    takes no lock, and the waitlist insert must not race a cancellation's promotion.
+    """
+    taken = db.execute(
+        update(models.Event)
+        # UPDATEs are not covered by the soft-delete filter in models
+        .where(models.Event.id == event_id, models.Event.deleted_at.is_(None), _event_has_seat())
+        .values(confirmation_count=models.Event.confirmation_count + 1)
+        .returning(models.Event.id)
+    ).scalar()
+    if taken is not None:
+        return True
+    # Full or missing: lock the row, then re-check in case a seat was freed meanwhile
+    has_seat = db.execute(
+        select(_event_has_seat()).where(models.Event.id == event_id).with_for_update()
+    ).first()
+    if has_seat is None:
+        raise EventNotFoundError()
+    if has_seat[0]:
+        db.execute(
+            update(models.Event)
+            .where(models.Event.id == event_id)
+            .values(confirmation_count=models.Event.confirmation_count + 1)
+        )
+        return True
+    return False
+
+def create_event_confirmation(db: Session, confirmation: schemas.EventConfirmationCreate, student_id: UUID, waitlist: bool = False):
+    """
+    Confirm a student for an event in one transaction: take a seat, then insert
+    the confirmation (or revive a cancelled one). Past capacity the student joins
+    the waitlist as PENDING when waitlist is set.
+    Raises EventNotFoundError, EventFullError or AlreadyConfirmedError; nothing is written then.
+    """
+    status = models.ConfirmationStatusEnum.CANCELLED \
+        if confirmation.status == models.ConfirmationStatusEnum.CANCELLED else models.ConfirmationStatusEnum.CONFIRMED
+    try:
+        if status == models.ConfirmationStatusEnum.CONFIRMED and not _take_seat(db, confirmation.event_id):
+            if not waitlist:
+                raise EventFullError()
+            status = models.ConfirmationStatusEnum.PENDING
+        now = datetime.utcnow()
+        table = models.EventConfirmation.__table__
+        insert_stmt = pg_insert(table).values(
+            id=uuid4(),
+            event_id=confirmation.event_id,
+            student_id=student_id,
+            status=status,
+            note=confirmation.note,
+            confirmed_at=now,
+            updated_at=now
+        )
+        # A cancelled confirmation is revived; confirmed_at restarts the waitlist position
+        confirmation_id = db.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[table.c.event_id, table.c.student_id],
+                set_={
+                    "status": insert_stmt.excluded.status,
+                    "note": insert_stmt.excluded.note,
+                    "confirmed_at": now,
+                    "updated_at": now,
+                },
+                where=table.c.status == models.ConfirmationStatusEnum.CANCELLED
+            )
+            .returning(table.c.id)
+        ).scalar()
+        if confirmation_id is None:
+            raise AlreadyConfirmedError()
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+    # confirmation_count is part of cached event listings
+    invalidate_responses("event-seats")
+    return get_event_confirmation(db, confirmation_id)
+
+def _resolve_students(db: Session, records: List[dict]):
+    """Look up the users referenced by import records in one query. Returns lookup dicts by id, email and username."""
+    ids, emails, usernames = set(), set(), set()
+    for record in records:
+        if record.get("student_id"):
+            try:
+                ids.add(UUID(record["student_id"]))
+            except ValueError:
+                pass
+        elif record.get("email"):
+            emails.add(record["email"].lower())
+        else:
+            usernames.add(record["username"])
+    conditions = []
+    if ids:
+        conditions.append(models.User.id.in_(ids))
+    if emails:
+        conditions.append(func.lower(models.User.email).in_(emails))
+    if usernames:
+        conditions.append(models.User.username.in_(usernames))
+    by_id, by_email, by_username = {}, {}, {}
+    if conditions:
+        users = db.execute(
+            select(models.User.id, models.User.email, models.User.username, models.User.role).where(or_(*conditions))
+        ).all()
+        for user in users:
+            by_id[str(user.id)] = user
+            by_email[user.email.lower()] = user
+            by_username[user.username] = user
+    return by_id, by_email, by_username
+
+def import_event_confirmations(db: Session, event_id: UUID, rows, waitlist: bool = False, batch_size: int = 1000):
+    """
+    Confirm many students for one event in a single transaction. rows are
+    (row number, record, parse error) tuples from event_api.importing.
+    Users are resolved and confirmations inserted batch by batch, skipping
+    students already registered and reviving cancelled confirmations;
+    confirmation_count is updated once at the end.
+    Seats are handed out in row order, then the waitlist (if enabled) takes the rest.
+    """
+    event = db.execute(
+        select(models.Event.capacity, models.Event.confirmation_count)
+        .where(models.Event.id == event_id)
+        .with_for_update()
+    ).first()
+    if event is None:
+        raise EventNotFoundError()
+    seats = None if event.capacity is None else max(event.capacity - event.confirmation_count, 0)
+    errors = []
+    confirmed = waitlisted = 0
+    seen = set()
+    table = models.EventConfirmation.__table__
+
+    def fail(number, record, error):
+        value = None
+        if record:
+            value = record.get("student_id") or record.get("email") or record.get("username")
+        errors.append({"row": number, "value": value, "error": error})
+
+    try:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            by_id, by_email, by_username = _resolve_students(db, [record for _, record, _ in batch if record])
+            candidates = []
+            for number, record, error in batch:
+                if error:
+                    fail(number, record, error)
+                    continue
+                if record.get("student_id"):
+                    try:
+                        user = by_id.get(str(UUID(record["student_id"])))
+                    except ValueError:
+                        fail(number, record, "Invalid student_id")
+                        continue
+                elif record.get("email"):
+                    user = by_email.get(record["email"].lower())
+                else:
+                    user = by_username.get(record["username"])
+                if user is None:
+                    fail(number, record, "Student not found")
+                elif user.role != models.RoleEnum.STUDENT:
+                    fail(number, record, "User is not a student")
+                elif user.id in seen:
+                    fail(number, record, "Duplicate row")
+                else:
+                    seen.add(user.id)
+                    candidates.append((number, record, user.id))
+            if not candidates:
+                continue
+
+            # Cancelled confirmations are revived below, as a single confirmation would be
+            registered = set(db.execute(
+                select(table.c.student_id).where(
+                    table.c.event_id == event_id,
+                    table.c.student_id.in_([student_id for _, _, student_id in candidates]),
+                    table.c.status != models.ConfirmationStatusEnum.CANCELLED
+                )
+            ).scalars())
+            now = datetime.utcnow()
+            values = []
+            for number, record, student_id in candidates:
+                if student_id in registered:
+                    fail(number, record, "Already registered for this event")
+                    continue
+                if seats is None or seats > 0:
+                    status = models.ConfirmationStatusEnum.CONFIRMED
+                    if seats is not None:
+                        seats -= 1
+                elif waitlist:
+                    status = models.ConfirmationStatusEnum.PENDING
+                else:
+                    fail(number, record, "Event is full")
+                    continue
+                values.append({
+                    "id": uuid4(),
+                    "event_id": event_id,
+                    "student_id": student_id,
+                    "status": status,
+                    "note": record.get("note") or None,
+                    "confirmed_at": now,
+                    "updated_at": now,
+                })
+            if not values:
+                continue
+            # The event lock keeps single confirmations out, so the only conflicts are
+            # cancelled rows; they are revived with a fresh waitlist position
+            insert_stmt = pg_insert(table).values(values)
+            inserted = db.execute(
+                insert_stmt.on_conflict_do_update(
+                    index_elements=[table.c.event_id, table.c.student_id],
+                    set_={key: insert_stmt.excluded[key] for key in ("status", "note", "confirmed_at", "updated_at")},
+                    where=table.c.status == models.ConfirmationStatusEnum.CANCELLED
+                )
+                .returning(table.c.status)
+            ).scalars().all()
+            confirmed += sum(1 for status in inserted if status == models.ConfirmationStatusEnum.CONFIRMED)
+            waitlisted += sum(1 for status in inserted if status == models.ConfirmationStatusEnum.PENDING)
+
+        if confirmed:
+            db.execute(
+                update(models.Event)
+                .where(models.Event.id == event_id)
+                .values(confirmation_count=models.Event.confirmation_count + confirmed)
+            )
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+    invalidate_responses("event-seats")
+    return {
+        "total_rows": len(rows),
+        "confirmed": confirmed,
+        "waitlisted": waitlisted,
+        "failed": len(errors),
+        "errors": errors,
+    }
+
+def _promote_from_waitlist(db: Session, event_id: UUID, event_title: str):
+    """Confirm the longest-waiting PENDING student and notify them. The caller holds the event lock and commits."""
+    confirmation = models.EventConfirmation
+    next_in_line = select(confirmation.id).where(
+        confirmation.event_id == event_id,
+        confirmation.status == models.ConfirmationStatusEnum.PENDING
+    ).order_by(confirmation.confirmed_at, confirmation.id).limit(1).scalar_subquery()
+    promoted = db.execute(
+        update(confirmation)
+        .where(confirmation.id == next_in_line)
+        .values(status=models.ConfirmationStatusEnum.CONFIRMED, updated_at=datetime.utcnow())
+        .returning(confirmation.id, confirmation.student_id)
+    ).first()
+    if promoted is None:
+        return None, None
+    db_notification = models.Notification(
+        recipient_id=promoted.student_id,
+        title=f"You're in: {event_title}",
+        body="A seat opened up and your waitlist spot has been confirmed.",
+        type=models.NotificationTypeEnum.EVENT,
+        related_event_id=event_id
     )
-    db.add(db_confirmation)
+    db.add(db_notification)
+    adjust_unread_counter(db, user_id=promoted.student_id, delta=1)
+    return promoted.id, db_notification
+
+def _promote_many_from_waitlist(db: Session, event_id: UUID, event_title: str, seats: Optional[int]):
+    """
+    Confirm up to `seats` PENDING students (all of them when None) in waitlist
+    order and notify each. The caller holds the event lock, adjusts the count
+    and commits. Returns the notifications.
+    """
+    confirmation = models.EventConfirmation
+    next_in_line = select(confirmation.id).where(
+        confirmation.event_id == event_id,
+        confirmation.status == models.ConfirmationStatusEnum.PENDING
+    ).order_by(confirmation.confirmed_at, confirmation.id).limit(seats)
+    promoted = db.execute(
+        update(confirmation)
+        .where(confirmation.id.in_(next_in_line))
+        .values(status=models.ConfirmationStatusEnum.CONFIRMED, updated_at=datetime.utcnow())
+        .returning(confirmation.student_id)
+    ).scalars().all()
+    notifications = [
+        models.Notification(
+            recipient_id=student_id,
+            title=f"You're in: {event_title}",
+            body="A seat opened up and your waitlist spot has been confirmed.",
+            type=models.NotificationTypeEnum.EVENT,
+            related_event_id=event_id
+        )
+        for student_id in promoted
+    ]
+    db.add_all(notifications)
+    for student_id in promoted:
+        adjust_unread_counter(db, user_id=student_id, delta=1)
+    return notifications
+
+def cancel_event_confirmation(db: Session, event_id: UUID, student_id: UUID):
+    """
+    Cancel a student's confirmation or waitlist entry. A freed seat goes to the
+    next student on the waitlist in the same transaction; otherwise the count drops.
+    Returns (cancelled confirmation, promotion notification or None).
+    """
+    confirmation = models.EventConfirmation
+    try:
+        # Lock the event first, in the same order as _take_seat
+        event = db.execute(
+            select(models.Event.id, models.Event.title).where(models.Event.id == event_id).with_for_update()
+        ).first()
+        if event is None:
+            raise EventNotFoundError()
+        previous = db.execute(
+            select(confirmation.id, confirmation.status).where(
+                confirmation.event_id == event_id,
+                confirmation.student_id == student_id,
+                confirmation.status != models.ConfirmationStatusEnum.CANCELLED
+            ).with_for_update()
+        ).first()
+        if previous is None:
+            raise ConfirmationNotFoundError()
+        db.execute(
+            update(confirmation)
+            .where(confirmation.id == previous.id)
+            .values(status=models.ConfirmationStatusEnum.CANCELLED, updated_at=datetime.utcnow())
+        )
+        notification = None
+        if previous.status == models.ConfirmationStatusEnum.CONFIRMED:
+            promoted_id, notification = _promote_from_waitlist(db, event_id, event.title)
+            if promoted_id is None:
+                db.execute(
+                    update(models.Event)
+                    .where(models.Event.id == event_id, models.Event.confirmation_count > 0)
+                    .values(confirmation_count=models.Event.confirmation_count - 1)
+                )
+    except Exception:
+        db.rollback()
+        raise
     db.commit()
-    db.refresh(db_confirmation)
-    return db_confirmation
+    invalidate_responses("event-seats")
+    if notification is not None:
+        db.refresh(notification)
+    return get_event_confirmation(db, previous.id), notification
 
 def delete_event_confirmation(db: Session, confirmation_id: UUID):
     db_confirmation = db.query(models.EventConfirmation).filter(models.EventConfirmation.id == confirmation_id).first()
     if db_confirmation:
+        if db_confirmation.status == models.ConfirmationStatusEnum.CONFIRMED:
+            # Hand the seat to the waitlist, or give it back, in the same transaction
+            event = db.execute(
+                select(models.Event.id, models.Event.title).where(models.Event.id == db_confirmation.event_id).with_for_update()
+            ).first()
+            promoted_id, _ = _promote_from_waitlist(db, event.id, event.title)
+            if promoted_id is None:
+                db.execute(
+                    update(models.Event)
+                    .where(models.Event.id == event.id, models.Event.confirmation_count > 0)
+                    .values(confirmation_count=models.Event.confirmation_count - 1)
+                )
         db.delete(db_confirmation)
         db.commit()
+        invalidate_responses("event-seats")
     return db_confirmation
 
+def create_occurrence_confirmation(db: Session, confirmation: schemas.EventConfirmationCreate, student_id: UUID):
+    """
+    Confirm a student for one occurrence of a recurring event. Capacity applies
+    per occurrence and is counted under the series row lock; there is no
+    occurrence waitlist.
+    Raises EventNotFoundError, OccurrenceNotFoundError, EventFullError or AlreadyConfirmedError.
+    """
+    status = models.ConfirmationStatusEnum.CANCELLED \
+        if confirmation.status == models.ConfirmationStatusEnum.CANCELLED else models.ConfirmationStatusEnum.CONFIRMED
+    occurrence_start = recurrence.to_naive_utc(confirmation.occurrence_start)
+    try:
+        db_event = db.query(models.Event).filter(models.Event.id == confirmation.event_id).with_for_update().first()
+        if db_event is None:
+            raise EventNotFoundError()
+        override = db.get(models.EventOccurrenceOverride, (db_event.id, occurrence_start))
+        if not _is_occurrence(db_event, occurrence_start) or (override is not None and override.cancelled):
+            raise OccurrenceNotFoundError()
+        table = models.EventOccurrenceConfirmation.__table__
+        if status == models.ConfirmationStatusEnum.CONFIRMED and db_event.capacity is not None:
+            taken = db.query(func.count(table.c.id)).filter(
+                table.c.event_id == db_event.id,
+                table.c.occurrence_start == occurrence_start,
+                table.c.status == models.ConfirmationStatusEnum.CONFIRMED,
+                # A repeat request is reported as a duplicate, not as full
+                table.c.student_id != student_id
+            ).scalar()
+            if taken >= db_event.capacity:
+                raise EventFullError()
+        now = datetime.utcnow()
+        insert_stmt = pg_insert(table).values(
+            id=uuid4(),
+            event_id=db_event.id,
+            occurrence_start=occurrence_start,
+            student_id=student_id,
+            status=status,
+            note=confirmation.note,
+            confirmed_at=now,
+            updated_at=now
+        )
+        confirmation_id = db.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[table.c.event_id, table.c.occurrence_start, table.c.student_id],
+                set_={"status": insert_stmt.excluded.status, "note": insert_stmt.excluded.note, "confirmed_at": now, "updated_at": now},
+                where=table.c.status == models.ConfirmationStatusEnum.CANCELLED
+            )
+            .returning(table.c.id)
+        ).scalar()
+        if confirmation_id is None:
+            raise AlreadyConfirmedError()
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+    return db.get(models.EventOccurrenceConfirmation, confirmation_id)
+
+def cancel_occurrence_confirmation(db: Session, event_id: UUID, occurrence_start: datetime, student_id: UUID):
+    """Raises ConfirmationNotFoundError when the student holds no confirmation for the occurrence."""
+    occurrence_start = recurrence.to_naive_utc(occurrence_start)
+    table = models.EventOccurrenceConfirmation.__table__
+    confirmation_id = db.execute(
+        update(table)
+        .where(
+            table.c.event_id == event_id,
+            table.c.occurrence_start == occurrence_start,
+            table.c.student_id == student_id,
+            table.c.status == models.ConfirmationStatusEnum.CONFIRMED
+        )
+        .values(status=models.ConfirmationStatusEnum.CANCELLED, updated_at=datetime.utcnow())
+        .returning(table.c.id)
+    ).scalar()
+    if confirmation_id is None:
+        db.rollback()
+        raise ConfirmationNotFoundError()
+    db.commit()
+    return db.get(models.EventOccurrenceConfirmation, confirmation_id)
+
+def get_occurrence_confirmations_for_event(db: Session, event_id: UUID, occurrence_start: datetime, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.EventOccurrenceConfirmation).filter(
+        models.EventOccurrenceConfirmation.event_id == event_id,
+        models.EventOccurrenceConfirmation.occurrence_start == recurrence.to_naive_utc(occurrence_start)
+    )
+    return paginate(query, models.EventOccurrenceConfirmation.confirmed_at, models.EventOccurrenceConfirmation.id, skip, limit, cursor).all()
+
+# --- Dashboard ---
+class DepartmentDashboard(NamedTuple):
+    users: int
+    events: int
+    opportunities: int
+    confirmations: int
+    upcoming_events: int
+    recent_events: List[models.Event]
+
+def get_department_dashboard(db: Session, department: str, recent: int = 5) -> DepartmentDashboard:
+    """
+    Every head dashboard figure in one round trip. The department's events are
+    a CTE shared by the event, upcoming and confirmation counts, and the most
+    recent events (with their recurrence) are outer-joined to the single row of
+    counts, so a department without events still gets one row.
+    """
+    department_events = select(models.Event.id, models.Event.start_time).where(
+        models.Event.department == department
+    ).cte("department_events")
+    counts = select(
+        select(func.count()).select_from(models.User).where(models.User.department == department).scalar_subquery().label("users"),
+        select(func.count()).select_from(department_events).scalar_subquery().label("events"),
+        select(func.count()).select_from(models.Opportunity).where(models.Opportunity.department == department).scalar_subquery().label("opportunities"),
+        select(func.count()).select_from(models.EventConfirmation).join(
+            department_events, department_events.c.id == models.EventConfirmation.event_id
+        ).scalar_subquery().label("confirmations"),
+        select(func.count()).select_from(department_events).where(
+            department_events.c.start_time > datetime.utcnow()
+        ).scalar_subquery().label("upcoming_events"),
+    ).subquery("counts")
+    recent_ids = select(models.Event.id).where(models.Event.department == department).order_by(
+        models.Event.created_at.desc()
+    ).limit(recent).subquery("recent")
+    rows = db.execute(
+        select(counts, models.Event)
+        .select_from(counts)
+        .outerjoin(recent_ids, true())
+        .outerjoin(models.Event, models.Event.id == recent_ids.c.id)
+        .options(joinedload(models.Event.recurrence))
+        .order_by(models.Event.created_at.desc())
+    ).all()
+    first = rows[0]
+    return DepartmentDashboard(
+        users=first.users,
+        events=first.events,
+        opportunities=first.opportunities,
+        confirmations=first.confirmations,
+        upcoming_events=first.upcoming_events,
+        recent_events=[row.Event for row in rows if row.Event is not None]
+    )
+
 # --- Notification CRUD ---
 def get_notification(db: Session, notification_id: UUID):
     return db.query(models.Notification).filter(models.Notification.id == notification_id).first()
 
-def get_notifications_for_recipient(db: Session, recipient_id: UUID, skip: int = 0, limit: int = 100):
-    return db.query(models.Notification).filter(models.Notification.recipient_id == recipient_id).offset(skip).limit(limit).all()
+def get_notifications_for_recipient(db: Session, recipient_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, UUID]] = None):
+    query = db.query(models.Notification).filter(models.Notification.recipient_id == recipient_id)
+    return paginate(query, models.Notification.created_at, models.Notification.id, skip, limit, cursor).all()
 
 def create_notification(db: Session, notification: schemas.NotificationCreate):
     db_notification = models.Notification(**notification.dict())
     db.add(db_notification)
+    adjust_unread_counter(db, user_id=db_notification.recipient_id, delta=1)
     db.commit()
     db.refresh(db_notification)
     return db_notification
 
 def update_notification(db: Session, db_notification: models.Notification, is_read: bool):
-    db_notification.is_read = is_read
+    # Conditional update so concurrent toggles adjust the counter only once
+    changed = db.execute(
+        update(models.Notification)
+        .where(models.Notification.id == db_notification.id, models.Notification.is_read != is_read)
+        .values(is_read=is_read)
+    ).rowcount
+    if changed:
+        adjust_unread_counter(db, user_id=db_notification.recipient_id, delta=-1 if is_read else 1)
     db.commit()
     db.refresh(db_notification)
     return db_notification
@@ -172,35 +1195,371 @@ def update_notification(db: Session, db_notification: models.Notification, is_re
 def delete_notification(db: Session, notification_id: UUID):
     db_notification = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
     if db_notification:
-        db.delete(db_notification)
+        deleted = db.execute(
+            delete(models.Notification)
+            .where(models.Notification.id == notification_id)
+            .returning(models.Notification.is_read)
+        ).first()
+        if deleted is not None and not deleted.is_read:
+            adjust_unread_counter(db, user_id=db_notification.recipient_id, delta=-1)
         db.commit()
     return db_notification
 
-def send_event_notifications_to_students(db: Session, event_id: UUID, title: str, description: str):
+# --- Unread counters ---
+def adjust_unread_counter(db: Session, user_id: UUID, delta: int):
+    """Atomically add delta to a user's unread counter. The caller commits."""
+    if not delta:
+        return
+    counter = models.NotificationCounter.__table__
+    db.execute(
+        pg_insert(counter)
+        .values(user_id=user_id, unread_count=delta)
+        .on_conflict_do_update(
+            index_elements=[counter.c.user_id],
+            set_={"unread_count": counter.c.unread_count + delta}
+        )
+    )
+
+def get_unread_counter(db: Session, user_id: UUID):
+    return db.query(models.NotificationCounter.unread_count).filter(
+        models.NotificationCounter.user_id == user_id
+    ).scalar() or 0
+
+def rebuild_notification_counters(db: Session):
+    """Recompute every user's unread counter from the notifications table in one statement."""
+    counter = models.NotificationCounter.__table__
+    unread = select(func.count()).where(
+        models.Notification.recipient_id == models.User.id,
+        models.Notification.is_read == False
+    ).scalar_subquery()
+    statement = pg_insert(counter).from_select(
+        ["user_id", "unread_count"],
+        select(models.User.id, unread)
+    )
+    result = db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[counter.c.user_id],
+            set_={"unread_count": statement.excluded.unread_count}
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+def enqueue_event_notification(db: Session, event_id: UUID, title: str, body: Optional[str], event_count: Optional[int] = None):
+    """Add an outbox record for the student fan-out of an event, or of a batch of event_count events. The caller commits."""
+    db_outbox = models.NotificationOutbox(event_id=event_id, title=title, body=body, event_count=event_count)
+    db.add(db_outbox)
+    return db_outbox
+
+def get_notification_outbox_depth(db: Session):
+    return db.query(models.NotificationOutbox).filter(
+        models.NotificationOutbox.status == models.OutboxStatusEnum.PENDING
+    ).count()
+
+def send_event_notifications_to_students(db: Session, event_id: UUID, title: str, description: str, commit: bool = True, event_count: Optional[int] = None):
     """
-    Send notifications to all students when a new event is created
+    Notify all students about a new event with a single broadcast row,
+    so the cost does not depend on the number of students. A batch of
+    event_count events gets one combined broadcast.
     """
-    # Get the event
-    event = get_event(db, event_id=event_id)
-    if not event:
-        return False
-    
-    # Get all student users
-    student_users = db.query(models.User).filter(models.User.role == models.RoleEnum.STUDENT).all()
-    
-    # Create notifications for each student
-    notifications = []
-    for student in student_users:
-        notification = models.Notification(
-            recipient_id=student.id,
-            title=f"New Event: {title}",
-            body=description,
-            type=models.NotificationTypeEnum.EVENT,
-            related_event_id=event_id,
-            is_read=False
+    heading = f"New Event: {title}" if not event_count or event_count == 1 else f"{event_count} New Events: {title}"
+    return create_broadcast_notification(
+        db,
+        title=heading[:255],
+        body=description,
+        type=models.NotificationTypeEnum.EVENT,
+        target_role=models.RoleEnum.STUDENT,
+        related_event_id=event_id,
+        commit=commit
+    )
+
+# --- Broadcast notifications ---
+def create_broadcast_notification(
+    db: Session,
+    title: str,
+    body: Optional[str],
+    type: models.NotificationTypeEnum,
+    target_role: Optional[models.RoleEnum] = None,
+    target_department: Optional[str] = None,
+    related_event_id: Optional[UUID] = None,
+    related_opportunity_id: Optional[UUID] = None,
+    commit: bool = True
+):
+    db_broadcast = models.BroadcastNotification(
+        title=title,
+        body=body,
+        type=type,
+        target_role=target_role,
+        target_department=target_department,
+        related_event_id=related_event_id,
+        related_opportunity_id=related_opportunity_id
+    )
+    db.add(db_broadcast)
+    if commit:
+        db.commit()
+        db.refresh(db_broadcast)
+    return db_broadcast
+
+def _broadcast_visible_to(user):
+    broadcast = models.BroadcastNotification
+    return and_(
+        or_(broadcast.target_role.is_(None), broadcast.target_role == user.role),
+        or_(broadcast.target_department.is_(None), broadcast.target_department == user.department),
+        broadcast.created_at >= user.created_at
+    )
+
+def _broadcast_is_read_by(user):
+    broadcast = models.BroadcastNotification
+    read_before = select(models.NotificationReadMarker.broadcasts_read_before).where(
+        models.NotificationReadMarker.user_id == user.id
+    ).scalar_subquery()
+    return or_(
+        func.coalesce(broadcast.created_at <= read_before, False),
+        exists().where(
+            models.BroadcastReceipt.broadcast_id == broadcast.id,
+            models.BroadcastReceipt.user_id == user.id
+        )
+    )
+
+def _broadcast_feed_select(user):
+    broadcast = models.BroadcastNotification
+    return select(
+        broadcast.id,
+        literal(user.id, models.Notification.recipient_id.type).label("recipient_id"),
+        broadcast.title,
+        broadcast.body,
+        broadcast.type,
+        _broadcast_is_read_by(user).label("is_read"),
+        broadcast.created_at
+    ).where(_broadcast_visible_to(user))
+
+def notification_feed(user):
+    """
+    Personal notifications and visible broadcasts of a user as one selectable
+    with the NotificationRead columns.
+    """
+    notification = models.Notification
+    personal = select(
+        notification.id,
+        notification.recipient_id,
+        notification.title,
+        notification.body,
+        notification.type,
+        notification.is_read,
+        notification.created_at
+    ).where(notification.recipient_id == user.id)
+    return union_all(personal, _broadcast_feed_select(user)).subquery("feed")
+
+def get_notification_feed(
+    db: Session,
+    user,
+    skip: int = 0,
+    limit: int = 100,
+    unread_only: bool = False,
+    notification_type: Optional[models.NotificationTypeEnum] = None,
+    cursor: Optional[Tuple[datetime, UUID]] = None
+):
+    """
+    Newest first. With a cursor the page starts after it (keyset pagination);
+    skip is only honoured without one.
+    """
+    feed = notification_feed(user)
+    query = select(feed)
+    if unread_only:
+        query = query.where(feed.c.is_read == False)
+    if notification_type:
+        query = query.where(feed.c.type == notification_type)
+    return db.execute(paginate(query, feed.c.created_at, feed.c.id, skip, limit, cursor)).all()
+
+def get_notification_feed_since(db: Session, user, after_created_at: Optional[datetime] = None, after_id: Optional[UUID] = None, limit: int = 100):
+    """Feed entries newer than (after_created_at, after_id), oldest first."""
+    feed = notification_feed(user)
+    query = select(feed)
+    if after_created_at is not None:
+        query = query.where(tuple_(feed.c.created_at, feed.c.id) > tuple_(after_created_at, after_id))
+    query = query.order_by(feed.c.created_at, feed.c.id).limit(limit)
+    return db.execute(query).all()
+
+def count_unread_broadcasts(db: Session, user):
+    """Only broadcasts newer than the user's mark-all-read watermark are scanned."""
+    broadcast = models.BroadcastNotification
+    read_before = select(models.NotificationReadMarker.broadcasts_read_before).where(
+        models.NotificationReadMarker.user_id == user.id
+    ).scalar_subquery()
+    return db.execute(
+        select(func.count()).select_from(broadcast).where(
+            _broadcast_visible_to(user),
+            broadcast.created_at > func.coalesce(read_before, user.created_at),
+            ~exists().where(
+                models.BroadcastReceipt.broadcast_id == broadcast.id,
+                models.BroadcastReceipt.user_id == user.id
+            )
+        )
+    ).scalar()
+
+def count_unread_notifications(db: Session, user):
+    """Personal unread count is a counter lookup; broadcasts are counted since the watermark."""
+    return get_unread_counter(db, user_id=user.id) + count_unread_broadcasts(db, user)
+
+def get_broadcast_notification_for_user(db: Session, user, broadcast_id: UUID):
+    """A broadcast in NotificationRead shape, or None if it is not visible to the user."""
+    return db.execute(
+        _broadcast_feed_select(user).where(models.BroadcastNotification.id == broadcast_id)
+    ).first()
+
+def mark_broadcast_notification_as_read(db: Session, user, broadcast_id: UUID):
+    if get_broadcast_notification_for_user(db, user, broadcast_id) is None:
+        return None
+    db.execute(
+        pg_insert(models.BroadcastReceipt)
+        .values(broadcast_id=broadcast_id, user_id=user.id, read_at=datetime.utcnow())
+        .on_conflict_do_nothing()
+    )
+    db.commit()
+    return get_broadcast_notification_for_user(db, user, broadcast_id)
+
+def mark_all_notifications_as_read(db: Session, user):
+    """
+    Mark every personal notification and broadcast of a user as read with one
+    UPDATE and a watermark upsert. Returns the number of notifications marked.
+    """
+    unread_broadcasts = count_unread_broadcasts(db, user)
+    updated = db.execute(
+        update(models.Notification)
+        .where(models.Notification.recipient_id == user.id, models.Notification.is_read == False)
+        .values(is_read=True)
+    ).rowcount
+    adjust_unread_counter(db, user_id=user.id, delta=-updated)
+    mark_all_broadcasts_as_read(db, user)
+    db.commit()
+    return updated + unread_broadcasts
+
+def mark_notifications_as_read(db: Session, user, notification_ids: List[UUID]):
+    """
+    Mark the given personal notifications and broadcasts of a user as read.
+    Ids that are unknown, already read or not addressed to the user are ignored.
+    Returns the number of notifications marked.
+    """
+    updated = db.execute(
+        update(models.Notification)
+        .where(
+            models.Notification.recipient_id == user.id,
+            models.Notification.id.in_(notification_ids),
+            models.Notification.is_read == False
         )
-        db.add(notification)
-        notifications.append(notification)
-    
+        .values(is_read=True)
+    ).rowcount
+    adjust_unread_counter(db, user_id=user.id, delta=-updated)
+    broadcast = models.BroadcastNotification
+    unread_broadcasts = select(
+        broadcast.id,
+        literal(user.id, models.BroadcastReceipt.user_id.type),
+        literal(datetime.utcnow(), models.BroadcastReceipt.read_at.type)
+    ).where(
+        broadcast.id.in_(notification_ids),
+        _broadcast_visible_to(user),
+        ~_broadcast_is_read_by(user)
+    )
+    updated += db.execute(
+        pg_insert(models.BroadcastReceipt)
+        .from_select(["broadcast_id", "user_id", "read_at"], unread_broadcasts)
+        .on_conflict_do_nothing()
+    ).rowcount
     db.commit()
-    return notifications
+    return updated
+
+def mark_all_broadcasts_as_read(db: Session, user):
+    """Move the user's read watermark to now. The caller commits."""
+    now = datetime.utcnow()
+    db.execute(
+        pg_insert(models.NotificationReadMarker)
+        .values(user_id=user.id, broadcasts_read_before=now)
+        .on_conflict_do_update(
+            index_elements=[models.NotificationReadMarker.user_id],
+            set_={"broadcasts_read_before": now}
+        )
+    )
+
+# --- Search ---
+def _visible_events(user):
+    """Events a user may see, mirroring the role routers."""
+    event = models.Event
+    if user.role == models.RoleEnum.ADMIN:
+        return true()
+    if user.role == models.RoleEnum.HEAD:
+        return or_(event.department.is_(None), event.department == user.department)
+    if user.role == models.RoleEnum.EMPLOYEE:
+        return event.creator_id == user.id
+    is_confirmed = exists().where(
+        models.EventConfirmation.event_id == event.id,
+        models.EventConfirmation.student_id == user.id
+    )
+    return or_(event.is_public == True, is_confirmed)
+
+def _visible_opportunities(user):
+    opportunity = models.Opportunity
+    if user.role == models.RoleEnum.HEAD:
+        return or_(opportunity.department.is_(None), opportunity.department == user.department)
+    return true()
+
+def search(
+    db: Session,
+    user,
+    q: str,
+    kind: Optional[str] = None,
+    department: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Tuple[float, UUID]] = None
+):
+    """
+    Ranked full-text search over events and opportunities the user can see.
+    Matches come from the GIN-indexed search_vector columns; results are ordered
+    by rank, then id. Dates filter event start_time and opportunity created_at.
+    Ranks are cast from real to double precision: the cursor carries a Python
+    float, and a real would not compare equal to it, dropping tied rows.
+    """
+    query = func.websearch_to_tsquery("english", q)
+    parts = []
+    if kind in (None, "event"):
+        event = models.Event
+        conditions = [event.search_vector.op("@@")(query), _visible_events(user)]
+        if department:
+            conditions.append(event.department == department)
+        if date_from:
+            conditions.append(event.start_time >= date_from)
+        if date_to:
+            conditions.append(event.start_time <= date_to)
+        parts.append(select(
+            literal("event").label("kind"),
+            event.id,
+            event.title,
+            event.description,
+            event.department,
+            event.start_time,
+            event.created_at,
+            cast(func.ts_rank_cd(event.search_vector, query), DOUBLE_PRECISION).label("rank"),
+        ).where(*conditions))
+    if kind in (None, "opportunity"):
+        opportunity = models.Opportunity
+        conditions = [opportunity.search_vector.op("@@")(query), _visible_opportunities(user)]
+        if department:
+            conditions.append(opportunity.department == department)
+        if date_from:
+            conditions.append(opportunity.created_at >= date_from)
+        if date_to:
+            conditions.append(opportunity.created_at <= date_to)
+        parts.append(select(
+            literal("opportunity").label("kind"),
+            opportunity.id,
+            opportunity.title,
+            opportunity.description,
+            opportunity.department,
+            literal(None, models.Event.start_time.type).label("start_time"),
+            opportunity.created_at,
+            cast(func.ts_rank_cd(opportunity.search_vector, query), DOUBLE_PRECISION).label("rank"),
+        ).where(*conditions))
+    results = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery("results")
+    return db.execute(paginate(select(results), results.c.rank, results.c.id, skip, limit, cursor)).all()
@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import hmac
+import os
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import List, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from event_api import crud, models, recurrence
+from event_api.auth import SECRET_KEY
+from event_api.cache import LRUCache
+from event_api.conditional import etag_matches, make_etag
+
+# Feeds cover series still running and events from this many days back on
+ICS_FEED_PAST_DAYS = int(os.getenv("ICS_FEED_PAST_DAYS", "30"))
+ICS_FEED_CACHE_SIZE = int(os.getenv("ICS_FEED_CACHE_SIZE", "2000"))
+ICS_EVENT_CACHE_SIZE = int(os.getenv("ICS_EVENT_CACHE_SIZE", "20000"))
+# How long calendar apps may reuse a feed before revalidating it
+ICS_FEED_MAX_AGE_SECONDS = int(os.getenv("ICS_FEED_MAX_AGE_SECONDS", "300"))
+
+class FeedKind(str, Enum):
+    STUDENT = "student"
+    DEPARTMENT = "department"
+
+# Whole feeds by (kind, subject) -> (etag, body), and rendered VEVENT blocks
+# shared between feeds, so a change re-renders only the events it touched
+feed_cache = LRUCache(maxsize=ICS_FEED_CACHE_SIZE)
+vevent_cache = LRUCache(maxsize=ICS_EVENT_CACHE_SIZE)
+
+# ---------- Tokens ----------
+def _signature(payload: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), f"ics-feed:{payload}".encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+def feed_token(kind: FeedKind, user) -> str:
+    """
+    Unguessable, non-expiring token naming a user's feed; calendar apps cannot
+    send an Authorization header. It carries the user's feed_nonce, so
+    rotating the nonce revokes every URL issued before.
+    """
+    raw = f"{kind.value}:{user.id}:{user.feed_nonce}"
+    payload = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+    return f"{payload}.{_signature(payload)}"
+
+def read_feed_token(token: str) -> Tuple[FeedKind, UUID, int]:
+    payload, _, signature = token.partition(".")
+    if not hmac.compare_digest(signature.encode("utf-8"), _signature(payload).encode("utf-8")):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    kind, _, rest = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)).decode("utf-8").partition(":")
+    subject, _, nonce = rest.partition(":")
+    try:
+        # Student URLs issued before nonces existed carry none and stay valid until the first rotation
+        return FeedKind(kind), UUID(subject), int(nonce or 0)
+    except ValueError:
+        # Department URLs used to name only the department; they are no longer honoured
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+
+# ---------- Rendering ----------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+def _fold(line: str) -> str:
+    # Content lines are limited to 75 octets; continuations start with a space
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+def _timestamp(value: datetime) -> str:
+    # Stored datetimes are naive UTC
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+def _lines(*pairs) -> str:
+    return "".join(_fold(f"{name}:{value}") + "\r\n" for name, value in pairs if value is not None)
+
+def _vevent(event: models.Event, overrides: List[models.EventOccurrenceOverride]) -> str:
+    key = (event.id, event.updated_at, tuple((override.occurrence_start, override.updated_at) for override in overrides))
+    block = vevent_cache.get(key)
+    if block is not None:
+        return block
+
+    uid = f"{event.id}@event-api"
+    duration = event.end_time - event.start_time if event.end_time else None
+    # Endless rules carry the expansion horizon, so subscribers see the occurrences the API does
+    rule = recurrence.bounded(recurrence.parse_rule(event.recurrence_rule), event.start_time) if event.recurrence_rule else None
+    block = "BEGIN:VEVENT\r\n" + _lines(
+        ("UID", uid),
+        ("DTSTAMP", _timestamp(event.updated_at)),
+        ("DTSTART", _timestamp(event.start_time)),
+        ("DTEND", _timestamp(event.end_time) if event.end_time else None),
+        ("SUMMARY", _escape(event.title)),
+        ("LOCATION", _escape(event.location) if event.location else None),
+        ("DESCRIPTION", _escape(event.description) if event.description else None),
+        ("RRULE", recurrence.format_rule(rule) if rule else None),
+        *(("EXDATE", _timestamp(override.occurrence_start)) for override in overrides if override.cancelled),
+    ) + "END:VEVENT\r\n"
+    for override in overrides:
+        if override.cancelled:
+            continue
+        start = override.start_time or override.occurrence_start
+        end = override.end_time or (start + duration if duration else None)
+        location = override.location or event.location
+        block += "BEGIN:VEVENT\r\n" + _lines(
+            ("UID", uid),
+            ("RECURRENCE-ID", _timestamp(override.occurrence_start)),
+            ("DTSTAMP", _timestamp(override.updated_at)),
+            ("DTSTART", _timestamp(start)),
+            ("DTEND", _timestamp(end) if end else None),
+            ("SUMMARY", _escape(override.title or event.title)),
+            ("LOCATION", _escape(location) if location else None),
+        ) + "END:VEVENT\r\n"
+    vevent_cache.set(key, block)
+    return block
+
+def _render(name: str, events, overrides) -> str:
+    return (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Event API//Calendar Feed//EN\r\nCALSCALE:GREGORIAN\r\n"
+        + _lines(("X-WR-CALNAME", _escape(name)))
+        + "".join(_vevent(event, overrides.get(event.id, [])) for event in events)
+        + "END:VCALENDAR\r\n"
+    )
+
+# ---------- Serving ----------
+def feed_response(request: Request, db: Session, token: str) -> Response:
+    """
+    Serve a feed named by a signed token. A poll costs one aggregate query;
+    unchanged feeds answer 304 or come from cache, changed ones re-render only
+    the events whose VEVENT is not cached.
+    """
+    kind, user_id, nonce = read_feed_token(token)
+    # The owner is re-checked on every poll: a deactivated, demoted, moved or
+    # rotated user's URL stops working at once
+    user = crud.get_user(db, user_id=user_id)
+    owner_role = models.RoleEnum.STUDENT if kind == FeedKind.STUDENT else models.RoleEnum.HEAD
+    if user is None or not user.is_active or user.role != owner_role or user.feed_nonce != nonce:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    since = datetime.combine(datetime.utcnow().date(), datetime.min.time()) - timedelta(days=ICS_FEED_PAST_DAYS)
+    if kind == FeedKind.STUDENT:
+        subject = str(user.id)
+        scope = crud.feed_scope(since, student_id=user.id)
+        version = crud.feed_version(db, scope, student_id=user.id)
+        name = "My events"
+    else:
+        if not user.department:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+        subject = user.department
+        scope = crud.feed_scope(since, department=subject)
+        version = crud.feed_version(db, scope)
+        name = f"{subject} events"
+
+    etag = make_etag(kind.value, subject, since.isoformat(), *version)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={ICS_FEED_MAX_AGE_SECONDS}"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cached = feed_cache.get((kind, subject))
+    if cached is not None and cached[0] == etag:
+        body = cached[1]
+    else:
+        events, overrides = crud.feed_events(db, scope, since)
+        body = _render(name, events, overrides)
+        feed_cache.set((kind, subject), (etag, body))
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
+
+def stats() -> dict:
+    return {"feeds": feed_cache.stats(), "vevents": vevent_cache.stats()}
@@ -0,0 +1,142 @@
+import codecs
+import csv
+import json
+import os
+from collections import deque
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from event_api import crud
+from event_api.admission import WAITLIST_ENABLED, admission_gate
+from event_api.schemas import ConfirmationImportResult
+
+# Upload limits for bulk confirmation imports
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+IDENTIFIER_FIELDS = ("student_id", "email", "username")
+
+# (row number, parsed record or None, parse error or None)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+async def _lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def _in_quoted_field(line: str, quoted: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field after this line. As
+    for csv.reader, a quote only opens a field at the start of a cell; a stray
+    one inside an unquoted cell is kept as it is.
+    """
+    cell_start = not quoted
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if quoted:
+            if char == '"':
+                if line[index + 1:index + 2] == '"':
+                    index += 1
+                else:
+                    quoted = False
+        elif char == '"' and cell_start:
+            quoted = True
+        cell_start = not quoted and char == ","
+        index += 1
+    return quoted
+
+def _record(values: dict) -> Tuple[Optional[dict], Optional[str]]:
+    values = {key.strip().lower(): (value.strip() if isinstance(value, str) else value)
+              for key, value in values.items() if key}
+    if not any(values.get(field) for field in IDENTIFIER_FIELDS):
+        return None, "Missing student_id, email or username"
+    return values, None
+
+async def parse_confirmation_rows(request: Request) -> List[ParsedRow]:
+    """
+    Read an NDJSON (application/x-ndjson) or CSV upload of students to confirm.
+    Each row carries student_id, email or username, plus an optional note;
+    CSV uploads start with a header row. A one-column CSV without a recognised
+    header is read as emails.
+    """
+    ndjson = "ndjson" in request.headers.get("content-type", "") or "jsonl" in request.headers.get("content-type", "")
+    rows: List[ParsedRow] = []
+    header: Optional[List[str]] = None
+    number = 0
+    # One reader for the whole upload, fed line by line: a quoted cell may span
+    # lines, so a record is only handed over once it has left its quoted field
+    buffered = deque()
+    reader = csv.reader(iter(buffered.popleft, None))
+    quoted = False
+    async for line in _lines(request):
+        number += 1
+        if not quoted:
+            if not line.strip():
+                continue
+            first_line = number
+        if not ndjson:
+            buffered.append(line + "\n")
+            quoted = _in_quoted_field(line, quoted)
+            if quoted:
+                continue
+        if len(rows) >= IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Imports are limited to {IMPORT_MAX_ROWS} rows"
+            )
+        if ndjson:
+            try:
+                values = json.loads(line)
+            except ValueError:
+                rows.append((first_line, None, "Invalid JSON"))
+                continue
+            if not isinstance(values, dict):
+                rows.append((first_line, None, "Expected a JSON object"))
+                continue
+            values = {key: str(value) if value is not None else None for key, value in values.items()}
+        else:
+            cells = next(reader)
+            if header is None:
+                names = [cell.strip().lower() for cell in cells]
+                if any(field in names for field in IDENTIFIER_FIELDS):
+                    header = names
+                    continue
+                header = ["email"]
+            values = dict(zip(header, cells))
+        record, error = _record(values)
+        rows.append((first_line, record, error))
+    if quoted:
+        rows.append((first_line, None, "Unterminated quoted field"))
+    return rows
+
+def _run_import(db: Session, event_id, rows: List[ParsedRow]) -> ConfirmationImportResult:
+    with admission_gate.admit(event_id):
+        try:
+            return ConfirmationImportResult(**crud.import_event_confirmations(
+                db,
+                event_id=event_id,
+                rows=rows,
+                waitlist=WAITLIST_ENABLED,
+                batch_size=IMPORT_BATCH_SIZE
+            ))
+        except crud.EventNotFoundError:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+async def import_event_confirmations(request: Request, db: Session, event_id) -> ConfirmationImportResult:
+    """Shared body of the head and employee import endpoints."""
+    rows = await parse_confirmation_rows(request)
+    result = await run_in_threadpool(_run_import, db, event_id, rows)
+    result.errors = result.errors[:IMPORT_MAX_ERRORS]
+    return result
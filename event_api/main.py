@@ -1,19 +1,38 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from event_api.models import Base, User
-from event_api.dependencies import get_db, engine
-from event_api.auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from event_api.models import Base, User, NOTIFICATION_PARTITIONING
+from event_api.dependencies import get_db, engine, SessionLocal
+from event_api.auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, password_hasher
 from fastapi.security import OAuth2PasswordRequestForm
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import timedelta
 from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 
-from event_api.routers import admin, head, employee, student, auth
+from event_api.routers import admin, head, employee, student, auth, search, feeds
+from event_api.outbox import run_outbox_worker, OUTBOX_RUN_IN_APP
+from event_api.retention import run_retention_worker, ensure_notification_partitions, RETENTION_RUN_IN_APP
+from event_api.pagination import NEXT_CURSOR_HEADER
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Drain the notification outbox in-process unless a standalone worker does it
+    outbox_task = asyncio.create_task(run_outbox_worker()) if OUTBOX_RUN_IN_APP else None
+    # Periodic purge/archive job; also keeps notification partitions created ahead
+    retention_task = asyncio.create_task(run_retention_worker()) if RETENTION_RUN_IN_APP else None
+    yield
+    for task in (outbox_task, retention_task):
+        if task is not None:
+            task.cancel()
+    # Stop the bcrypt process pool
+    password_hasher.shutdown()
 
 app = FastAPI(
     title="Event Management API",
     description="API for managing events, opportunities, users, and notifications with role-based access control.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS Middleware
@@ -23,16 +42,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],  # Lets browsers read the pagination cursor and validators
 )
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+if NOTIFICATION_PARTITIONING:
+    # A partitioned table rejects inserts until a partition covers the row
+    with SessionLocal() as db:
+        ensure_notification_partitions(db)
 
 # Include routers
 app.include_router(admin.router)
 app.include_router(head.router)
 app.include_router(employee.router)
 app.include_router(student.router)
+app.include_router(search.router)
+app.include_router(feeds.router)
 
 @app.get("/")
 async def read_root():
@@ -0,0 +1,138 @@
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from event_api import crud, models, recurrence, retention
+from event_api.dependencies import SessionLocal
+
+def rebuild_counters(db):
+    rebuilt = crud.rebuild_notification_counters(db)
+    print(f"Rebuilt unread counters for {rebuilt} users.")
+
+def add_search_columns(db):
+    # create_all does not add columns to existing tables
+    for table, document in (
+        (models.Event.__table__, models.EVENT_SEARCH_DOCUMENT),
+        (models.Opportunity.__table__, models.OPPORTUNITY_SEARCH_DOCUMENT),
+    ):
+        db.execute(text(
+            f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({document}) STORED"
+        ))
+        for index in table.indexes:
+            if "search_vector" in index.columns:
+                db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("Search columns and indexes are in place.")
+
+def add_outbox_event_count(db):
+    # create_all does not add columns to existing tables
+    db.execute(text("ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS event_count integer"))
+    db.commit()
+    print("Outbox event_count column is in place.")
+
+def outbox_event_set_null(db):
+    # A batch announcement must outlive the event it links to
+    db.execute(text(
+        "ALTER TABLE notification_outbox ALTER COLUMN event_id DROP NOT NULL, "
+        "DROP CONSTRAINT IF EXISTS notification_outbox_event_id_fkey, "
+        "ADD CONSTRAINT notification_outbox_event_id_fkey FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE SET NULL"
+    ))
+    db.commit()
+    print("Outbox event links are ON DELETE SET NULL.")
+
+def add_event_soft_delete(db):
+    # create_all does not add columns to existing tables
+    db.execute(text("ALTER TABLE events ADD COLUMN IF NOT EXISTS deleted_at timestamp without time zone"))
+    for table in (models.Event.__table__, models.Notification.__table__, models.BroadcastNotification.__table__):
+        for index in table.indexes:
+            if index.name in ("ix_events_deleted", "ix_notifications_related_event", "ix_broadcast_notifications_related_event"):
+                db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("Event deleted_at column and purge indexes are in place.")
+
+def event_title_start_live_only(db):
+    # uq_event_title_start was a table constraint covering soft-deleted events too
+    db.execute(text("ALTER TABLE events DROP CONSTRAINT IF EXISTS uq_event_title_start"))
+    for index in models.Event.__table__.indexes:
+        if index.name == "uq_event_title_start":
+            db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("uq_event_title_start only covers live events.")
+
+def add_department_indexes(db):
+    # create_all does not add indexes to existing tables; events are covered by ix_events_department_start
+    for column in (models.User.__table__.c.department, models.Opportunity.__table__.c.department):
+        for index in column.table.indexes:
+            if list(index.columns) == [column]:
+                db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("Department indexes are in place.")
+
+def add_calendar_indexes(db):
+    # create_all does not add indexes to existing tables
+    for index in models.EventConfirmation.__table__.indexes:
+        if index.name == "ix_event_confirmations_student":
+            db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("Calendar indexes are in place.")
+
+def add_email_lower_index(db):
+    # create_all does not add indexes to existing tables
+    for index in models.User.__table__.indexes:
+        if index.name == "ix_users_email_lower":
+            db.execute(CreateIndex(index, if_not_exists=True))
+    db.commit()
+    print("Email lookup index is in place.")
+
+def add_feed_nonce(db):
+    # create_all does not add columns to existing tables
+    db.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS feed_nonce integer NOT NULL DEFAULT 0"))
+    db.commit()
+    print("User feed_nonce column is in place.")
+
+def cap_endless_series(db):
+    # Series stored before the recurrence horizon have until = NULL, which the calendar range scans skip
+    capped = db.execute(text(
+        "UPDATE event_recurrences SET until = events.start_time + make_interval(days => :days) "
+        "FROM events WHERE events.id = event_recurrences.event_id AND event_recurrences.until IS NULL"
+    ), {"days": recurrence.RECURRENCE_HORIZON_DAYS}).rowcount
+    db.commit()
+    print(f"Capped {capped} endless series at {recurrence.RECURRENCE_HORIZON_DAYS} days.")
+
+def purge(db):
+    for rule, affected in retention.run_retention(db).items():
+        print(f"{rule}: {affected}")
+
+def create_partitions(db):
+    retention.ensure_notification_partitions(db)
+    print("Notification partitions are in place.")
+
+COMMANDS = {
+    "rebuild-counters": rebuild_counters,
+    "purge": purge,
+    "create-partitions": create_partitions,
+    "add-search-columns": add_search_columns,
+    "add-outbox-event-count": add_outbox_event_count,
+    "outbox-event-set-null": outbox_event_set_null,
+    "add-event-soft-delete": add_event_soft_delete,
+    "event-title-start-live-only": event_title_start_live_only,
+    "add-department-indexes": add_department_indexes,
+    "add-calendar-indexes": add_calendar_indexes,
+    "add-email-lower-index": add_email_lower_index,
+    "cap-endless-series": cap_endless_series,
+    "add-feed-nonce": add_feed_nonce,
+}
+
+if __name__ == "__main__":
+    # Usage: python -m event_api.maintenance <command>
+    parser = argparse.ArgumentParser(description="Maintenance commands for the Event API database.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        COMMANDS[args.command](db)
+    finally:
+        db.close()
@@ -1,15 +1,33 @@
 import enum
+import os
 import uuid
 from datetime import datetime
 
 from sqlalchemy import (
-    Column, String, DateTime, Integer, Text, Boolean, Enum, ForeignKey, UniqueConstraint
+    Column, String, DateTime, Integer, Text, Boolean, Enum, ForeignKey, UniqueConstraint, Index, Computed, event, exists, func, text
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import Session, relationship, declarative_base, deferred, with_loader_criteria
 
 Base = declarative_base()
 
+# Create `notifications` as a table range-partitioned by month on created_at, so
+# retention can drop whole partitions (see event_api/retention.py). Only applies
+# when the table is created; an existing table has to be migrated by hand.
+NOTIFICATION_PARTITIONING = os.getenv("NOTIFICATION_PARTITIONING", "false").lower() == "true"
+
+# Full-text documents behind /search, weighted title > location > description.
+# Stored generated columns, so PostgreSQL keeps them current on every write.
+EVENT_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+OPPORTUNITY_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
 # ---------- Enums ----------
 class RoleEnum(str, enum.Enum):
     ADMIN = "admin"
@@ -27,6 +45,11 @@ class NotificationTypeEnum(str, enum.Enum):
     OPPORTUNITY = "opportunity"
     SYSTEM = "system"
 
+class OutboxStatusEnum(str, enum.Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
 # ---------- User ----------
 class User(Base):
     __tablename__ = "users"
@@ -37,8 +60,10 @@ class User(Base):
     full_name = Column(String(200), nullable=True)
     hashed_password = Column(String(1024), nullable=False)
     role = Column(Enum(RoleEnum), nullable=False, default=RoleEnum.STUDENT)
-    department = Column(String(200), nullable=True)  # useful for Head/Employee grouping
+    department = Column(String(200), nullable=True, index=True)  # useful for Head/Employee grouping
     is_active = Column(Boolean, default=True, nullable=False)
+    # Part of every calendar feed URL issued to the user; bumping it revokes them
+    feed_nonce = Column(Integer, nullable=False, default=0, server_default=text("0"))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -46,13 +71,24 @@ class User(Base):
     created_events = relationship("Event", back_populates="creator", cascade="none")
     confirmations = relationship("EventConfirmation", back_populates="student", cascade="all, delete-orphan")
     notifications = relationship("Notification", back_populates="recipient", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+
+# Case-insensitive email lookups (confirmation imports) match on lower(email)
+Index("ix_users_email_lower", func.lower(User.email))
 
 # ---------- Event ----------
 class Event(Base):
     __tablename__ = "events"
     __table_args__ = (
-        # Prevent duplicate events with same title/time in same department (example)
-        UniqueConstraint("title", "start_time", name="uq_event_title_start"),
+        # Prevent duplicate events with same title/time; a soft-deleted event frees its slot
+        Index("uq_event_title_start", "title", "start_time", unique=True, postgresql_where=text("deleted_at IS NULL")),
+        # Calendar range scans: one per calendar_view filter, with id as the pagination tie-breaker
+        Index("ix_events_department_start", "department", "start_time", "id"),
+        Index("ix_events_creator_start", "creator_id", "start_time", "id"),
+        Index("ix_events_public_start", "start_time", "id", postgresql_where=text("is_public = true")),
+        Index("ix_events_search", "search_vector", postgresql_using="gin"),
+        # Soft-deleted events awaiting the purge in event_api/retention.py
+        Index("ix_events_deleted", "deleted_at", postgresql_where=text("deleted_at IS NOT NULL")),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -72,25 +108,77 @@ class Event(Base):
     # Confirmation count MUST be present (application updates this)
     confirmation_count = Column(Integer, nullable=False, default=0)
 
+    search_vector = deferred(Column(TSVECTOR, Computed(EVENT_SEARCH_DOCUMENT, persisted=True)))
+
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Set by crud.delete_event; the row and its dependents are purged in batches later
+    deleted_at = Column(DateTime, nullable=True)
 
     # Relationships
     creator = relationship("User", back_populates="created_events")
-    confirmations = relationship("EventConfirmation", back_populates="event", cascade="all, delete-orphan")
+    # passive_deletes: removing an event never loads its confirmations, the database cascades
+    confirmations = relationship("EventConfirmation", back_populates="event", cascade="all, delete-orphan", passive_deletes=True)
+    recurrence = relationship("EventRecurrence", uselist=False, lazy="selectin", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def recurrence_rule(self):
+        return self.recurrence.rule if self.recurrence else None
+
+# ---------- EventRecurrence ----------
+class EventRecurrence(Base):
+    """
+    Makes an event a series: start_time/end_time describe the first occurrence and
+    the rule (RRULE subset, see event_api/recurrence.py) the rest. Occurrences are
+    expanded on read and never stored.
+    """
+    __tablename__ = "event_recurrences"
+    __table_args__ = (
+        # Series overlapping a calendar window: started before its end, not ended before its start
+        Index("ix_event_recurrences_until", "until"),
+    )
+
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    rule = Column(String(255), nullable=False)
+    # Start of the last occurrence, or an upper bound for it; endless rules end at the recurrence horizon.
+    # Nullable only for rows written before the horizon (maintenance cap-endless-series)
+    until = Column(DateTime, nullable=True)
+
+# ---------- EventOccurrenceOverride ----------
+class EventOccurrenceOverride(Base):
+    """Changes to a single occurrence of a series, keyed by its original start time."""
+    __tablename__ = "event_occurrence_overrides"
+    __table_args__ = (
+        # Occurrences moved into a calendar window from outside it
+        Index("ix_event_occurrence_overrides_start", "start_time"),
+    )
+
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    occurrence_start = Column(DateTime, primary_key=True)
+    cancelled = Column(Boolean, default=False, nullable=False)
+    title = Column(String(255), nullable=True)
+    location = Column(String(255), nullable=True)
+    start_time = Column(DateTime, nullable=True)
+    end_time = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 # ---------- Opportunity ----------
 class Opportunity(Base):
     __tablename__ = "opportunities"
+    __table_args__ = (
+        Index("ix_opportunities_search", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     link = Column(String(1024), nullable=True)
-    department = Column(String(200), nullable=True)
+    department = Column(String(200), nullable=True, index=True)
     posted_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     posted_by_role = Column(Enum(RoleEnum), nullable=False)
 
+    search_vector = deferred(Column(TSVECTOR, Computed(OPPORTUNITY_SEARCH_DOCUMENT, persisted=True)))
+
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -102,6 +190,10 @@ class EventConfirmation(Base):
     __tablename__ = "event_confirmations"
     __table_args__ = (
         UniqueConstraint("event_id", "student_id", name="uq_event_student"),
+        # A student's confirmations: their listing, and the confirmed branch of the student calendar
+        Index("ix_event_confirmations_student", "student_id", "confirmed_at", "id"),
+        # Waitlist order per event; only PENDING rows are indexed
+        Index("ix_event_confirmations_waitlist", "event_id", "confirmed_at", "id", postgresql_where=text("status = 'PENDING'")),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -117,9 +209,48 @@ class EventConfirmation(Base):
     event = relationship("Event", back_populates="confirmations")
     student = relationship("User", back_populates="confirmations")
 
+# ---------- EventOccurrenceConfirmation ----------
+class EventOccurrenceConfirmation(Base):
+    """A student's confirmation for one occurrence of a recurring event."""
+    __tablename__ = "event_occurrence_confirmations"
+    __table_args__ = (
+        UniqueConstraint("event_id", "occurrence_start", "student_id", name="uq_event_occurrence_student"),
+        Index("ix_event_occurrence_confirmations_student", "student_id", "event_id"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    occurrence_start = Column(DateTime, nullable=False)
+    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(Enum(ConfirmationStatusEnum), nullable=False, default=ConfirmationStatusEnum.CONFIRMED)
+    note = Column(Text, nullable=True)
+    confirmed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+# ---------- EventConfirmationArchive ----------
+class EventConfirmationArchive(Base):
+    """Confirmations of long-past events, moved out of event_confirmations by the retention job."""
+    __tablename__ = "event_confirmations_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    event_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    student_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    status = Column(Enum(ConfirmationStatusEnum), nullable=False)
+    note = Column(Text, nullable=True)
+    confirmed_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 # ---------- Notification ----------
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Keeps unread lookups and mark-all-read proportional to the unread backlog
+        Index("ix_notifications_recipient_unread", "recipient_id", postgresql_where=text("is_read = false")),
+        # Lets the event purge find the notifications to unlink without scanning the table
+        Index("ix_notifications_related_event", "related_event_id", postgresql_where=text("related_event_id IS NOT NULL")),
+        {"postgresql_partition_by": "RANGE (created_at)"} if NOTIFICATION_PARTITIONING else {},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     recipient_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -129,7 +260,134 @@ class Notification(Base):
     related_event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="SET NULL"), nullable=True)
     related_opportunity_id = Column(UUID(as_uuid=True), ForeignKey("opportunities.id", ondelete="SET NULL"), nullable=True)
     is_read = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Part of the primary key when partitioned: PostgreSQL requires the partition key in it
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=NOTIFICATION_PARTITIONING)
 
     recipient = relationship("User", back_populates="notifications")
     # optional: relations to event/opportunity if you need backrefs (left out to keep simple)
+
+# Listing index: unread-only and full pages are range scans in created_at order
+Index(
+    "ix_notifications_recipient_read_created",
+    Notification.recipient_id,
+    Notification.is_read,
+    Notification.created_at.desc()
+)
+
+# ---------- NotificationCounter ----------
+class NotificationCounter(Base):
+    """
+    Unread personal notifications per user, kept in the same transaction as every
+    notification insert, read toggle and delete. Rebuilt by `python -m event_api.maintenance rebuild-counters`.
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+# ---------- BroadcastNotification ----------
+class BroadcastNotification(Base):
+    """
+    One row per announcement, shown to every user matching the target role/department
+    (NULL targets everyone). Read state lives in BroadcastReceipt and NotificationReadMarker.
+    """
+    __tablename__ = "broadcast_notifications"
+    __table_args__ = (
+        Index("ix_broadcast_notifications_related_event", "related_event_id", postgresql_where=text("related_event_id IS NOT NULL")),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    title = Column(String(255), nullable=False)
+    body = Column(Text, nullable=True)
+    type = Column(Enum(NotificationTypeEnum), nullable=False, default=NotificationTypeEnum.SYSTEM)
+    target_role = Column(Enum(RoleEnum), nullable=True)
+    target_department = Column(String(200), nullable=True)
+    related_event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="SET NULL"), nullable=True)
+    related_opportunity_id = Column(UUID(as_uuid=True), ForeignKey("opportunities.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+# ---------- BroadcastReceipt ----------
+class BroadcastReceipt(Base):
+    """Marks a single broadcast as read by a user."""
+    __tablename__ = "broadcast_receipts"
+
+    broadcast_id = Column(UUID(as_uuid=True), ForeignKey("broadcast_notifications.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    read_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# ---------- NotificationReadMarker ----------
+class NotificationReadMarker(Base):
+    """Per-user watermark set by mark-all-read: broadcasts created up to it count as read."""
+    __tablename__ = "notification_read_markers"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    broadcasts_read_before = Column(DateTime, nullable=False)
+
+# ---------- RefreshToken ----------
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)  # sha256 of the opaque token, never the token itself
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)  # set on rotation, password change or reuse detection
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    user = relationship("User", back_populates="refresh_tokens")
+
+# ---------- NotificationOutbox ----------
+class NotificationOutbox(Base):
+    """
+    Pending event-creation notifications, written in the same transaction as the event
+    and delivered by the background worker in event_api/outbox.py.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pending",
+            "available_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # The announced event. For a batch it is only the first of them, so deleting
+    # that event clears the link rather than dropping the batch announcement;
+    # single-event records are removed with their event by retention.purge_deleted_event
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="SET NULL"), nullable=True)
+    title = Column(String(255), nullable=False)
+    body = Column(Text, nullable=True)
+    # Set for a batch of events announced together
+    event_count = Column(Integer, nullable=True)
+    status = Column(Enum(OutboxStatusEnum), nullable=False, default=OutboxStatusEnum.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+# ---------- Soft-deleted events ----------
+_events = Event.__table__
+
+def _about_live_event(column):
+    # Core table rather than Event, so the Event criteria below are not applied inside it
+    return ~exists().where(_events.c.id == column, _events.c.deleted_at.isnot(None))
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted_events(execute_state):
+    """
+    Every ORM SELECT skips soft-deleted events and their confirmations until
+    the purge removes them. Pass execution_options(include_deleted=True) to
+    see them.
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(Event, lambda cls: cls.deleted_at.is_(None), include_aliases=True),
+            with_loader_criteria(EventConfirmation, lambda cls: _about_live_event(cls.event_id), include_aliases=True),
+        )
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from event_api import crud, models
+from event_api.dependencies import SessionLocal
+from event_api.realtime import notification_hub
+
+logger = logging.getLogger(__name__)
+
+# Worker configuration
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RUN_IN_APP = os.getenv("OUTBOX_RUN_IN_APP", "true").lower() == "true"
+
+def _claim_due(db: Session, batch_size: int):
+    """Lock due outbox records; rows held by other workers are skipped."""
+    return db.query(models.NotificationOutbox).filter(
+        models.NotificationOutbox.status == models.OutboxStatusEnum.PENDING,
+        models.NotificationOutbox.available_at <= datetime.utcnow()
+    ).order_by(models.NotificationOutbox.available_at).limit(batch_size).with_for_update(skip_locked=True).all()
+
+def _announces_one_event(item: models.NotificationOutbox) -> bool:
+    return (item.event_count or 1) <= 1
+
+def _deleted_events(db: Session, event_ids) -> set:
+    """
+    The soft-deleted events among event_ids. Their outbox records outlive them
+    until retention purges the event, and must not be announced meanwhile.
+    """
+    event_ids = [event_id for event_id in event_ids if event_id is not None]
+    if not event_ids:
+        return set()
+    return set(db.execute(
+        select(models.Event.id)
+        .where(models.Event.id.in_(event_ids), models.Event.deleted_at.isnot(None))
+        .execution_options(include_deleted=True)
+    ).scalars())
+
+def process_outbox_batch(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Deliver up to batch_size due outbox records. Each record is delivered in
+    its own savepoint so one failure does not roll back the rest.
+    Returns the number of records claimed.
+    """
+    items = _claim_due(db, batch_size)
+    withdrawn = _deleted_events(db, [item.event_id for item in items if _announces_one_event(item)])
+    delivered = []
+    failures = []
+    for item in items:
+        item_id = item.id
+        if _announces_one_event(item) and (item.event_id is None or item.event_id in withdrawn):
+            # The event was deleted before its announcement went out
+            item.status = models.OutboxStatusEnum.DONE
+            item.processed_at = datetime.utcnow()
+            continue
+        try:
+            with db.begin_nested():
+                broadcast = crud.send_event_notifications_to_students(
+                    db,
+                    event_id=item.event_id,
+                    title=item.title,
+                    description=item.body,
+                    commit=False,
+                    event_count=item.event_count
+                )
+                item.status = models.OutboxStatusEnum.DONE
+                item.processed_at = datetime.utcnow()
+            delivered.append(broadcast)
+        except Exception as e:
+            logger.exception("Outbox delivery failed for %s", item_id)
+            failures.append((item_id, e))
+    db.commit()
+    for broadcast in delivered:
+        notification_hub.publish_broadcast(broadcast)
+    for item_id, error in failures:
+        _record_failure(db, item_id, error)
+    return len(items)
+
+def _record_failure(db: Session, item_id, error: Exception) -> None:
+    item = db.query(models.NotificationOutbox).filter(models.NotificationOutbox.id == item_id).first()
+    if item is None:
+        return
+    item.attempts += 1
+    item.last_error = str(error)
+    if item.attempts >= OUTBOX_MAX_ATTEMPTS:
+        item.status = models.OutboxStatusEnum.FAILED
+    else:
+        # Exponential backoff, capped at 5 minutes
+        item.available_at = datetime.utcnow() + timedelta(seconds=min(2 ** item.attempts, 300))
+    db.commit()
+
+def drain_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Process due records until the outbox is empty. Returns the number processed."""
+    processed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            claimed = process_outbox_batch(db, batch_size=batch_size)
+            if not claimed:
+                break
+            processed += claimed
+    finally:
+        db.close()
+    return processed
+
+async def run_outbox_worker() -> None:
+    """Asyncio task started by the app; the blocking work runs in the threadpool."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, drain_outbox)
+        except Exception:
+            logger.exception("Outbox worker iteration failed")
+        await asyncio.sleep(OUTBOX_POLL_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    # Standalone worker: python -m event_api.outbox
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        drain_outbox()
+        time.sleep(OUTBOX_POLL_INTERVAL_SECONDS)
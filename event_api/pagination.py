@@ -0,0 +1,95 @@
+import base64
+import os
+from datetime import datetime
+from typing import Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Page size limits; a larger `limit` is clamped to MAX_PAGE_SIZE
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(sort_value: Union[datetime, float], id: UUID) -> str:
+    """Opaque cursor for a (sort_value, id) position. Numeric sort values (search rank) are tagged with '#'."""
+    value = sort_value.isoformat() if isinstance(sort_value, datetime) else f"#{float(sort_value)!r}"
+    raw = f"{value},{id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[Union[datetime, float], UUID]:
+    try:
+        sort_value, id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(",", 1)
+        if sort_value.startswith("#"):
+            return float(sort_value[1:]), UUID(id)
+        return datetime.fromisoformat(sort_value), UUID(id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+class PageParams:
+    """
+    Query parameters shared by every listing. `cursor` is the X-Next-Cursor of
+    the previous page; `skip` is only honoured without one.
+    """
+
+    def __init__(
+        self,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1),
+        cursor: Optional[str] = None
+    ):
+        self.skip = skip
+        self.limit = page_size(limit)
+        self.cursor = decode_cursor(cursor) if cursor else None
+
+    def apply(self, query, sort_column, id_column, descending: bool = True):
+        return paginate(query, sort_column, id_column, self.skip, self.limit, self.cursor, descending=descending)
+
+def keyset_after(sort_column, id_column, cursor: Optional[Tuple[Union[datetime, float], UUID]], descending: bool = True):
+    """
+    Predicate for rows past the cursor in (sort_column, id) order.
+    Spelled out instead of a row comparison so an index on sort_column bounds the scan.
+    """
+    if cursor is None:
+        return None
+    sort_value, id = cursor
+    if descending:
+        return and_(sort_column <= sort_value, or_(sort_column < sort_value, id_column < id))
+    return and_(sort_column >= sort_value, or_(sort_column > sort_value, id_column > id))
+
+def paginate(
+    query,
+    sort_column,
+    id_column,
+    skip: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[Tuple[Union[datetime, float], UUID]] = None,
+    descending: bool = True
+):
+    """
+    Order a Query or Select by (sort_column, id_column) and cut one page from it.
+    The id tie-breaker keeps the order stable; the page size is capped.
+    """
+    if cursor is not None:
+        if not isinstance(cursor[0], sort_column.type.python_type):
+            # A cursor issued by a listing with a different sort order
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(keyset_after(sort_column, id_column, cursor, descending=descending))
+    elif skip:
+        query = query.offset(skip)
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+    return query.limit(page_size(limit))
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, sort_key: str = "created_at") -> None:
+    """Expose the cursor of the next page in a response header when the page is full."""
+    if rows and len(rows) >= page_size(limit):
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_key), last.id)
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+from event_api import crud
+from event_api.dependencies import SessionLocal
+from event_api.pagination import encode_cursor
+from event_api.schemas import NotificationRead, UserRead
+
+# Stream configuration
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_REPLAY_LIMIT = int(os.getenv("SSE_REPLAY_LIMIT", "100"))
+# created_at is set at flush, so a transaction can commit an entry older than
+# one already streamed; catch-up re-reads this much before its cursor
+SSE_CATCH_UP_OVERLAP_SECONDS = float(os.getenv("SSE_CATCH_UP_OVERLAP_SECONDS", "10"))
+
+class Subscription:
+    def __init__(self, user: UserRead, loop: asyncio.AbstractEventLoop):
+        self.user = user
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+
+    def wants_broadcast(self, target_role, target_department) -> bool:
+        return (target_role is None or target_role == self.user.role) and \
+            (target_department is None or target_department == self.user.department)
+
+    def push(self, message: dict) -> None:
+        # Called from any thread; the queue itself is only touched on the loop
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client misses live pushes; the heartbeat catch-up query fills the gap
+            pass
+
+class NotificationHub:
+    """
+    In-process pub/sub for live notifications. Each worker process only sees the
+    notifications it created itself; streams catch up from the database on every
+    heartbeat for the rest.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user: UserRead) -> Subscription:
+        subscription = Subscription(user, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(str(user.id), set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        key = str(subscription.user.id)
+        with self._lock:
+            subscriptions = self._subscriptions.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[key]
+
+    def _for_user(self, user_id):
+        with self._lock:
+            return list(self._subscriptions.get(str(user_id), ()))
+
+    # Messages only wake the matching streams; the entries are read from the feed
+    def publish_notification(self, notification) -> None:
+        for subscription in self._for_user(notification.recipient_id):
+            subscription.push({"event": "notification"})
+
+    def publish_broadcast(self, broadcast) -> None:
+        with self._lock:
+            subscriptions = [s for subs in self._subscriptions.values() for s in subs]
+        for subscription in subscriptions:
+            if subscription.wants_broadcast(broadcast.target_role, broadcast.target_department):
+                subscription.push({"event": "broadcast"})
+
+    def publish_read_state(self, user_id) -> None:
+        for subscription in self._for_user(user_id):
+            subscription.push({"event": "read_state"})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connections": sum(len(subs) for subs in self._subscriptions.values()),
+                "users": len(self._subscriptions),
+            }
+
+notification_hub = NotificationHub()
+
+# ---------- Stream ----------
+def _format_event(event: str, data: dict, id: Optional[str] = None) -> str:
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def _with_session(fn, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def notification_event_stream(request: Request, user: UserRead, after: Optional[Tuple[datetime, UUID]] = None):
+    """
+    Server-sent events: `notification` for new feed entries (id is a resumable
+    cursor) and `unread_count` whenever the count may have changed.
+    `after` is the decoded Last-Event-ID to replay from.
+
+    Each catch-up re-reads SSE_CATCH_UP_OVERLAP_SECONDS before the newest
+    entry streamed, so entries committed late still arrive; ids already sent
+    on this stream are skipped. A resumed stream re-reads that window as well,
+    so its replay may repeat entries the client already has (same id).
+    """
+    subscription = notification_hub.subscribe(user)
+    resume = after is not None
+    after = after or (None, None)
+    overlap = timedelta(seconds=SSE_CATCH_UP_OVERLAP_SECONDS)
+    # id -> created_at of entries streamed within the overlap window
+    sent: Dict[UUID, datetime] = {}
+    try:
+        async def catch_up(stream: bool = True):
+            nonlocal after
+            chunks = []
+            if after[0] is None:
+                cursor = (None, None)
+            else:
+                cursor = (after[0] - overlap, UUID(int=0))
+            while len(chunks) < SSE_REPLAY_LIMIT:
+                entries = await run_in_threadpool(
+                    _with_session, crud.get_notification_feed_since, user, cursor[0], cursor[1], SSE_REPLAY_LIMIT
+                )
+                for entry in entries:
+                    cursor = (entry.created_at, entry.id)
+                    if entry.id in sent:
+                        continue
+                    sent[entry.id] = entry.created_at
+                    if after[0] is None or cursor > after:
+                        after = cursor
+                    if stream:
+                        chunks.append(_format_event(
+                            "notification",
+                            NotificationRead.model_validate(entry).model_dump(mode="json"),
+                            id=encode_cursor(entry.created_at, entry.id)
+                        ))
+                if len(entries) < SSE_REPLAY_LIMIT:
+                    break
+            if after[0] is not None:
+                for entry_id, created_at in list(sent.items()):
+                    if created_at < after[0] - overlap:
+                        del sent[entry_id]
+            return chunks
+
+        async def unread_count():
+            count = await run_in_threadpool(_with_session, crud.count_unread_notifications, user)
+            return _format_event("unread_count", {"unread_count": count})
+
+        # Replay what was missed since Last-Event-ID, or start from now
+        if resume:
+            for chunk in await catch_up():
+                yield chunk
+        else:
+            latest = await run_in_threadpool(_with_session, crud.get_notification_feed, user, 0, 1)
+            if latest:
+                after = (latest[0].created_at, latest[0].id)
+                # Entries up to now count as seen, including the overlap window before them
+                await catch_up(stream=False)
+        yield await unread_count()
+
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                chunks = await catch_up()
+                for chunk in chunks:
+                    yield chunk
+                if chunks:
+                    yield await unread_count()
+                continue
+
+            # Drain everything queued, then send a single unread_count update
+            messages = [message]
+            while not subscription.queue.empty():
+                messages.append(subscription.queue.get_nowait())
+            if any(m["event"] in ("notification", "broadcast") for m in messages):
+                for chunk in await catch_up():
+                    yield chunk
+            yield await unread_count()
+    finally:
+        notification_hub.unsubscribe(subscription)
@@ -0,0 +1,168 @@
+import calendar
+import os
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Tuple
+
+# Supported RRULE subset (RFC 5545): FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY
+# (weekly only, plain weekday codes), COUNT and UNTIL. Monthly rules repeat on
+# the day of month of the first occurrence; months without that day are skipped.
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_COUNT = 1000
+# Rules without COUNT or UNTIL are expanded this far past their first occurrence,
+# so every stored series has an end that calendar range scans can use
+RECURRENCE_HORIZON_DAYS = int(os.getenv("RECURRENCE_HORIZON_DAYS", "730"))
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Times are stored and expanded as naive UTC; convert an aware input ("...Z", "+02:00") to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid UNTIL value: {value}")
+
+def parse_rule(rule: str) -> RecurrenceRule:
+    """Parse an RRULE string such as "FREQ=WEEKLY;BYDAY=TU,TH;COUNT=20". Raises ValueError."""
+    parts = {}
+    for part in rule.strip().removeprefix("RRULE:").split(";"):
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Invalid RRULE part: {part}")
+        parts[key.upper()] = value.upper()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+    except ValueError:
+        raise ValueError("INTERVAL and COUNT must be integers")
+    parts.pop("COUNT", None)
+    if interval < 1:
+        raise ValueError("INTERVAL must be positive")
+    if count is not None and not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL cannot be combined")
+    byday: Tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(day) for day in parts.pop("BYDAY").split(",")}))
+        except ValueError:
+            raise ValueError("BYDAY must list weekday codes (MO..SU)")
+    if parts:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+    return RecurrenceRule(freq=freq, interval=interval, byday=byday, count=count, until=until)
+
+def _add_months(value: datetime, months: int) -> Optional[datetime]:
+    month = value.month - 1 + months
+    year, month = value.year + month // 12, month % 12 + 1
+    if value.day > calendar.monthrange(year, month)[1]:
+        return None
+    return value.replace(year=year, month=month)
+
+def _daily(rule: RecurrenceRule, dtstart: datetime, window_start: datetime) -> Iterator[Tuple[int, datetime]]:
+    step = timedelta(days=rule.interval)
+    # Jump straight to the first occurrence at or after window_start
+    index = max(0, -((dtstart - window_start) // step))
+    while True:
+        yield index, dtstart + index * step
+        index += 1
+
+def _weekly(rule: RecurrenceRule, dtstart: datetime, window_start: datetime) -> Iterator[Tuple[int, datetime]]:
+    days = rule.byday or (dtstart.weekday(),)
+    week_zero = dtstart - timedelta(days=dtstart.weekday())
+    period = timedelta(weeks=rule.interval)
+    # Occurrences in the first week before dtstart do not exist and are not counted
+    first_week = [day for day in days if day >= dtstart.weekday()]
+    start_period = max(0, (window_start - week_zero) // period)
+    index = 0 if start_period == 0 else len(first_week) + (start_period - 1) * len(days)
+    number = start_period
+    while True:
+        week_start = week_zero + number * period
+        for day in (first_week if number == 0 else days):
+            yield index, week_start + timedelta(days=day)
+            index += 1
+        number += 1
+
+def _monthly(rule: RecurrenceRule, dtstart: datetime, window_start: datetime) -> Iterator[Tuple[int, datetime]]:
+    # Skipped months do not count towards COUNT, so walk from the start (12 steps a year)
+    index = 0
+    number = 0
+    while True:
+        occurrence = _add_months(dtstart, number * rule.interval)
+        number += 1
+        if occurrence is None:
+            continue
+        yield index, occurrence
+        index += 1
+
+_EXPANDERS = {"DAILY": _daily, "WEEKLY": _weekly, "MONTHLY": _monthly}
+
+def bounded(rule: RecurrenceRule, dtstart: datetime) -> RecurrenceRule:
+    """The rule as it is expanded: an endless one gets UNTIL at the horizon."""
+    if rule.count is None and rule.until is None:
+        return replace(rule, until=dtstart + timedelta(days=RECURRENCE_HORIZON_DAYS))
+    return rule
+
+def occurrences(rule: RecurrenceRule, dtstart: datetime, window_start: datetime, window_end: datetime) -> Iterator[datetime]:
+    """Start times of the occurrences in [window_start, window_end], in order. Nothing is stored."""
+    rule = bounded(rule, dtstart)
+    for index, occurrence in _EXPANDERS[rule.freq](rule, dtstart, window_start):
+        if occurrence > window_end:
+            return
+        if rule.count is not None and index >= rule.count:
+            return
+        if rule.until is not None and occurrence > rule.until:
+            return
+        if occurrence >= window_start:
+            yield occurrence
+
+def is_occurrence(rule: RecurrenceRule, dtstart: datetime, value: datetime) -> bool:
+    return next(occurrences(rule, dtstart, value, value), None) == value
+
+def series_end(rule: RecurrenceRule, dtstart: datetime) -> datetime:
+    """Start of the last occurrence, or an upper bound for it (UNTIL, the horizon)."""
+    rule = bounded(rule, dtstart)
+    if rule.until is not None:
+        return rule.until
+    last = None
+    for index, occurrence in _EXPANDERS[rule.freq](rule, dtstart, dtstart):
+        if index >= rule.count:
+            break
+        last = occurrence
+    return last
+
+def format_rule(rule: RecurrenceRule) -> str:
+    """Canonical RRULE value, with UNTIL in UTC form as iCalendar requires for UTC start times."""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.byday:
+        parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in rule.byday))
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until is not None:
+        parts.append("UNTIL=" + rule.until.strftime("%Y%m%dT%H%M%SZ"))
+    return ";".join(parts)
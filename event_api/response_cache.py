@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from event_api.conditional import etag_matches
+
+# "off" (default), "redis" (shared between workers) or "memory" (per process).
+# The in-process backend is only invalidated by writes made in the same
+# process, so it is refused when WEB_CONCURRENCY runs several workers.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "off").lower()
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Only reclaims entries orphaned by invalidation; freshness never depends on it
+RESPONSE_CACHE_REDIS_EXPIRE_SECONDS = int(os.getenv("RESPONSE_CACHE_REDIS_EXPIRE_SECONDS", "86400"))
+
+# Headers replayed from a cached response
+_STORED_HEADERS = ("etag", "last-modified", "cache-control", "x-next-cursor")
+
+class MemoryBackend:
+    """
+    LRU of serialized responses bounded by total body size, plus per-namespace
+    generations. Invalidation only bumps a generation: entries of older ones
+    can no longer be hit and age out of the LRU.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, entry: Tuple[str, bytes]) -> None:
+        size = len(entry[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._data[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, body) = self._data.popitem(last=False)
+                self.bytes -= len(body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+class RedisBackend:
+    """Shared backend; generations are Redis counters, so a write in any worker invalidates all of them."""
+
+    def __init__(self, url: str, expire_seconds: int):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self.expire_seconds = expire_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        return int(self._client.get(f"response-cache:generation:{namespace}") or 0)
+
+    def invalidate(self, namespace: str) -> None:
+        self._client.incr(f"response-cache:generation:{namespace}")
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        raw = self._client.get(f"response-cache:{key}")
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        headers, _, body = raw.partition(b"\n")
+        return headers.decode("utf-8"), body
+
+    def set(self, key: str, entry: Tuple[str, bytes]) -> None:
+        headers, body = entry
+        self._client.set(f"response-cache:{key}", headers.encode("utf-8") + b"\n" + body, ex=self.expire_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            hits, misses = self.hits, self.misses
+        memory = self._client.info("memory")
+        return {
+            "backend": "redis",
+            "bytes": memory.get("used_memory"),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+def _create_backend():
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL, RESPONSE_CACHE_REDIS_EXPIRE_SECONDS)
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        raise RuntimeError("RESPONSE_CACHE_BACKEND=memory would serve stale responses across workers; use redis or off")
+    return MemoryBackend(RESPONSE_CACHE_MAX_BYTES)
+
+backend = _create_backend()
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+def _serialize(response_model, content) -> bytes:
+    adapter = _adapters.get(response_model)
+    if adapter is None:
+        adapter = _adapters[response_model] = TypeAdapter(response_model)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+def invalidate_responses(namespace: str) -> None:
+    """
+    Drop every cached response built from `namespace` ("events", "event-seats",
+    "opportunities"). Called by crud after commits.
+    """
+    if backend is not None:
+        backend.invalidate(namespace)
+
+def cached_response(request: Request, response: Response, namespace: str, scope: str, response_model, build: Callable[[], Any], also: Tuple[str, ...] = ()):
+    """
+    Serve a response identical for everyone in `scope` from already-serialized
+    bytes, keyed by route and query parameters. On a miss `build` runs the
+    endpoint body; it may return a Response (e.g. a 304), which is passed
+    through uncached. Entries live until a write invalidates their namespace,
+    or one of the `also` namespaces they depend on.
+    """
+    if backend is None:
+        return build()
+    # Read before building, so a write that lands meanwhile orphans this entry instead of going stale
+    generation = ".".join(str(backend.generation(name)) for name in (namespace,) + also)
+    params = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    key = f"{namespace}:{generation}:{request.url.path}?{params}:{scope}"
+
+    entry = backend.get(key)
+    if entry is not None:
+        headers = json.loads(entry[0])
+        if "etag" in headers and etag_matches(request, headers["etag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry[1], media_type="application/json", headers=headers)
+
+    content = build()
+    if isinstance(content, Response):
+        return content
+    body = _serialize(response_model, content)
+    headers = {name: value for name, value in response.headers.items() if name in _STORED_HEADERS}
+    backend.set(key, (json.dumps(headers), body))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def stats() -> Optional[dict]:
+    return backend.stats() if backend is not None else None
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, or_, select, text, tuple_, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from event_api import crud, models
+from event_api.dependencies import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Retention policy; 0 disables a rule
+READ_NOTIFICATION_RETENTION_DAYS = int(os.getenv("READ_NOTIFICATION_RETENTION_DAYS", "90"))
+BROADCAST_RETENTION_DAYS = int(os.getenv("BROADCAST_RETENTION_DAYS", "180"))
+CONFIRMATION_ARCHIVE_AFTER_DAYS = int(os.getenv("CONFIRMATION_ARCHIVE_AFTER_DAYS", "365"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+# With NOTIFICATION_PARTITIONING, whole monthly partitions older than this are dropped, read or not
+NOTIFICATION_PARTITION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_PARTITION_RETENTION_DAYS", "365"))
+NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv("NOTIFICATION_PARTITIONS_AHEAD", "3"))
+
+# Job configuration
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_RUN_IN_APP = os.getenv("RETENTION_RUN_IN_APP", "true").lower() == "true"
+# Every app worker runs the job; a PostgreSQL advisory lock lets only one of them at a time
+RETENTION_ADVISORY_LOCK_KEY = int(os.getenv("RETENTION_ADVISORY_LOCK_KEY", "727001"))
+# How long dropping a partition may wait for the lock on notifications before retrying next run
+PARTITION_DROP_LOCK_TIMEOUT = os.getenv("PARTITION_DROP_LOCK_TIMEOUT", "5s")
+
+def _cutoff(days: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+def _delete_in_batches(db: Session, model, *conditions, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Delete matching rows in chunks of batch_size, committing after each chunk so
+    locks are short-lived. Rows locked by other transactions are skipped.
+    """
+    total = 0
+    while True:
+        chunk = select(model.id).where(*conditions).limit(batch_size).with_for_update(skip_locked=True)
+        deleted = db.execute(delete(model).where(model.id.in_(chunk))).rowcount
+        db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+def _unlink_in_batches(db: Session, model, column, value, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Set column to NULL where it equals value, in committed chunks (a batched ON DELETE SET NULL)."""
+    total = 0
+    while True:
+        chunk = select(model.id).where(column == value).limit(batch_size).with_for_update(skip_locked=True)
+        updated = db.execute(update(model).where(model.id.in_(chunk)).values({column: None})).rowcount
+        db.commit()
+        total += updated
+        if updated < batch_size:
+            return total
+
+def purge_read_notifications(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    # Only read notifications are purged, so unread counters are unaffected
+    return _delete_in_batches(
+        db,
+        models.Notification,
+        models.Notification.is_read == True,
+        models.Notification.created_at < _cutoff(READ_NOTIFICATION_RETENTION_DAYS),
+        batch_size=batch_size
+    )
+
+def purge_broadcasts(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    cutoff = _cutoff(BROADCAST_RETENTION_DAYS)
+    old_broadcasts = select(models.BroadcastNotification.id).where(models.BroadcastNotification.created_at < cutoff)
+    # Receipts first, in chunks, so the broadcast deletes do not cascade over large sets
+    while True:
+        chunk = select(models.BroadcastReceipt.broadcast_id, models.BroadcastReceipt.user_id).where(
+            models.BroadcastReceipt.broadcast_id.in_(old_broadcasts)
+        ).limit(batch_size).with_for_update(skip_locked=True)
+        deleted = db.execute(
+            delete(models.BroadcastReceipt).where(
+                tuple_(models.BroadcastReceipt.broadcast_id, models.BroadcastReceipt.user_id).in_(chunk)
+            )
+        ).rowcount
+        db.commit()
+        if deleted < batch_size:
+            break
+    return _delete_in_batches(
+        db,
+        models.BroadcastNotification,
+        models.BroadcastNotification.created_at < cutoff,
+        batch_size=batch_size
+    )
+
+def archive_event_confirmations(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Move confirmations of events that started before the cutoff into event_confirmations_archive."""
+    confirmation = models.EventConfirmation
+    archive = models.EventConfirmationArchive
+    columns = ["id", "event_id", "student_id", "status", "note", "confirmed_at", "updated_at"]
+    total = 0
+    while True:
+        chunk = select(confirmation.id).join(models.Event, models.Event.id == confirmation.event_id).where(
+            models.Event.start_time < _cutoff(CONFIRMATION_ARCHIVE_AFTER_DAYS)
+        ).limit(batch_size).with_for_update(of=confirmation, skip_locked=True)
+        # DELETE ... RETURNING feeds the INSERT in the same statement
+        moved = delete(confirmation).where(confirmation.id.in_(chunk)).returning(
+            *[confirmation.__table__.c[name] for name in columns]
+        ).cte("moved")
+        result = db.execute(
+            insert(archive)
+            .from_select(columns, select(*[moved.c[name] for name in columns]))
+            .add_cte(moved)
+        )
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+def purge_outbox(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    return _delete_in_batches(
+        db,
+        models.NotificationOutbox,
+        models.NotificationOutbox.status == models.OutboxStatusEnum.DONE,
+        models.NotificationOutbox.processed_at < _cutoff(OUTBOX_RETENTION_DAYS),
+        batch_size=batch_size
+    )
+
+def purge_refresh_tokens(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    return _delete_in_batches(
+        db,
+        models.RefreshToken,
+        models.RefreshToken.expires_at < datetime.utcnow(),
+        batch_size=batch_size
+    )
+
+def purge_deleted_event(db: Session, event_id, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Remove an event soft-deleted by crud.delete_event. Confirmations go and
+    notification links are cleared in chunks, so the final delete of the event
+    row only cascades over its few remaining dependents. Returns the number of
+    confirmations removed.
+    """
+    removed = 0
+    for model in (models.EventConfirmation, models.EventOccurrenceConfirmation):
+        removed += _delete_in_batches(db, model, model.event_id == event_id, batch_size=batch_size)
+    for model in (models.Notification, models.BroadcastNotification):
+        _unlink_in_batches(db, model, model.related_event_id, event_id, batch_size=batch_size)
+    # An announcement of this event alone goes with it; a batch announcement keeps the other events
+    outbox = models.NotificationOutbox
+    db.execute(delete(outbox).where(
+        outbox.event_id == event_id,
+        or_(outbox.event_count.is_(None), outbox.event_count <= 1)
+    ))
+    db.execute(delete(models.Event).where(models.Event.id == event_id, models.Event.deleted_at.isnot(None)))
+    db.commit()
+    return removed
+
+def purge_deleted_events(db: Session, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Finish purges the request-time background task did not complete (crash, restart). Returns events purged."""
+    event_ids = db.execute(
+        select(models.Event.id).where(models.Event.deleted_at.isnot(None)).execution_options(include_deleted=True)
+    ).scalars().all()
+    for event_id in event_ids:
+        purge_deleted_event(db, event_id, batch_size=batch_size)
+    return len(event_ids)
+
+def run_event_purge(event_id) -> None:
+    """Background task queued by the delete routes; uses its own session, the request's is closed by then."""
+    db = SessionLocal()
+    try:
+        purge_deleted_event(db, event_id)
+    except Exception:
+        # The periodic retention run retries it
+        logger.exception("Purge of deleted event %s failed", event_id)
+    finally:
+        db.close()
+
+# ---------- Partitions ----------
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def _partition_name(month: datetime) -> str:
+    return f"notifications_{month:%Y_%m}"
+
+def ensure_notification_partitions(db: Session, months_ahead: int = NOTIFICATION_PARTITIONS_AHEAD) -> None:
+    """Create the monthly partitions from the current month up to months_ahead, plus a default partition."""
+    db.execute(text("CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT"))
+    month = _month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF notifications "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        month = upper
+    db.commit()
+
+def _expire_unread_notifications(db: Session, start: datetime, end: datetime, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """
+    Mark unread notifications created in [start, end) read in committed chunks,
+    taking each off its recipient's unread counter in the same transaction.
+    """
+    notification = models.Notification
+    total = 0
+    while True:
+        chunk = select(notification.id).where(
+            notification.is_read == False,
+            notification.created_at >= start,
+            notification.created_at < end
+        ).limit(batch_size).with_for_update(skip_locked=True)
+        recipients = db.execute(
+            update(notification)
+            .where(notification.id.in_(chunk), notification.is_read == False)
+            .values(is_read=True)
+            .returning(notification.recipient_id)
+        ).scalars().all()
+        for recipient_id, count in Counter(recipients).items():
+            crud.adjust_unread_counter(db, user_id=recipient_id, delta=-count)
+        db.commit()
+        total += len(recipients)
+        if len(recipients) < batch_size:
+            return total
+
+def _drop_partition(db: Session, name: str) -> None:
+    """
+    Detach and drop one partition in a single transaction. A plain DETACH
+    holds ACCESS EXCLUSIVE on notifications until commit, so the unread rows
+    are expired beforehand and only stragglers (locked or re-marked unread
+    meanwhile) are counted here; lock_timeout keeps the wait for the lock short.
+    """
+    db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_DROP_LOCK_TIMEOUT}'"))
+    db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+    # Detached, the rows can no longer change, so the adjustment is exact
+    stragglers = db.execute(text(
+        f"SELECT recipient_id, count(*) FROM {name} WHERE is_read = false GROUP BY recipient_id"
+    )).all()
+    for recipient_id, count in stragglers:
+        crud.adjust_unread_counter(db, user_id=recipient_id, delta=-count)
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+
+def drop_expired_notification_partitions(db: Session) -> int:
+    """
+    Drop monthly partitions whose whole range is older than the partition
+    retention. Unread notifications in them are taken off the unread counters.
+    """
+    cutoff = _month_start(_cutoff(NOTIFICATION_PARTITION_RETENTION_DAYS))
+    partitions = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'notifications' AND c.relname ~ '^notifications_[0-9]{4}_[0-9]{2}$'"
+    )).scalars().all()
+    dropped = 0
+    for name in partitions:
+        month = datetime.strptime(name, "notifications_%Y_%m")
+        if _next_month(month) <= cutoff:
+            _expire_unread_notifications(db, month, _next_month(month))
+            try:
+                _drop_partition(db, name)
+            except OperationalError:
+                db.rollback()
+                logger.warning("Could not lock notifications to drop %s; retrying next run", name)
+                continue
+            dropped += 1
+    return dropped
+
+# ---------- Job ----------
+def run_retention(db: Session) -> dict:
+    """Apply every enabled retention rule. Returns the number of rows affected per rule."""
+    results = {}
+    if models.NOTIFICATION_PARTITIONING:
+        ensure_notification_partitions(db)
+        if NOTIFICATION_PARTITION_RETENTION_DAYS:
+            results["dropped_notification_partitions"] = drop_expired_notification_partitions(db)
+    if READ_NOTIFICATION_RETENTION_DAYS:
+        results["read_notifications"] = purge_read_notifications(db)
+    if BROADCAST_RETENTION_DAYS:
+        results["broadcasts"] = purge_broadcasts(db)
+    if CONFIRMATION_ARCHIVE_AFTER_DAYS:
+        results["archived_confirmations"] = archive_event_confirmations(db)
+    if OUTBOX_RETENTION_DAYS:
+        results["outbox"] = purge_outbox(db)
+    results["refresh_tokens"] = purge_refresh_tokens(db)
+    results["deleted_events"] = purge_deleted_events(db)
+    return results
+
+def _run_retention_once() -> dict:
+    # The advisory lock belongs to a connection, so the session is pinned to one for the whole run
+    with engine.connect() as connection:
+        if not connection.execute(select(func.pg_try_advisory_lock(RETENTION_ADVISORY_LOCK_KEY))).scalar():
+            connection.rollback()
+            return {"skipped": "another worker is running retention"}
+        connection.commit()
+        db = Session(bind=connection)
+        try:
+            return run_retention(db)
+        finally:
+            db.close()
+            connection.execute(select(func.pg_advisory_unlock(RETENTION_ADVISORY_LOCK_KEY)))
+            connection.commit()
+
+async def run_retention_worker() -> None:
+    """Asyncio task started by the app; the blocking work runs in the threadpool."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            results = await loop.run_in_executor(None, _run_retention_once)
+            logger.info("Retention run: %s", results)
+        except Exception:
+            logger.exception("Retention run failed")
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
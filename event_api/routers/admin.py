@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
 
 from event_api.dependencies import get_db
 from event_api.models import RoleEnum
-from event_api.schemas import UserCreate, UserRead, EventCreate, EventRead, OpportunityCreate, OpportunityRead, EventConfirmationRead, NotificationCreate, NotificationRead, AdminDashboardData
-from event_api.auth import get_current_admin_user, get_password_hash
-from event_api import crud
+from event_api.schemas import UserCreate, UserRead, EventCreate, EventBatchCreate, EventRead, OpportunityCreate, OpportunityRead, EventConfirmationRead, NotificationCreate, NotificationRead, BroadcastNotificationCreate, BroadcastNotificationRead, AdminDashboardData
+from event_api.auth import get_current_admin_user, get_password_hash, password_hasher
+from event_api import crud, feeds, response_cache, retention
+from event_api.admission import admission_gate
+from event_api.cache import head_dashboard_cache, user_cache
+from event_api.conditional import listing_not_modified
+from event_api.pagination import PageParams, set_next_cursor
+from event_api.response_cache import cached_response
+from event_api.realtime import notification_hub
 
 router = APIRouter(
     prefix="/admin",
@@ -30,22 +37,37 @@ def get_admin_dashboard_data(db: Session = Depends(get_db)):
         total_confirmations=total_confirmations
     )
 
+# Runtime metrics (per worker process)
+@router.get("/metrics")
+def get_metrics_admin(db: Session = Depends(get_db)):
+    return {
+        "user_cache": user_cache.stats(),
+        "head_dashboard_cache": head_dashboard_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "notification_outbox_depth": crud.get_notification_outbox_depth(db),
+        "notification_streams": notification_hub.stats(),
+        "confirmation_admission": admission_gate.stats(),
+        "calendar_feeds": feeds.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
 # User Management
 @router.post("/users/", response_model=UserRead)
-def create_user_admin(user: UserCreate, db: Session = Depends(get_db)):
-    db_user_username = crud.get_user_by_username(db, username=user.username)
+async def create_user_admin(user: UserCreate, db: Session = Depends(get_db)):
+    db_user_username = await run_in_threadpool(crud.get_user_by_username, db, username=user.username)
     if db_user_username:
         raise HTTPException(status_code=400, detail="Username already registered")
-    db_user_email = crud.get_user_by_email(db, email=user.email)
+    db_user_email = await run_in_threadpool(crud.get_user_by_email, db, email=user.email)
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
-    return crud.create_user(db=db, user=user, hashed_password=hashed_password)
+    hashed_password = await password_hasher.run(get_password_hash, user.password)
+    return await run_in_threadpool(crud.create_user, db=db, user=user, hashed_password=hashed_password)
 
 @router.get("/users/", response_model=List[UserRead])
-def read_users_admin(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
+def read_users_admin(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    users = crud.get_users(db, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, users, page.limit)
     return users
 
 @router.get("/users/{user_id}", response_model=UserRead)
@@ -56,13 +78,13 @@ def read_user_admin(user_id: UUID, db: Session = Depends(get_db)):
     return user
 
 @router.put("/users/{user_id}", response_model=UserRead)
-def update_user_admin(user_id: UUID, user_update: UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+async def update_user_admin(user_id: UUID, user_update: UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.get_user, db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_password = get_password_hash(user_update.password) if user_update.password else None
-    return crud.update_user(db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
+    hashed_password = await password_hasher.run(get_password_hash, user_update.password) if user_update.password else None
+    return await run_in_threadpool(crud.update_user, db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
 
 @router.delete("/users/{user_id}")
 def delete_user_admin(user_id: UUID, db: Session = Depends(get_db)):
@@ -75,22 +97,49 @@ def delete_user_admin(user_id: UUID, db: Session = Depends(get_db)):
 # Event Management
 @router.post("/events/", response_model=EventRead)
 def create_event_admin(event: EventCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_admin_user)):
-    new_event = crud.create_event(db=db, event=event, creator_id=current_user.id, creator_role=current_user.role)
-    
-    # Send notifications to all students about the new event
-    crud.send_event_notifications_to_students(
-        db=db, 
-        event_id=new_event.id,
-        title=new_event.title,
-        description=new_event.description if new_event.description else f"A new event has been created by an administrator."
-    )
-    
-    return new_event
+    # Notifications to all students are queued in the same transaction and sent by the outbox worker
+    try:
+        return crud.create_event(
+            db=db,
+            event=event,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body=event.description if event.description else f"A new event has been created by an administrator."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+
+@router.post("/events/batch", response_model=List[EventRead])
+def create_events_batch_admin(batch: EventBatchCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_admin_user)):
+    # One transaction and one combined student announcement for the whole batch
+    try:
+        return crud.create_events(
+            db=db,
+            events=batch.events,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body="New events have been created by an administrator."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
 
 @router.get("/events/all", response_model=List[EventRead])
-def get_all_events_admin(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    events = crud.get_events(db, skip=skip, limit=limit)
-    return events
+def get_all_events_admin(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    # Same for every caller: served from the shared response cache until a write invalidates it
+    def build():
+        unchanged = listing_not_modified(request, response, db.query(crud.models.Event), crud.models.Event.updated_at)
+        if unchanged is not None:
+            return unchanged
+        events = crud.get_events(db, skip=page.skip, limit=page.limit, cursor=page.cursor)
+        set_next_cursor(response, events, page.limit)
+        return events
+    return cached_response(request, response, "events", "all", List[EventRead], build, also=("event-seats",))
 
 @router.put("/events/{event_id}", response_model=EventRead)
 def update_event_admin(event_id: UUID, event_update: EventCreate, db: Session = Depends(get_db)):
@@ -98,16 +147,32 @@ def update_event_admin(event_id: UUID, event_update: EventCreate, db: Session =
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    return crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    try:
+        db_event, promotions = crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    except crud.SeriesHasDependentsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This series has changed or confirmed occurrences; its start time and recurrence rule cannot change."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+    for notification in promotions:
+        notification_hub.publish_notification(notification)
+    return db_event
 
 @router.delete("/events/{event_id}")
-def delete_event_admin(event_id: UUID, db: Session = Depends(get_db)):
+def delete_event_admin(event_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Removed restriction - Admins can now delete any event
+    # Hidden at once; confirmations and notification links are purged after the response
     crud.delete_event(db, event_id=event_id)
+    background_tasks.add_task(retention.run_event_purge, event_id)
     return {"message": "Event deleted successfully"}
 
 # Opportunity Management
@@ -116,8 +181,12 @@ def create_opportunity_admin(opportunity: OpportunityCreate, db: Session = Depen
     return crud.create_opportunity(db=db, opportunity=opportunity, posted_by_id=current_user.id, posted_by_role=current_user.role)
 
 @router.get("/opportunities/all", response_model=List[OpportunityRead])
-def get_all_opportunities_admin(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    opportunities = crud.get_opportunities(db, skip=skip, limit=limit)
+def get_all_opportunities_admin(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    unchanged = listing_not_modified(request, response, db.query(crud.models.Opportunity), crud.models.Opportunity.updated_at)
+    if unchanged is not None:
+        return unchanged
+    opportunities = crud.get_opportunities(db, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, opportunities, page.limit)
     return opportunities
 
 @router.put("/opportunities/{opportunity_id}", response_model=OpportunityRead)
@@ -139,16 +208,25 @@ def delete_opportunity_admin(opportunity_id: UUID, db: Session = Depends(get_db)
 
 # Event Confirmation
 @router.get("/students_confirmed_for_any_event/", response_model=List[UserRead])
-def get_students_confirmed_for_any_event_admin(db: Session = Depends(get_db)):
-    confirmed_student_ids = db.query(crud.models.EventConfirmation.student_id).distinct().all()
-    student_ids = [s_id for (s_id,) in confirmed_student_ids]
-    students = db.query(crud.models.User).filter(crud.models.User.id.in_(student_ids)).all()
+def get_students_confirmed_for_any_event_admin(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    confirmed_student_ids = db.query(crud.models.EventConfirmation.student_id)
+    query = db.query(crud.models.User).filter(crud.models.User.id.in_(confirmed_student_ids))
+    students = page.apply(query, crud.models.User.created_at, crud.models.User.id).all()
+    set_next_cursor(response, students, page.limit)
     return students
 
 # Notification Management
 @router.post("/notifications/", response_model=NotificationRead)
 def create_notification_admin(notification: NotificationCreate, db: Session = Depends(get_db)):
-    return crud.create_notification(db=db, notification=notification)
+    db_notification = crud.create_notification(db=db, notification=notification)
+    notification_hub.publish_notification(db_notification)
+    return db_notification
+
+@router.post("/notifications/broadcast", response_model=BroadcastNotificationRead)
+def create_broadcast_notification_admin(broadcast: BroadcastNotificationCreate, db: Session = Depends(get_db)):
+    db_broadcast = crud.create_broadcast_notification(db=db, **broadcast.dict())
+    notification_hub.publish_broadcast(db_broadcast)
+    return db_broadcast
 
 @router.delete("/notifications/{notification_id}")
 def delete_notification_admin(notification_id: UUID, db: Session = Depends(get_db)):
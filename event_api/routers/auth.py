@@ -3,53 +3,99 @@ from sqlalchemy.orm import Session
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from event_api.schemas import LoginRequest # Import the new schema
 
 from event_api.dependencies import get_db
-from event_api.models import User
-from event_api.auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+from event_api.auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash, password_hasher
+from event_api.auth import create_refresh_token, hash_refresh_token, REFRESH_TOKEN_EXPIRE_DAYS
+from event_api import crud
 from event_api.schemas import ChangePasswordRequest, UserRead # Import ChangePasswordRequest and UserRead
+from event_api.schemas import RefreshTokenRequest
 from event_api.auth import get_current_user # Import get_current_user
+from event_api.cache import invalidate_cached_user, get_cached_user, cache_user
 
 router = APIRouter(
     tags=["Authentication"]
 )
 
+def _create_access_token_for(user):
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": user.email, "user_id": str(user.id), "user_role": user.role.value},
+        expires_delta=access_token_expires
+    )
+
+def _issue_tokens(db: Session, user):
+    refresh_token, refresh_token_hash = create_refresh_token()
+    crud.create_refresh_token(
+        db,
+        user_id=user.id,
+        token_hash=refresh_token_hash,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return {"access_token": _create_access_token_for(user), "refresh_token": refresh_token, "token_type": "bearer"}
+
 # This endpoint handles user login and issues a JWT access token.
 @router.post("/login")
-def login_for_access_token(request: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.hashed_password):
+async def login_for_access_token(request: LoginRequest, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=request.email)
+    if not user or not await password_hasher.run(verify_password, request.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "user_id": str(user.id), "user_role": user.role.value},
-        expires_delta=access_token_expires
+    return await run_in_threadpool(_issue_tokens, db, user)
+
+# Exchanges a refresh token for a new access token without a password check.
+# The presented refresh token is rotated: it is revoked and a new one is returned.
+@router.post("/token/refresh")
+def refresh_access_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    new_refresh_token, new_refresh_token_hash = create_refresh_token()
+    user_id = crud.rotate_refresh_token(
+        db,
+        token_hash=hash_refresh_token(request.refresh_token),
+        new_token_hash=new_refresh_token_hash,
+        new_expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    user = get_cached_user(user_id) if user_id else None
+    if user is None and user_id is not None:
+        db_user = crud.get_user(db, user_id=user_id)
+        user = cache_user(db_user) if db_user else None
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"access_token": _create_access_token_for(user), "refresh_token": new_refresh_token, "token_type": "bearer"}
 
+def _store_password(db: Session, user, hashed_password: str):
+    user.hashed_password = hashed_password
+    crud.revoke_refresh_tokens_for_user(db, user_id=user.id)
+    db.commit()
+    db.refresh(user)
+    invalidate_cached_user(user.id)
+
+# Async so that waiting on the hashing pool does not hold a threadpool thread
 @router.post("/change-password")
-def change_password(
+async def change_password(
     request: ChangePasswordRequest,
     db: Session = Depends(get_db),
     current_user: UserRead = Depends(get_current_user)
 ):
-    user = db.query(User).filter(User.id == current_user.id).first()
+    user = await run_in_threadpool(crud.get_user, db, user_id=current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(request.old_password, user.hashed_password):
+    if not await password_hasher.run(verify_password, request.old_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect old password")
 
-    user.hashed_password = get_password_hash(request.new_password)
-    db.commit()
-    db.refresh(user)
+    hashed_password = await password_hasher.run(get_password_hash, request.new_password)
+    await run_in_threadpool(_store_password, db, user, hashed_password)
     return {"message": "Password updated successfully"}
 
 @router.get("/me", response_model=UserRead)
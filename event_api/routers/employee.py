@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
@@ -6,9 +8,15 @@ from datetime import datetime
 
 from event_api.dependencies import get_db
 from event_api.models import RoleEnum
-from event_api.schemas import UserCreate, UserRead, EventCreate, EventRead, OpportunityRead, EventConfirmationRead, NotificationRead
-from event_api.auth import get_current_employee_user, get_current_user, get_password_hash
-from event_api import crud
+from event_api.schemas import UserCreate, UserRead, EventCreate, EventBatchCreate, EventRead, EventCalendarRead, EventOccurrenceOverrideUpdate, EventOccurrenceOverrideRead, OpportunityRead, EventConfirmationRead, ConfirmationImportResult, NotificationRead, NotificationBulkReadRequest
+from event_api.auth import get_current_employee_user, get_current_user, get_password_hash, password_hasher
+from event_api import crud, retention
+from event_api.exporting import ExportFormat, roster_response
+from event_api.importing import import_event_confirmations
+from event_api.conditional import listing_not_modified, resource_not_modified
+from event_api.pagination import PageParams, decode_cursor, set_next_cursor
+from event_api.response_cache import cached_response
+from event_api.realtime import notification_event_stream, notification_hub
 
 router = APIRouter(
     prefix="/employee",
@@ -20,8 +28,13 @@ router = APIRouter(
 # Dashboard Endpoints (example)
 # Dashboard Endpoints (example)
 @router.get("/dashboard/my_events/", response_model=List[EventRead])
-def get_my_events(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
-    events = db.query(crud.models.Event).filter(crud.models.Event.creator_id == current_user.id).all()
+def get_my_events(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    query = db.query(crud.models.Event).filter(crud.models.Event.creator_id == current_user.id)
+    unchanged = listing_not_modified(request, response, query, crud.models.Event.updated_at, current_user.id)
+    if unchanged is not None:
+        return unchanged
+    events = page.apply(query, crud.models.Event.created_at, crud.models.Event.id).all()
+    set_next_cursor(response, events, page.limit)
     return events
 
 # Profile Settings Management
@@ -31,42 +44,70 @@ def read_users_me_employee(current_user: UserRead = Depends(get_current_employee
     return current_user
 
 @router.put("/me/", response_model=UserRead)
-def update_users_me_employee(user_update: UserCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
-    db_user = crud.get_user(db, user_id=current_user.id)
+async def update_users_me_employee(user_update: UserCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    db_user = await run_in_threadpool(crud.get_user, db, user_id=current_user.id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_password = get_password_hash(user_update.password) if user_update.password else None
-    return crud.update_user(db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
+    hashed_password = await password_hasher.run(get_password_hash, user_update.password) if user_update.password else None
+    return await run_in_threadpool(crud.update_user, db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
 
 # Event Management
 @router.post("/events/", response_model=EventRead)
 def create_event_employee(event: EventCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
-    new_event = crud.create_event(db=db, event=event, creator_id=current_user.id, creator_role=current_user.role)
-    
-    # Send notifications to all students about the new event
-    department_info = f" in the {new_event.department} department" if new_event.department else ""
-    crud.send_event_notifications_to_students(
-        db=db, 
-        event_id=new_event.id,
-        title=new_event.title,
-        description=new_event.description if new_event.description else f"A new event has been created by an employee{department_info}."
-    )
-    
-    return new_event
+    department_info = f" in the {event.department} department" if event.department else ""
+    # Notifications to all students are queued in the same transaction and sent by the outbox worker
+    try:
+        return crud.create_event(
+            db=db,
+            event=event,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body=event.description if event.description else f"A new event has been created by an employee{department_info}."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+
+@router.post("/events/batch", response_model=List[EventRead])
+def create_events_batch_employee(batch: EventBatchCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    # One transaction and one combined student announcement for the whole batch
+    try:
+        return crud.create_events(
+            db=db,
+            events=batch.events,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body="New events have been created by an employee."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
 
 @router.get("/events/", response_model=List[EventRead])
-def read_events_employee(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
-    events = db.query(crud.models.Event).filter(crud.models.Event.creator_id == current_user.id).offset(skip).limit(limit).all()
+def read_events_employee(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    query = db.query(crud.models.Event).filter(crud.models.Event.creator_id == current_user.id)
+    unchanged = listing_not_modified(request, response, query, crud.models.Event.updated_at, current_user.id)
+    if unchanged is not None:
+        return unchanged
+    events = page.apply(query, crud.models.Event.created_at, crud.models.Event.id).all()
+    set_next_cursor(response, events, page.limit)
     return events
 
 @router.get("/events/{event_id}", response_model=EventRead)
-def read_event_employee(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+def read_event_employee(event_id: UUID, request: Request, response: Response, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
     event = crud.get_event(db, event_id=event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.creator_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this event.")
+    unchanged = resource_not_modified(request, response, event)
+    if unchanged is not None:
+        return unchanged
     return event
 
 @router.put("/events/{event_id}", response_model=EventRead)
@@ -78,10 +119,39 @@ def update_event_employee(event_id: UUID, event_update: EventCreate, db: Session
     if db_event.creator_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Employees can only update their own events.")
 
-    return crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    try:
+        db_event, promotions = crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    except crud.SeriesHasDependentsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This series has changed or confirmed occurrences; its start time and recurrence rule cannot change."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+    for notification in promotions:
+        notification_hub.publish_notification(notification)
+    return db_event
+
+@router.put("/events/{event_id}/occurrences/{occurrence_start}", response_model=EventOccurrenceOverrideRead)
+def override_event_occurrence_employee(event_id: UUID, occurrence_start: datetime, override: EventOccurrenceOverrideUpdate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    # Move, rename or cancel one occurrence of a recurring event
+    db_event = crud.get_event(db, event_id=event_id)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if db_event.creator_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Employees can only update their own events.")
+
+    try:
+        return crud.set_occurrence_override(db, db_event=db_event, occurrence_start=occurrence_start, override=override)
+    except crud.OccurrenceNotFoundError:
+        raise HTTPException(status_code=404, detail="Occurrence not found")
 
 @router.delete("/events/{event_id}")
-def delete_event_employee(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+def delete_event_employee(event_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -93,40 +163,67 @@ def delete_event_employee(event_id: UUID, db: Session = Depends(get_db), current
     if db_event.creator_id != current_user.id or db_event.creator_role != RoleEnum.EMPLOYEE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Employees can only delete events created by Employee role.")
 
+    # Hidden at once; confirmations and notification links are purged after the response
     crud.delete_event(db, event_id=event_id)
+    background_tasks.add_task(retention.run_event_purge, event_id)
     return {"message": "Event deleted successfully"}
 
-@router.get("/events/calendar_view/", response_model=List[EventRead])
+@router.get("/events/calendar_view/", response_model=List[EventCalendarRead])
 def get_events_for_calendar_employee(
     start_time: datetime,
     end_time: datetime,
+    response: Response,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: UserRead = Depends(get_current_employee_user)
 ):
-    query = db.query(crud.models.Event).filter(
-        crud.models.Event.start_time >= start_time,
-        crud.models.Event.start_time <= end_time,
-        crud.models.Event.creator_id == current_user.id
+    # Chronological pages with recurring events expanded; the cursor continues from the last start_time
+    events = crud.calendar_entries(
+        db, start_time, end_time, crud.models.Event.creator_id == current_user.id,
+        skip=page.skip, limit=page.limit, cursor=page.cursor
     )
-    events = query.all()
+    set_next_cursor(response, events, page.limit, sort_key="start_time")
     return events
 
 # Opportunity Read-only
 @router.get("/opportunities/", response_model=List[OpportunityRead])
-def read_opportunities_employee(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    opportunities = crud.get_opportunities(db, skip=skip, limit=limit)
-    return opportunities
+def read_opportunities_employee(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    # Same for every caller: served from the shared response cache until a write invalidates it
+    def build():
+        unchanged = listing_not_modified(request, response, db.query(crud.models.Opportunity), crud.models.Opportunity.updated_at)
+        if unchanged is not None:
+            return unchanged
+        opportunities = crud.get_opportunities(db, skip=page.skip, limit=page.limit, cursor=page.cursor)
+        set_next_cursor(response, opportunities, page.limit)
+        return opportunities
+    return cached_response(request, response, "opportunities", "all", List[OpportunityRead], build)
 
 @router.get("/opportunities/{opportunity_id}", response_model=OpportunityRead)
-def read_opportunity_employee(opportunity_id: UUID, db: Session = Depends(get_db)):
+def read_opportunity_employee(opportunity_id: UUID, request: Request, response: Response, db: Session = Depends(get_db)):
     opportunity = crud.get_opportunity(db, opportunity_id=opportunity_id)
     if opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
+    unchanged = resource_not_modified(request, response, opportunity)
+    if unchanged is not None:
+        return unchanged
     return opportunity
 
 # Event Confirmation
 @router.get("/events/{event_id}/confirmations", response_model=List[EventConfirmationRead])
-def get_event_confirmations_employee(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+def get_event_confirmations_employee(event_id: UUID, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    event = crud.get_event(db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if event.creator_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view confirmations for this event.")
+
+    confirmations = crud.get_event_confirmations_for_event(db, event_id=event_id, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
+    return confirmations
+
+@router.get("/events/{event_id}/occurrences/{occurrence_start}/confirmations", response_model=List[EventConfirmationRead])
+def get_occurrence_confirmations_employee(event_id: UUID, occurrence_start: datetime, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
     event = crud.get_event(db, event_id=event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -134,20 +231,63 @@ def get_event_confirmations_employee(event_id: UUID, db: Session = Depends(get_d
     if event.creator_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view confirmations for this event.")
 
-    confirmations = crud.get_event_confirmations_for_event(db, event_id=event_id)
+    confirmations = crud.get_occurrence_confirmations_for_event(db, event_id=event_id, occurrence_start=occurrence_start, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
     return confirmations
 
+@router.get("/events/{event_id}/confirmations/export")
+def export_event_confirmations_employee(event_id: UUID, format: ExportFormat = ExportFormat.CSV, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    event = crud.get_event(db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if event.creator_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to export confirmations for this event.")
+
+    # Streams the whole roster (CSV or NDJSON) from a server-side cursor
+    return roster_response(event_id, format)
+
+@router.post("/events/{event_id}/confirmations/import", response_model=ConfirmationImportResult)
+async def import_event_confirmations_employee(event_id: UUID, request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    # Body: CSV with a student_id/email/username header, or NDJSON (Content-Type: application/x-ndjson)
+    event = await run_in_threadpool(crud.get_event, db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if event.creator_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to import confirmations for this event.")
+
+    return await import_event_confirmations(request, db, event_id)
+
 # Notification Endpoints
 @router.get("/notifications/", response_model=List[NotificationRead])
-def read_notifications_employee(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
-    notifications = crud.get_notifications_for_recipient(db, recipient_id=current_user.id, skip=skip, limit=limit)
+def read_notifications_employee(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    notifications = crud.get_notification_feed(db, user=current_user, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, notifications, page.limit)
     return notifications
 
+@router.get("/notifications/stream")
+async def stream_notifications_employee(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: UserRead = Depends(get_current_employee_user)
+):
+    # Live notifications and unread-count changes as server-sent events; resumes from Last-Event-ID
+    after = decode_cursor(last_event_id) if last_event_id else None
+    return StreamingResponse(
+        notification_event_stream(request, current_user, after=after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/notifications/{notification_id}", response_model=NotificationRead)
 def read_notification_employee(notification_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
     notification = crud.get_notification(db, notification_id=notification_id)
     if notification is None:
-        raise HTTPException(status_code=404, detail="Notification not found")
+        broadcast = crud.get_broadcast_notification_for_user(db, user=current_user, broadcast_id=notification_id)
+        if broadcast is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return broadcast
     
     if notification.recipient_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this notification")
@@ -158,9 +298,27 @@ def read_notification_employee(notification_id: UUID, db: Session = Depends(get_
 def mark_notification_as_read_employee(notification_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
     notification = crud.get_notification(db, notification_id=notification_id)
     if notification is None:
-        raise HTTPException(status_code=404, detail="Notification not found")
+        broadcast = crud.mark_broadcast_notification_as_read(db, user=current_user, broadcast_id=notification_id)
+        if broadcast is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        notification_hub.publish_read_state(current_user.id)
+        return broadcast
     
     if notification.recipient_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to mark this notification as read")
     
-    return crud.update_notification(db, db_notification=notification, is_read=True)
+    notification = crud.update_notification(db, db_notification=notification, is_read=True)
+    notification_hub.publish_read_state(current_user.id)
+    return notification
+
+@router.put("/notifications/mark_all_read")
+def mark_all_notifications_as_read_employee(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    marked = crud.mark_all_notifications_as_read(db, user=current_user)
+    notification_hub.publish_read_state(current_user.id)
+    return {"message": f"Marked {marked} notifications as read", "count": marked}
+
+@router.put("/notifications/mark_read")
+def mark_notifications_as_read_employee(request: NotificationBulkReadRequest, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_employee_user)):
+    marked = crud.mark_notifications_as_read(db, user=current_user, notification_ids=request.notification_ids)
+    notification_hub.publish_read_state(current_user.id)
+    return {"message": f"Marked {marked} notifications as read", "count": marked}
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+
+from event_api.dependencies import get_db
+from event_api.feeds import feed_response
+
+# No auth dependency: calendar apps authenticate with the signed token in the URL
+router = APIRouter(
+    prefix="/feeds",
+    tags=["Calendar Feeds"],
+)
+
+@router.get("/{token}.ics", responses={200: {"content": {"text/calendar": {}}}, 304: {"description": "Feed unchanged"}})
+def get_calendar_feed(token: str, request: Request, db: Session = Depends(get_db)):
+    # Get the URL from /student/calendar_feed or /head/calendar_feed
+    return feed_response(request, db, token)
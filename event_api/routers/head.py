@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
@@ -6,9 +7,16 @@ from datetime import datetime
 
 from event_api.dependencies import get_db
 from event_api.models import RoleEnum
-from event_api.schemas import UserRead, EventCreate, EventRead, OpportunityCreate, OpportunityRead, EventConfirmationRead, HeadDashboardData
+from event_api.schemas import UserRead, EventCreate, EventBatchCreate, EventRead, EventCalendarRead, CalendarFeedRead, EventOccurrenceOverrideUpdate, EventOccurrenceOverrideRead, OpportunityCreate, OpportunityRead, EventConfirmationRead, ConfirmationImportResult, HeadDashboardData
 from event_api.auth import get_current_head_user
-from event_api import crud
+from event_api import crud, retention
+from event_api.cache import HEAD_DASHBOARD_CACHE_TTL_SECONDS, head_dashboard_cache
+from event_api.exporting import ExportFormat, roster_response
+from event_api.feeds import FeedKind, feed_token
+from event_api.importing import import_event_confirmations
+from event_api.conditional import listing_not_modified, resource_not_modified
+from event_api.pagination import PageParams, set_next_cursor
+from event_api.realtime import notification_hub
 
 router = APIRouter(
     prefix="/head",
@@ -22,63 +30,43 @@ router = APIRouter(
 def get_head_dashboard_data(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
     if not current_user.department:
         raise HTTPException(status_code=400, detail="Head must be assigned to a department")
-    
-    # Count users in the department
-    department_users_count = db.query(crud.models.User).filter(
-        crud.models.User.department == current_user.department
-    ).count()
-    
-    # Count events in the department
-    department_events_count = db.query(crud.models.Event).filter(
-        crud.models.Event.department == current_user.department
-    ).count()
-    
-    # Count opportunities in the department
-    department_opportunities_count = db.query(crud.models.Opportunity).filter(
-        crud.models.Opportunity.department == current_user.department
-    ).count()
-    
-    # Count confirmations for events in the department
-    department_event_ids = db.query(crud.models.Event.id).filter(
-        crud.models.Event.department == current_user.department
-    ).all()
-    department_event_ids = [event_id for (event_id,) in department_event_ids]
-    
-    department_confirmations_count = db.query(crud.models.EventConfirmation).filter(
-        crud.models.EventConfirmation.event_id.in_(department_event_ids)
-    ).count() if department_event_ids else 0
-    
-    # Get 5 most recent events in the department
-    recent_events = db.query(crud.models.Event).filter(
-        crud.models.Event.department == current_user.department
-    ).order_by(crud.models.Event.created_at.desc()).limit(5).all()
-    
-    # Count upcoming events in the department
-    now = datetime.utcnow()
-    upcoming_events_count = db.query(crud.models.Event).filter(
-        crud.models.Event.department == current_user.department,
-        crud.models.Event.start_time > now
-    ).count()
-    
-    return HeadDashboardData(
+
+    # Shared by every head of the department for HEAD_DASHBOARD_CACHE_TTL_SECONDS
+    if HEAD_DASHBOARD_CACHE_TTL_SECONDS > 0:
+        cached = head_dashboard_cache.get(current_user.department)
+        if cached is not None:
+            return cached
+
+    dashboard = crud.get_department_dashboard(db, department=current_user.department)
+    data = HeadDashboardData(
         department=current_user.department,
-        department_users=department_users_count,
-        department_events=department_events_count,
-        department_opportunities=department_opportunities_count,
-        department_confirmations=department_confirmations_count,
-        recent_events=recent_events,
-        upcoming_events=upcoming_events_count
+        department_users=dashboard.users,
+        department_events=dashboard.events,
+        department_opportunities=dashboard.opportunities,
+        department_confirmations=dashboard.confirmations,
+        recent_events=dashboard.recent_events,
+        upcoming_events=dashboard.upcoming_events
     )
+    if HEAD_DASHBOARD_CACHE_TTL_SECONDS > 0:
+        head_dashboard_cache.set(current_user.department, data)
+    return data
 
 # Legacy dashboard endpoints (kept for backward compatibility)
 @router.get("/dashboard/department_users/", response_model=List[UserRead])
-def get_department_users(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
-    users = db.query(crud.models.User).filter(crud.models.User.department == current_user.department).all()
+def get_department_users(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    query = db.query(crud.models.User).filter(crud.models.User.department == current_user.department)
+    users = page.apply(query, crud.models.User.created_at, crud.models.User.id).all()
+    set_next_cursor(response, users, page.limit)
     return users
 
 @router.get("/dashboard/department_events/", response_model=List[EventRead])
-def get_department_events(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
-    events = db.query(crud.models.Event).filter(crud.models.Event.department == current_user.department).all()
+def get_department_events(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    query = db.query(crud.models.Event).filter(crud.models.Event.department == current_user.department)
+    unchanged = listing_not_modified(request, response, query, crud.models.Event.updated_at, current_user.department)
+    if unchanged is not None:
+        return unchanged
+    events = page.apply(query, crud.models.Event.created_at, crud.models.Event.id).all()
+    set_next_cursor(response, events, page.limit)
     return events
 
 # Event Management
@@ -87,31 +75,63 @@ def create_event_head(event: EventCreate, db: Session = Depends(get_db), current
     if event.department and event.department != current_user.department:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only create events for their own department.")
     
-    new_event = crud.create_event(db=db, event=event, creator_id=current_user.id, creator_role=current_user.role)
-    
-    # Send notifications to all students about the new event
-    department_info = f" in the {new_event.department} department" if new_event.department else ""
-    crud.send_event_notifications_to_students(
-        db=db, 
-        event_id=new_event.id,
-        title=new_event.title,
-        description=new_event.description if new_event.description else f"A new event has been created by a department head{department_info}."
-    )
+    department_info = f" in the {event.department} department" if event.department else ""
+    # Notifications to all students are queued in the same transaction and sent by the outbox worker
+    try:
+        return crud.create_event(
+            db=db,
+            event=event,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body=event.description if event.description else f"A new event has been created by a department head{department_info}."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+
+@router.post("/events/batch", response_model=List[EventRead])
+def create_events_batch_head(batch: EventBatchCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    outside = [index for index, event in enumerate(batch.events) if event.department and event.department != current_user.department]
+    if outside:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Heads can only create events for their own department (items {outside}).")
     
-    return new_event
+    # One transaction and one combined student announcement for the whole batch
+    try:
+        return crud.create_events(
+            db=db,
+            events=batch.events,
+            creator_id=current_user.id,
+            creator_role=current_user.role,
+            notification_body=f"New events have been created by a department head in the {current_user.department} department."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
 
 @router.get("/events/", response_model=List[EventRead])
-def read_events_head(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
-    events = db.query(crud.models.Event).filter(crud.models.Event.department == current_user.department).offset(skip).limit(limit).all()
+def read_events_head(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    query = db.query(crud.models.Event).filter(crud.models.Event.department == current_user.department)
+    unchanged = listing_not_modified(request, response, query, crud.models.Event.updated_at, current_user.department)
+    if unchanged is not None:
+        return unchanged
+    events = page.apply(query, crud.models.Event.created_at, crud.models.Event.id).all()
+    set_next_cursor(response, events, page.limit)
     return events
 
 @router.get("/events/{event_id}", response_model=EventRead)
-def read_event_head(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+def read_event_head(event_id: UUID, request: Request, response: Response, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
     event = crud.get_event(db, event_id=event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.department and event.department != current_user.department:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view events outside your department.")
+    unchanged = resource_not_modified(request, response, event)
+    if unchanged is not None:
+        return unchanged
     return event
 
 @router.put("/events/{event_id}", response_model=EventRead)
@@ -125,10 +145,41 @@ def update_event_head(event_id: UUID, event_update: EventCreate, db: Session = D
     if db_event.creator_id != current_user.id and db_event.creator_role not in [RoleEnum.EMPLOYEE, RoleEnum.STUDENT]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only update events created by themselves or lower roles.")
 
-    return crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    try:
+        db_event, promotions = crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    except crud.SeriesHasDependentsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This series has changed or confirmed occurrences; its start time and recurrence rule cannot change."
+        )
+    except crud.DuplicateEventError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={
+            "message": "Events with the same title and start time already exist",
+            "duplicates": [{"title": title, "start_time": start_time.isoformat()} for title, start_time in e.duplicates]
+        })
+    for notification in promotions:
+        notification_hub.publish_notification(notification)
+    return db_event
+
+@router.put("/events/{event_id}/occurrences/{occurrence_start}", response_model=EventOccurrenceOverrideRead)
+def override_event_occurrence_head(event_id: UUID, occurrence_start: datetime, override: EventOccurrenceOverrideUpdate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    # Move, rename or cancel one occurrence of a recurring event
+    db_event = crud.get_event(db, event_id=event_id)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if db_event.department and db_event.department != current_user.department:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only update events in their department.")
+    if db_event.creator_id != current_user.id and db_event.creator_role not in [RoleEnum.EMPLOYEE, RoleEnum.STUDENT]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only update events created by themselves or lower roles.")
+
+    try:
+        return crud.set_occurrence_override(db, db_event=db_event, occurrence_start=occurrence_start, override=override)
+    except crud.OccurrenceNotFoundError:
+        raise HTTPException(status_code=404, detail="Occurrence not found")
 
 @router.delete("/events/{event_id}")
-def delete_event_head(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+def delete_event_head(event_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -140,24 +191,45 @@ def delete_event_head(event_id: UUID, db: Session = Depends(get_db), current_use
     if db_event.department and db_event.department != current_user.department:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only delete events in their department.")
 
+    # Hidden at once; confirmations and notification links are purged after the response
     crud.delete_event(db, event_id=event_id)
+    background_tasks.add_task(retention.run_event_purge, event_id)
     return {"message": "Event deleted successfully"}
 
-@router.get("/events/calendar_view/", response_model=List[EventRead])
+@router.get("/events/calendar_view/", response_model=List[EventCalendarRead])
 def get_events_for_calendar_head(
     start_time: datetime,
     end_time: datetime,
+    response: Response,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: UserRead = Depends(get_current_head_user)
 ):
-    query = db.query(crud.models.Event).filter(
-        crud.models.Event.start_time >= start_time,
-        crud.models.Event.start_time <= end_time,
-        crud.models.Event.department == current_user.department
+    # Chronological pages with recurring events expanded; the cursor continues from the last start_time
+    events = crud.calendar_entries(
+        db, start_time, end_time, crud.models.Event.department == current_user.department,
+        skip=page.skip, limit=page.limit, cursor=page.cursor
     )
-    events = query.all()
+    set_next_cursor(response, events, page.limit, sort_key="start_time")
     return events
 
+@router.get("/calendar_feed", response_model=CalendarFeedRead)
+def get_calendar_feed_head(request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    # iCalendar subscription with the department's events, bound to this head
+    if not current_user.department:
+        raise HTTPException(status_code=400, detail="Head must be assigned to a department")
+    token = feed_token(FeedKind.DEPARTMENT, crud.get_user(db, user_id=current_user.id))
+    return CalendarFeedRead(url=str(request.url_for("get_calendar_feed", token=token)))
+
+@router.post("/calendar_feed/rotate", response_model=CalendarFeedRead)
+def rotate_calendar_feed_head(request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    # Revokes every feed URL issued to this head so far
+    if not current_user.department:
+        raise HTTPException(status_code=400, detail="Head must be assigned to a department")
+    crud.rotate_feed_nonce(db, user_id=current_user.id)
+    token = feed_token(FeedKind.DEPARTMENT, crud.get_user(db, user_id=current_user.id))
+    return CalendarFeedRead(url=str(request.url_for("get_calendar_feed", token=token)))
+
 # Opportunity Management
 @router.post("/opportunities/", response_model=OpportunityRead)
 def create_opportunity_head(opportunity: OpportunityCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
@@ -167,17 +239,25 @@ def create_opportunity_head(opportunity: OpportunityCreate, db: Session = Depend
     return crud.create_opportunity(db=db, opportunity=opportunity, posted_by_id=current_user.id, posted_by_role=current_user.role)
 
 @router.get("/opportunities/", response_model=List[OpportunityRead])
-def read_opportunities_head(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
-    opportunities = db.query(crud.models.Opportunity).filter(crud.models.Opportunity.department == current_user.department).offset(skip).limit(limit).all()
+def read_opportunities_head(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    query = db.query(crud.models.Opportunity).filter(crud.models.Opportunity.department == current_user.department)
+    unchanged = listing_not_modified(request, response, query, crud.models.Opportunity.updated_at, current_user.department)
+    if unchanged is not None:
+        return unchanged
+    opportunities = page.apply(query, crud.models.Opportunity.created_at, crud.models.Opportunity.id).all()
+    set_next_cursor(response, opportunities, page.limit)
     return opportunities
 
 @router.get("/opportunities/{opportunity_id}", response_model=OpportunityRead)
-def read_opportunity_head(opportunity_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+def read_opportunity_head(opportunity_id: UUID, request: Request, response: Response, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
     opportunity = crud.get_opportunity(db, opportunity_id=opportunity_id)
     if opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
     if opportunity.department and opportunity.department != current_user.department:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only view opportunities in their department.")
+    unchanged = resource_not_modified(request, response, opportunity)
+    if unchanged is not None:
+        return unchanged
     return opportunity
 
 @router.put("/opportunities/{opportunity_id}", response_model=OpportunityRead)
@@ -205,7 +285,7 @@ def delete_opportunity_head(opportunity_id: UUID, db: Session = Depends(get_db),
 
 # Event Confirmation
 @router.get("/events/{event_id}/confirmations", response_model=List[EventConfirmationRead])
-def get_event_confirmations_head(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+def get_event_confirmations_head(event_id: UUID, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
     event = crud.get_event(db, event_id=event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -213,5 +293,43 @@ def get_event_confirmations_head(event_id: UUID, db: Session = Depends(get_db),
     if event.department and event.department != current_user.department:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only view confirmations for events in their department.")
 
-    confirmations = crud.get_event_confirmations_for_event(db, event_id=event_id)
+    confirmations = crud.get_event_confirmations_for_event(db, event_id=event_id, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
     return confirmations
+
+@router.get("/events/{event_id}/occurrences/{occurrence_start}/confirmations", response_model=List[EventConfirmationRead])
+def get_occurrence_confirmations_head(event_id: UUID, occurrence_start: datetime, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    event = crud.get_event(db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if event.department and event.department != current_user.department:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only view confirmations for events in their department.")
+
+    confirmations = crud.get_occurrence_confirmations_for_event(db, event_id=event_id, occurrence_start=occurrence_start, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
+    return confirmations
+
+@router.get("/events/{event_id}/confirmations/export")
+def export_event_confirmations_head(event_id: UUID, format: ExportFormat = ExportFormat.CSV, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    event = crud.get_event(db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if event.department and event.department != current_user.department:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only export confirmations for events in their department.")
+
+    # Streams the whole roster (CSV or NDJSON) from a server-side cursor
+    return roster_response(event_id, format)
+
+@router.post("/events/{event_id}/confirmations/import", response_model=ConfirmationImportResult)
+async def import_event_confirmations_head(event_id: UUID, request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_head_user)):
+    # Body: CSV with a student_id/email/username header, or NDJSON (Content-Type: application/x-ndjson)
+    event = await run_in_threadpool(crud.get_event, db, event_id=event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    if event.department and event.department != current_user.department:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Heads can only import confirmations for events in their department.")
+
+    return await import_event_confirmations(request, db, event_id)
@@ -0,0 +1,49 @@
+from enum import Enum
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+
+from event_api.dependencies import get_db
+from event_api.schemas import UserRead, SearchResult
+from event_api.auth import get_current_user
+from event_api import crud
+from event_api.pagination import PageParams, set_next_cursor
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"],
+    dependencies=[Depends(get_current_user)],
+)
+
+class SearchKind(str, Enum):
+    EVENT = "event"
+    OPPORTUNITY = "opportunity"
+
+@router.get("", response_model=List[SearchResult])
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[SearchKind] = None,
+    department: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+    current_user: UserRead = Depends(get_current_user)
+):
+    # Only events and opportunities the caller could open through their own role router are returned
+    results = crud.search(
+        db,
+        user=current_user,
+        q=q,
+        kind=kind.value if kind else None,
+        department=department,
+        date_from=date_from,
+        date_to=date_to,
+        skip=page.skip,
+        limit=page.limit,
+        cursor=page.cursor
+    )
+    set_next_cursor(response, results, page.limit, sort_key="rank")
+    return results
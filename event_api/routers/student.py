@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
@@ -6,10 +8,16 @@ from datetime import datetime
 
 from event_api.dependencies import get_db
 from event_api.models import RoleEnum
-from event_api.schemas import UserCreate, UserRead, EventRead, OpportunityRead, EventConfirmationCreate, EventConfirmationRead, NotificationRead
+from event_api.schemas import UserCreate, UserRead, EventRead, EventCalendarRead, CalendarFeedRead, OpportunityRead, EventConfirmationCreate, EventConfirmationRead, NotificationRead, NotificationBulkReadRequest
 from event_api import models
-from event_api.auth import get_current_student_user, get_current_user, get_password_hash
+from event_api.auth import get_current_student_user, get_current_user, get_password_hash, password_hasher
 from event_api import crud
+from event_api.admission import WAITLIST_ENABLED, admission_gate
+from event_api.feeds import FeedKind, feed_token
+from event_api.conditional import listing_not_modified, resource_not_modified
+from event_api.pagination import PageParams, decode_cursor, set_next_cursor
+from event_api.response_cache import cached_response
+from event_api.realtime import notification_event_stream, notification_hub
 
 router = APIRouter(
     prefix="/student",
@@ -21,8 +29,9 @@ router = APIRouter(
 # Dashboard Endpoints (example)
 # Dashboard Endpoints (example)
 @router.get("/dashboard/my_confirmations/", response_model=List[EventConfirmationRead])
-def get_my_confirmations(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    confirmations = db.query(crud.models.EventConfirmation).filter(crud.models.EventConfirmation.student_id == current_user.id).all()
+def get_my_confirmations(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    confirmations = crud.get_event_confirmations_for_student(db, student_id=current_user.id, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
     return confirmations
 
 # Profile Settings Management
@@ -32,23 +41,31 @@ def read_users_me_student(current_user: UserRead = Depends(get_current_student_u
     return current_user
 
 @router.put("/me/", response_model=UserRead)
-def update_users_me_student(user_update: UserCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    db_user = crud.get_user(db, user_id=current_user.id)
+async def update_users_me_student(user_update: UserCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    db_user = await run_in_threadpool(crud.get_user, db, user_id=current_user.id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_password = get_password_hash(user_update.password) if user_update.password else None
-    return crud.update_user(db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
+    hashed_password = await password_hasher.run(get_password_hash, user_update.password) if user_update.password else None
+    return await run_in_threadpool(crud.update_user, db=db, db_user=db_user, user_update=user_update, hashed_password=hashed_password)
 
 # Event Browsing (Read-only)
 # Event Browsing (Read-only)
 @router.get("/events/", response_model=List[EventRead])
-def read_events_student(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    events = db.query(crud.models.Event).filter(crud.models.Event.is_public == True).offset(skip).limit(limit).all()
-    return events
+def read_events_student(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    # Same for every caller: served from the shared response cache until a write invalidates it
+    def build():
+        query = db.query(crud.models.Event).filter(crud.models.Event.is_public == True)
+        unchanged = listing_not_modified(request, response, query, crud.models.Event.updated_at)
+        if unchanged is not None:
+            return unchanged
+        events = page.apply(query, crud.models.Event.created_at, crud.models.Event.id).all()
+        set_next_cursor(response, events, page.limit)
+        return events
+    return cached_response(request, response, "events", "public", List[EventRead], build, also=("event-seats",))
 
 @router.get("/events/{event_id}", response_model=EventRead)
-def read_event_student(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+def read_event_student(event_id: UUID, request: Request, response: Response, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
     event = crud.get_event(db, event_id=event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -59,74 +76,124 @@ def read_event_student(event_id: UUID, db: Session = Depends(get_db), current_us
     if not event.is_public and not is_confirmed:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this event.")
     
+    unchanged = resource_not_modified(request, response, event)
+    if unchanged is not None:
+        return unchanged
     return event
 
-@router.get("/events/calendar_view/", response_model=List[EventRead])
+@router.get("/events/calendar_view/", response_model=List[EventCalendarRead])
 def get_events_for_calendar_student(
     start_time: datetime,
     end_time: datetime,
+    response: Response,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: UserRead = Depends(get_current_student_user)
 ):
-    confirmed_event_ids = db.query(crud.models.EventConfirmation.event_id).filter(
-        crud.models.EventConfirmation.student_id == current_user.id
-    ).subquery()
-    
-    query = db.query(crud.models.Event).filter(
-        crud.models.Event.start_time >= start_time,
-        crud.models.Event.start_time <= end_time,
-        (crud.models.Event.is_public == True) | (crud.models.Event.id.in_(confirmed_event_ids))
+    # Chronological pages with recurring events expanded; the cursor continues from the last start_time
+    events = crud.calendar_entries(
+        db, start_time, end_time, crud.student_visible_events(current_user.id),
+        skip=page.skip, limit=page.limit, cursor=page.cursor
     )
-    events = query.all()
+    set_next_cursor(response, events, page.limit, sort_key="start_time")
     return events
 
+@router.get("/calendar_feed", response_model=CalendarFeedRead)
+def get_calendar_feed_student(request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    # iCalendar subscription with the student's public and confirmed events
+    token = feed_token(FeedKind.STUDENT, crud.get_user(db, user_id=current_user.id))
+    return CalendarFeedRead(url=str(request.url_for("get_calendar_feed", token=token)))
+
+@router.post("/calendar_feed/rotate", response_model=CalendarFeedRead)
+def rotate_calendar_feed_student(request: Request, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    # Revokes every feed URL issued to this student so far
+    crud.rotate_feed_nonce(db, user_id=current_user.id)
+    token = feed_token(FeedKind.STUDENT, crud.get_user(db, user_id=current_user.id))
+    return CalendarFeedRead(url=str(request.url_for("get_calendar_feed", token=token)))
+
 # Opportunity Browsing (Read-only)
 @router.get("/opportunities/", response_model=List[OpportunityRead])
-def read_opportunities_student(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    opportunities = crud.get_opportunities(db, skip=skip, limit=limit)
-    return opportunities
+def read_opportunities_student(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    # Same for every caller: served from the shared response cache until a write invalidates it
+    def build():
+        unchanged = listing_not_modified(request, response, db.query(crud.models.Opportunity), crud.models.Opportunity.updated_at)
+        if unchanged is not None:
+            return unchanged
+        opportunities = crud.get_opportunities(db, skip=page.skip, limit=page.limit, cursor=page.cursor)
+        set_next_cursor(response, opportunities, page.limit)
+        return opportunities
+    return cached_response(request, response, "opportunities", "all", List[OpportunityRead], build)
 
 @router.get("/opportunities/{opportunity_id}", response_model=OpportunityRead)
-def read_opportunity_student(opportunity_id: UUID, db: Session = Depends(get_db)):
+def read_opportunity_student(opportunity_id: UUID, request: Request, response: Response, db: Session = Depends(get_db)):
     opportunity = crud.get_opportunity(db, opportunity_id=opportunity_id)
     if opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
+    unchanged = resource_not_modified(request, response, opportunity)
+    if unchanged is not None:
+        return unchanged
     return opportunity
 
 # Event Confirmation
 @router.post("/event_confirmations/", response_model=EventConfirmationRead)
 def create_event_confirmation_student(confirmation: EventConfirmationCreate, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    # Validate event exists
-    event = crud.get_event(db, event_id=confirmation.event_id)
-    if not event:
+    if confirmation.occurrence_start is not None:
+        return _create_occurrence_confirmation(db, confirmation, current_user)
+    if not WAITLIST_ENABLED and admission_gate.is_full(confirmation.event_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Event is full")
+    # Seat reservation, duplicate check and insert happen atomically in crud.
+    # Past capacity the student is waitlisted (status "pending") when WAITLIST_ENABLED.
+    try:
+        with admission_gate.admit(confirmation.event_id):
+            return crud.create_event_confirmation(db=db, confirmation=confirmation, student_id=current_user.id, waitlist=WAITLIST_ENABLED)
+    except crud.EventNotFoundError:
         raise HTTPException(status_code=404, detail="Event not found")
-
-    # Check if student already confirmed
-    existing_confirmation = crud.get_event_confirmation_by_student_and_event(db, event_id=confirmation.event_id, student_id=current_user.id)
-    if existing_confirmation:
+    except crud.AlreadyConfirmedError:
         raise HTTPException(status_code=400, detail="Student already confirmed for this event")
+    except crud.EventFullError:
+        admission_gate.mark_full(confirmation.event_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Event is full")
 
-    # Set default status if not provided
-    if confirmation.status is None:
-        confirmation.status = crud.models.ConfirmationStatusEnum.CONFIRMED
-        
+def _create_occurrence_confirmation(db: Session, confirmation: EventConfirmationCreate, current_user: UserRead):
+    # Capacity is per occurrence and full occurrences have no waitlist
     try:
-        # Create confirmation
-        db_confirmation = crud.create_event_confirmation(db=db, confirmation=confirmation, student_id=current_user.id)
-        
-        # Increment confirmation count
-        event.confirmation_count += 1
-        db.commit()
-        db.refresh(event)
-        
-        return db_confirmation
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=422, detail=f"Error creating confirmation: {str(e)}")
+        with admission_gate.admit(confirmation.event_id):
+            return crud.create_occurrence_confirmation(db, confirmation=confirmation, student_id=current_user.id)
+    except crud.EventNotFoundError:
+        raise HTTPException(status_code=404, detail="Event not found")
+    except crud.OccurrenceNotFoundError:
+        raise HTTPException(status_code=404, detail="Occurrence not found")
+    except crud.AlreadyConfirmedError:
+        raise HTTPException(status_code=400, detail="Student already confirmed for this occurrence")
+    except crud.EventFullError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Occurrence is full")
+
+@router.put("/event_confirmations/{event_id}/occurrences/{occurrence_start}/cancel", response_model=EventConfirmationRead)
+def cancel_occurrence_confirmation_student(event_id: UUID, occurrence_start: datetime, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    try:
+        return crud.cancel_occurrence_confirmation(db, event_id=event_id, occurrence_start=occurrence_start, student_id=current_user.id)
+    except crud.ConfirmationNotFoundError:
+        raise HTTPException(status_code=404, detail="No active confirmation for this occurrence")
+
+@router.put("/event_confirmations/{event_id}/cancel", response_model=EventConfirmationRead)
+def cancel_event_confirmation_student(event_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    # A freed seat goes to the next student on the waitlist in the same transaction
+    try:
+        with admission_gate.admit(event_id):
+            cancelled, promotion = crud.cancel_event_confirmation(db, event_id=event_id, student_id=current_user.id)
+    except crud.EventNotFoundError:
+        raise HTTPException(status_code=404, detail="Event not found")
+    except crud.ConfirmationNotFoundError:
+        raise HTTPException(status_code=404, detail="No active confirmation for this event")
+    admission_gate.mark_available(event_id)
+    if promotion is not None:
+        notification_hub.publish_notification(promotion)
+    return cancelled
 
 @router.get("/my_event_confirmations/", response_model=List[EventConfirmationRead])
-def get_my_event_confirmations_student(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    confirmations = crud.get_event_confirmations_for_student(db, student_id=current_user.id)
+def get_my_event_confirmations_student(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    confirmations = crud.get_event_confirmations_for_student(db, student_id=current_user.id, skip=page.skip, limit=page.limit, cursor=page.cursor)
+    set_next_cursor(response, confirmations, page.limit, sort_key="confirmed_at")
     return confirmations
 
 @router.get("/event_confirmations/debug/{event_id}")
@@ -152,29 +219,54 @@ def debug_event_confirmation(event_id: UUID, db: Session = Depends(get_db), curr
 # Notification Endpoints
 @router.get("/notifications/", response_model=List[NotificationRead])
 def read_notifications_student(
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    page: PageParams = Depends(),
     unread_only: bool = False,
     notification_type: Optional[models.NotificationTypeEnum] = None, 
     db: Session = Depends(get_db), 
     current_user: UserRead = Depends(get_current_student_user)
 ):
-    query = db.query(models.Notification).filter(models.Notification.recipient_id == current_user.id)
-    
-    if unread_only:
-        query = query.filter(models.Notification.is_read == False)
-    
-    if notification_type:
-        query = query.filter(models.Notification.type == notification_type)
-    
-    notifications = query.order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
+    # Personal notifications and broadcasts addressed to the user, merged in one query
+    notifications = crud.get_notification_feed(
+        db,
+        user=current_user,
+        skip=page.skip,
+        limit=page.limit,
+        unread_only=unread_only,
+        notification_type=notification_type,
+        cursor=page.cursor
+    )
+    set_next_cursor(response, notifications, page.limit)
     return notifications
 
+@router.get("/notifications/unread_count")
+def get_unread_notification_count_student(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    unread_count = crud.count_unread_notifications(db, user=current_user)
+    
+    return {"unread_count": unread_count}
+
+@router.get("/notifications/stream")
+async def stream_notifications_student(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: UserRead = Depends(get_current_student_user)
+):
+    # Live notifications and unread-count changes as server-sent events; resumes from Last-Event-ID
+    after = decode_cursor(last_event_id) if last_event_id else None
+    return StreamingResponse(
+        notification_event_stream(request, current_user, after=after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/notifications/{notification_id}", response_model=NotificationRead)
 def read_notification_student(notification_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
     notification = crud.get_notification(db, notification_id=notification_id)
     if notification is None:
-        raise HTTPException(status_code=404, detail="Notification not found")
+        broadcast = crud.get_broadcast_notification_for_user(db, user=current_user, broadcast_id=notification_id)
+        if broadcast is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return broadcast
     
     if notification.recipient_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this notification")
@@ -185,34 +277,27 @@ def read_notification_student(notification_id: UUID, db: Session = Depends(get_d
 def mark_notification_as_read_student(notification_id: UUID, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
     notification = crud.get_notification(db, notification_id=notification_id)
     if notification is None:
-        raise HTTPException(status_code=404, detail="Notification not found")
+        broadcast = crud.mark_broadcast_notification_as_read(db, user=current_user, broadcast_id=notification_id)
+        if broadcast is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        notification_hub.publish_read_state(current_user.id)
+        return broadcast
     
     if notification.recipient_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to mark this notification as read")
     
-    return crud.update_notification(db, db_notification=notification, is_read=True)
+    notification = crud.update_notification(db, db_notification=notification, is_read=True)
+    notification_hub.publish_read_state(current_user.id)
+    return notification
 
-@router.get("/notifications/unread_count")
-def get_unread_notification_count_student(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    unread_count = db.query(models.Notification).filter(
-        models.Notification.recipient_id == current_user.id,
-        models.Notification.is_read == False
-    ).count()
-    
-    return {"unread_count": unread_count}
-    
 @router.put("/notifications/mark_all_read")
 def mark_all_notifications_as_read_student(db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
-    # Get all unread notifications
-    unread_notifications = db.query(models.Notification).filter(
-        models.Notification.recipient_id == current_user.id,
-        models.Notification.is_read == False
-    ).all()
-    
-    # Mark them as read
-    for notification in unread_notifications:
-        notification.is_read = True
-    
-    db.commit()
-    
-    return {"message": f"Marked {len(unread_notifications)} notifications as read"}
+    marked = crud.mark_all_notifications_as_read(db, user=current_user)
+    notification_hub.publish_read_state(current_user.id)
+    return {"message": f"Marked {marked} notifications as read", "count": marked}
+
+@router.put("/notifications/mark_read")
+def mark_notifications_as_read_student(request: NotificationBulkReadRequest, db: Session = Depends(get_db), current_user: UserRead = Depends(get_current_student_user)):
+    marked = crud.mark_notifications_as_read(db, user=current_user, notification_ids=request.notification_ids)
+    notification_hub.publish_read_state(current_user.id)
+    return {"message": f"Marked {marked} notifications as read", "count": marked}
@@ -1,9 +1,10 @@
 from datetime import datetime
 from typing import Optional, List
 from uuid import UUID
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 from event_api.models import RoleEnum, ConfirmationStatusEnum, NotificationTypeEnum
+from event_api.recurrence import parse_rule
 
 # ---------- User ----------
 class UserBase(BaseModel):
@@ -38,10 +39,22 @@ class EventBase(BaseModel):
 
 class EventCreate(EventBase):
     # creator info is set by server from token
-    pass
+    # RRULE subset, e.g. "FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20250601"; start_time is the first occurrence
+    recurrence_rule: Optional[str] = None
+
+    @field_validator("recurrence_rule")
+    @classmethod
+    def validate_recurrence_rule(cls, value):
+        if value is not None:
+            parse_rule(value)
+        return value
+
+class EventBatchCreate(BaseModel):
+    events: List[EventCreate] = Field(..., min_length=1, max_length=500)
 
 class EventRead(EventBase):
     id: UUID
+    recurrence_rule: Optional[str] = None
     creator_id: Optional[UUID]
     creator_role: RoleEnum
     confirmation_count: int
@@ -51,6 +64,41 @@ class EventRead(EventBase):
     class Config:
         from_attributes = True
 
+class EventCalendarRead(BaseModel):
+    # Compact projection for calendar_view; no description or bookkeeping columns
+    id: UUID
+    title: str
+    start_time: datetime
+    end_time: Optional[datetime]
+    location: Optional[str]
+    department: Optional[str]
+    # Set for occurrences of a recurring event: the occurrence's original start,
+    # used to confirm or override it even after it has been moved
+    occurrence_start: Optional[datetime] = None
+    is_recurring: bool = False
+
+    class Config:
+        from_attributes = True
+
+class EventOccurrenceOverrideUpdate(BaseModel):
+    cancelled: bool = False
+    title: Optional[str] = None
+    location: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+class EventOccurrenceOverrideRead(EventOccurrenceOverrideUpdate):
+    event_id: UUID
+    occurrence_start: datetime
+
+    class Config:
+        from_attributes = True
+
+# ---------- Calendar feed ----------
+class CalendarFeedRead(BaseModel):
+    # Secret subscription URL for calendar apps; anyone holding it can read the feed
+    url: str
+
 # ---------- Opportunity ----------
 class OpportunityBase(BaseModel):
     title: str
@@ -77,10 +125,13 @@ class EventConfirmationBase(BaseModel):
 class EventConfirmationCreate(EventConfirmationBase):
     event_id: UUID
     status: Optional[ConfirmationStatusEnum] = ConfirmationStatusEnum.CONFIRMED
+    # Confirms a single occurrence of a recurring event instead of the series
+    occurrence_start: Optional[datetime] = None
 
 class EventConfirmationRead(EventConfirmationBase):
     id: UUID
     event_id: UUID
+    occurrence_start: Optional[datetime] = None
     student_id: UUID
     status: ConfirmationStatusEnum
     confirmed_at: datetime
@@ -88,6 +139,20 @@ class EventConfirmationRead(EventConfirmationBase):
     class Config:
         from_attributes = True
 
+# Bulk confirmation imports
+class ConfirmationImportError(BaseModel):
+    row: int
+    value: Optional[str] = None
+    error: str
+
+class ConfirmationImportResult(BaseModel):
+    total_rows: int
+    confirmed: int
+    waitlisted: int
+    failed: int
+    # Capped at IMPORT_MAX_ERRORS entries; `failed` has the full count
+    errors: List[ConfirmationImportError]
+
 # ---------- Notification ----------
 class NotificationBase(BaseModel):
     title: str
@@ -108,11 +173,45 @@ class NotificationRead(NotificationBase):
     class Config:
         from_attributes = True
 
+class NotificationBulkReadRequest(BaseModel):
+    notification_ids: List[UUID] = Field(..., max_length=1000)
+
+class BroadcastNotificationCreate(NotificationBase):
+    # None targets every role / department
+    target_role: Optional[RoleEnum] = None
+    target_department: Optional[str] = None
+    related_event_id: Optional[UUID] = None
+    related_opportunity_id: Optional[UUID] = None
+
+class BroadcastNotificationRead(BroadcastNotificationCreate):
+    id: UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# ---------- Search ----------
+class SearchResult(BaseModel):
+    kind: str  # "event" or "opportunity"
+    id: UUID
+    title: str
+    description: Optional[str]
+    department: Optional[str]
+    start_time: Optional[datetime]
+    created_at: datetime
+    rank: float
+
+    class Config:
+        from_attributes = True
+
 # ---------- Authentication ----------
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 class ChangePasswordRequest(BaseModel):
     old_password: str
     new_password: str
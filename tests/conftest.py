@@ -0,0 +1,86 @@
+"""
+Shared fixtures. Tests that need PostgreSQL (row locks, ON CONFLICT,
+EXPLAIN, tsvector) use `pg_engine` and are skipped unless TEST_DATABASE_URL
+points at a scratch PostgreSQL 13+ database; the schema there is dropped and
+recreated for the session.
+"""
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from event_api import crud, models, schemas
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL, pool_size=40, max_overflow=40)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    models.Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(pg_engine):
+    """A sessionmaker on the test database; every table is emptied after the test."""
+    yield sessionmaker(autocommit=False, autoflush=False, bind=pg_engine)
+    tables = ", ".join(table.name for table in models.Base.metadata.sorted_tables)
+    with pg_engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+
+
+@pytest.fixture
+def make_user(session_factory):
+    def make(role=models.RoleEnum.STUDENT, department=None, **values):
+        name = f"{role.value}-{uuid.uuid4().hex[:12]}"
+        with session_factory() as db:
+            user = models.User(
+                username=name,
+                email=f"{name}@example.com",
+                hashed_password="x",
+                role=role,
+                department=department,
+                **values
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            db.expunge(user)
+            return user
+    return make
+
+
+@pytest.fixture
+def make_event():
+    """
+    An EventCreate with every optional field filled in; keyword arguments
+    override them. Given a session and a creator, the event is created in it
+    and returned attached to that session.
+    """
+    def make(db=None, creator=None, notification_body=None, **values):
+        event = schemas.EventCreate(**{
+            "title": "Event",
+            "description": None,
+            "location": None,
+            "department": None,
+            "start_time": datetime(2030, 1, 1, 9, 0),
+            "end_time": None,
+            "capacity": None,
+            "is_public": True,
+            **values,
+        })
+        if db is None:
+            return event
+        return crud.create_event(
+            db, event, creator_id=creator.id, creator_role=creator.role, notification_body=notification_body
+        )
+    return make
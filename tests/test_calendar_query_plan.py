@@ -0,0 +1,69 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, text
+
+from event_api import crud, models
+
+
+def _seed_events(db, student, count=20000, public_share=0.1, confirmed=5):
+    rng = random.Random(13)
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "title": f"Plan event {number}",
+            "start_time": start + timedelta(hours=rng.randrange(5 * 365 * 24)),
+            "is_public": rng.random() < public_share,
+            "department": "Eng",
+            "creator_role": models.RoleEnum.HEAD,
+            "confirmation_count": 0,
+            "created_at": start,
+            "updated_at": start,
+        }
+        for number in range(count)
+    ]
+    db.execute(insert(models.Event), rows)
+    private = [row for row in rows if not row["is_public"]][:confirmed]
+    db.execute(insert(models.EventConfirmation), [
+        {"id": uuid.uuid4(), "event_id": row["id"], "student_id": student.id, "status": models.ConfirmationStatusEnum.CONFIRMED}
+        for row in private
+    ])
+    db.commit()
+    for table in ("events", "event_confirmations"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+    return private
+
+
+def test_student_calendar_uses_the_public_and_confirmation_indexes(pg_engine, session_factory, make_user):
+    student = make_user()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "visible_events" in statement:
+            captured.append((statement, parameters))
+
+    with session_factory() as db:
+        confirmed = _seed_events(db, student)
+        event.listen(pg_engine, "before_cursor_execute", capture)
+        try:
+            entries = crud.calendar_entries(
+                db, datetime(2025, 3, 1), datetime(2025, 3, 31), crud.student_visible_events(student.id), limit=200
+            )
+        finally:
+            event.remove(pg_engine, "before_cursor_execute", capture)
+
+    assert entries
+    assert captured, "the student calendar should combine its branches with UNION"
+    statement, parameters = captured[0]
+    with pg_engine.connect() as connection:
+        plan = "\n".join(row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters))
+    assert "ix_events_public_start" in plan, plan
+    assert "ix_event_confirmations_student" in plan, plan
+    assert "Seq Scan on events" not in plan, plan
+
+    # Confirmed private events in the window are still listed
+    in_window = {row["id"] for row in confirmed if datetime(2025, 3, 1) <= row["start_time"] <= datetime(2025, 3, 31)}
+    assert in_window <= {entry.id for entry in entries}
@@ -0,0 +1,86 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from event_api import crud, models, schemas
+
+CAPACITY = 50
+STUDENTS = 300
+WORKERS = 64
+
+
+def _confirm(session_factory, event_id, student_id, waitlist):
+    with session_factory() as db:
+        try:
+            confirmation = crud.create_event_confirmation(
+                db, schemas.EventConfirmationCreate(event_id=event_id, note=None), student_id=student_id, waitlist=waitlist
+            )
+        except crud.EventFullError:
+            return "full"
+        return confirmation.status.value
+
+
+def _cancel(session_factory, event_id, student_id):
+    with session_factory() as db:
+        try:
+            crud.cancel_event_confirmation(db, event_id=event_id, student_id=student_id)
+        except crud.ConfirmationNotFoundError:
+            return "missing"
+        return "cancelled"
+
+
+def _state(session_factory, event_id):
+    with session_factory() as db:
+        count = db.execute(select(models.Event.confirmation_count).where(models.Event.id == event_id)).scalar()
+        confirmed = db.execute(
+            select(func.count()).select_from(models.EventConfirmation).where(
+                models.EventConfirmation.event_id == event_id,
+                models.EventConfirmation.status == models.ConfirmationStatusEnum.CONFIRMED
+            )
+        ).scalar()
+        return count, confirmed
+
+
+def test_concurrent_confirmations_never_overbook(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        event_id = make_event(db, head, capacity=CAPACITY).id
+    students = [make_user().id for _ in range(STUDENTS)]
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        outcomes = list(pool.map(lambda student_id: _confirm(session_factory, event_id, student_id, False), students))
+
+    assert outcomes.count("confirmed") == CAPACITY
+    assert outcomes.count("full") == STUDENTS - CAPACITY
+    assert _state(session_factory, event_id) == (CAPACITY, CAPACITY)
+
+
+def test_count_does_not_drift_with_concurrent_cancellations_and_waitlist(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        event_id = make_event(db, head, capacity=CAPACITY).id
+    students = [make_user().id for _ in range(STUDENTS)]
+    cancelling = set(random.Random(14).sample(students, STUDENTS // 3))
+
+    def act(student_id):
+        outcome = _confirm(session_factory, event_id, student_id, True)
+        if student_id in cancelling:
+            _cancel(session_factory, event_id, student_id)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(act, students))
+
+    count, confirmed = _state(session_factory, event_id)
+    assert count == confirmed
+    assert confirmed <= CAPACITY
+    with session_factory() as db:
+        waiting = db.execute(
+            select(func.count()).select_from(models.EventConfirmation).where(
+                models.EventConfirmation.event_id == event_id,
+                models.EventConfirmation.status == models.ConfirmationStatusEnum.PENDING
+            )
+        ).scalar()
+    # Cancellations promote the waitlist, so a free seat never coexists with waiting students
+    assert confirmed == CAPACITY or waiting == 0
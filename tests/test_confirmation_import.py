@@ -0,0 +1,38 @@
+import asyncio
+
+from event_api.importing import parse_confirmation_rows
+
+
+class _Upload:
+    """Just enough of a starlette Request: headers and a body streamed in small chunks."""
+
+    def __init__(self, body: bytes, content_type: str = "text/csv"):
+        self.body = body
+        self.headers = {"content-type": content_type}
+
+    async def stream(self):
+        for start in range(0, len(self.body), 7):
+            yield self.body[start:start + 7]
+
+
+def _parse(body: bytes):
+    return asyncio.run(parse_confirmation_rows(_Upload(body)))
+
+
+def test_stray_quote_in_an_unquoted_cell_keeps_the_following_rows():
+    rows = _parse(b'username,note\nalice,ok\nbob,said "hi\ncarol,fine\ndave,x\n')
+    assert [(number, record["username"], record["note"], error) for number, record, error in rows] == [
+        (2, "alice", "ok", None),
+        (3, "bob", 'said "hi', None),
+        (4, "carol", "fine", None),
+        (5, "dave", "x", None),
+    ]
+
+
+def test_quoted_cell_spanning_lines_is_one_row():
+    rows = _parse(b'username,note\nalice,"two\nlines, ""quoted"""\nbob,x\n')
+    assert [(number, record["note"]) for number, record, _ in rows] == [(2, 'two\nlines, "quoted"'), (4, "x")]
+
+
+def test_unterminated_quoted_field_is_reported():
+    assert _parse(b'username,note\nalice,"open\nbob,x\n') == [(2, None, "Unterminated quoted field")]
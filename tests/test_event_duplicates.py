@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from event_api import crud, models
+
+START = datetime(2030, 5, 4, 18, 0)
+FILM_NIGHT = {"title": "Film night", "start_time": START}
+
+
+def test_deleted_event_frees_its_title_and_start(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        crud.delete_event(db, make_event(db, head, **FILM_NIGHT).id)
+        recreated = make_event(db, head, **FILM_NIGHT)
+        crud.delete_event(db, recreated.id)
+        batch = crud.create_events(db, [make_event(**FILM_NIGHT)], creator_id=head.id, creator_role=models.RoleEnum.HEAD)
+    assert [(event.title, event.start_time) for event in batch] == [("Film night", START)]
+
+
+def test_live_duplicate_raises_duplicate_event_error(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        make_event(db, head, **FILM_NIGHT)
+        with pytest.raises(crud.DuplicateEventError) as raised:
+            make_event(db, head, **FILM_NIGHT)
+        assert raised.value.duplicates == [("Film night", START)]
+
+        other = make_event(db, head, title="Film night", start_time=START + timedelta(days=7))
+        with pytest.raises(crud.DuplicateEventError):
+            crud.update_event(db, other, make_event(**FILM_NIGHT))
@@ -0,0 +1,32 @@
+import base64
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from event_api import feeds
+
+
+def _signed(raw: str) -> str:
+    payload = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+    return f"{payload}.{feeds._signature(payload)}"
+
+
+def test_token_names_the_user_and_nonce():
+    user = SimpleNamespace(id=uuid.uuid4(), feed_nonce=3)
+    token = feeds.feed_token(feeds.FeedKind.DEPARTMENT, user)
+    assert feeds.read_feed_token(token) == (feeds.FeedKind.DEPARTMENT, user.id, 3)
+
+
+def test_tampered_and_department_only_tokens_are_rejected():
+    token = feeds.feed_token(feeds.FeedKind.STUDENT, SimpleNamespace(id=uuid.uuid4(), feed_nonce=0))
+    for bad in (token[:-2] + "xx", _signed("department:Engineering")):
+        with pytest.raises(HTTPException) as error:
+            feeds.read_feed_token(bad)
+        assert error.value.status_code == 404
+
+
+def test_student_tokens_without_a_nonce_read_as_nonce_zero():
+    student_id = uuid.uuid4()
+    assert feeds.read_feed_token(_signed(f"student:{student_id}")) == (feeds.FeedKind.STUDENT, student_id, 0)
@@ -0,0 +1,92 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from event_api import crud, models, schemas
+
+WORKERS = 8
+OPERATIONS_PER_WORKER = 150
+
+
+def _notify(db, student):
+    return crud.create_notification(db, schemas.NotificationCreate(
+        title="Counter test",
+        body=None,
+        type=models.NotificationTypeEnum.SYSTEM,
+        recipient_id=student.id,
+        related_event_id=None,
+        related_opportunity_id=None
+    ))
+
+
+def _random_notification(db, student):
+    return db.execute(
+        select(models.Notification).where(models.Notification.recipient_id == student.id).order_by(func.random()).limit(1)
+    ).scalar()
+
+
+def _operate(db, student, rng):
+    operation = rng.choice(("insert", "toggle", "mark_ids", "mark_all", "delete"))
+    if operation == "insert":
+        _notify(db, student)
+        return
+    if operation == "mark_all":
+        crud.mark_all_notifications_as_read(db, student)
+        return
+    notification = _random_notification(db, student)
+    if notification is None:
+        return
+    if operation == "toggle":
+        crud.update_notification(db, notification, is_read=rng.random() < 0.5)
+    elif operation == "mark_ids":
+        crud.mark_notifications_as_read(db, student, [notification.id])
+    else:
+        crud.delete_notification(db, notification.id)
+
+
+def _worker(session_factory, students, seed):
+    rng = random.Random(seed)
+    with session_factory() as db:
+        for _ in range(OPERATIONS_PER_WORKER):
+            try:
+                _operate(db, rng.choice(students), rng)
+            except OperationalError as error:
+                # A deadlock victim is rolled back whole, counter change included; clients retry
+                if getattr(error.orig, "pgcode", None) != "40P01":
+                    raise
+                db.rollback()
+
+
+def _counters(db, students):
+    return {student.id: crud.get_unread_counter(db, user_id=student.id) for student in students}
+
+
+def _true_unread(db, students):
+    rows = db.execute(
+        select(models.Notification.recipient_id, func.count())
+        .where(models.Notification.is_read == False)
+        .group_by(models.Notification.recipient_id)
+    ).all()
+    unread = dict(rows)
+    return {student.id: unread.get(student.id, 0) for student in students}
+
+
+def test_unread_counters_stay_exact_under_concurrent_writes(session_factory, make_user):
+    # Few recipients, many writers: every operation contends on the same counter rows
+    students = [schemas.UserRead.model_validate(make_user()) for _ in range(3)]
+    with session_factory() as db:
+        for student in students:
+            for _ in range(20):
+                _notify(db, student)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for future in [pool.submit(_worker, session_factory, students, seed) for seed in range(WORKERS)]:
+            future.result()
+
+    with session_factory() as db:
+        maintained = _counters(db, students)
+        assert maintained == _true_unread(db, students)
+        crud.rebuild_notification_counters(db)
+        assert _counters(db, students) == maintained
@@ -0,0 +1,50 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from event_api import models, realtime
+
+
+class _Client:
+    """Just enough of a starlette Request for the stream: it never disconnects."""
+
+    async def is_disconnected(self):
+        return False
+
+
+def _notify(session_factory, user, title, created_at):
+    with session_factory() as db:
+        db.add(models.Notification(recipient_id=user.id, title=title, created_at=created_at))
+        db.commit()
+
+
+async def _next_title(stream):
+    async def read():
+        while True:
+            chunk = await stream.__anext__()
+            if chunk.startswith("id: "):
+                return json.loads(chunk.split("data: ", 1)[1])["title"]
+    # Heartbeats keep coming, so the deadline covers the whole wait
+    return await asyncio.wait_for(read(), timeout=5)
+
+
+def test_entry_committed_after_a_newer_one_is_still_streamed(session_factory, make_user, monkeypatch):
+    monkeypatch.setattr(realtime, "SessionLocal", session_factory)
+    monkeypatch.setattr(realtime, "SSE_HEARTBEAT_SECONDS", 0.05)
+    user = make_user()
+    now = datetime.utcnow()
+
+    async def run():
+        stream = realtime.notification_event_stream(_Client(), user)
+        await stream.__anext__()  # initial unread_count
+        _notify(session_factory, user, "later", now)
+        first = await _next_title(stream)
+        # Flushed before "later" but committed after it had been streamed
+        _notify(session_factory, user, "earlier", now - timedelta(seconds=1))
+        second = await _next_title(stream)
+        _notify(session_factory, user, "latest", now + timedelta(seconds=1))
+        third = await _next_title(stream)
+        await stream.aclose()
+        return [first, second, third]
+
+    assert asyncio.run(run()) == ["later", "earlier", "latest"]
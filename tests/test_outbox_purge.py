@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from event_api import crud, models, outbox, retention
+
+START = datetime(2030, 3, 1, 9, 0)
+
+
+def _outbox(db):
+    return db.execute(
+        select(models.NotificationOutbox.event_id, models.NotificationOutbox.event_count)
+    ).all()
+
+
+def test_purging_the_first_event_keeps_the_batch_announcement(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        created = crud.create_events(
+            db,
+            [make_event(title=f"Open day {n}", start_time=START + timedelta(hours=n)) for n in range(3)],
+            creator_id=head.id,
+            creator_role=models.RoleEnum.HEAD,
+            notification_body="Three open days",
+        )
+        event_ids = [event.id for event in created]
+        (announced, _), = _outbox(db)
+        crud.delete_event(db, announced)
+        retention.purge_deleted_event(db, announced)
+
+        assert _outbox(db) == [(None, 3)]
+        remaining = [event_id for event_id in event_ids if event_id != announced]
+        assert len(remaining) == 2
+        assert all(crud.get_event(db, event_id) is not None for event_id in remaining)
+
+
+def test_purging_an_event_drops_its_own_announcement(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        single = crud.create_events(
+            db, [make_event(title="Careers fair")], creator_id=head.id, creator_role=models.RoleEnum.HEAD, notification_body="Fair"
+        )[0]
+        crud.delete_event(db, single.id)
+        retention.purge_deleted_event(db, single.id)
+
+        assert _outbox(db) == []
+
+
+def test_deleted_event_is_not_announced_before_its_purge(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD)
+    with session_factory() as db:
+        event = make_event(db, head, notification_body="Talk", title="Cancelled talk")
+        crud.delete_event(db, event.id)
+        assert outbox.process_outbox_batch(db) == 1
+
+        statuses = db.execute(select(models.NotificationOutbox.status)).scalars().all()
+        assert statuses == [models.OutboxStatusEnum.DONE]
+        assert db.execute(select(models.BroadcastNotification.id)).first() is None
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from event_api import crud, models, recurrence, schemas
+
+EVERY_TUESDAY = "FREQ=WEEKLY;BYDAY=TU;COUNT=10"
+FIRST = datetime(2030, 1, 1, 9, 0)  # a Tuesday, naive UTC as stored
+
+
+def test_aware_times_become_naive_utc():
+    assert recurrence.to_naive_utc(datetime(2030, 1, 1, 11, 0, tzinfo=timezone(timedelta(hours=2)))) == FIRST
+    assert recurrence.to_naive_utc(datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)) == FIRST
+    assert recurrence.to_naive_utc(FIRST) is FIRST
+    assert recurrence.to_naive_utc(None) is None
+
+
+def test_aware_occurrence_matches_naive_series():
+    rule = recurrence.parse_rule(EVERY_TUESDAY)
+    aware = datetime(2030, 1, 8, 9, 0, tzinfo=timezone.utc)
+    assert recurrence.is_occurrence(rule, FIRST, recurrence.to_naive_utc(aware))
+
+
+def test_calendar_and_occurrence_confirmations_accept_aware_times(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD, department="Eng")
+    student = make_user()
+    with session_factory() as db:
+        series = make_event(
+            db, head, department="Eng", start_time=FIRST.replace(tzinfo=timezone.utc), recurrence_rule=EVERY_TUESDAY
+        )
+        assert series.start_time == FIRST
+
+        window_start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        entries = crud.calendar_entries(
+            db, window_start, window_start + timedelta(days=21), crud.student_visible_events(student.id)
+        )
+        assert [entry.start_time for entry in entries] == [FIRST + timedelta(weeks=week) for week in range(3)]
+
+        second = datetime(2030, 1, 8, 10, 0, tzinfo=timezone(timedelta(hours=1)))
+        crud.set_occurrence_override(db, series, second, schemas.EventOccurrenceOverrideUpdate(title="Moved lab"))
+        confirmation = crud.create_occurrence_confirmation(
+            db, schemas.EventConfirmationCreate(event_id=series.id, note=None, occurrence_start=second), student_id=student.id
+        )
+        assert confirmation.occurrence_start == FIRST + timedelta(weeks=1)
+        cancelled = crud.cancel_occurrence_confirmation(db, event_id=series.id, occurrence_start=second, student_id=student.id)
+        assert cancelled.status == models.ConfirmationStatusEnum.CANCELLED
@@ -0,0 +1,56 @@
+from typing import List
+
+import pytest
+from fastapi import Request, Response
+
+from event_api import response_cache
+
+
+def test_memory_backend_invalidates_by_generation():
+    backend = response_cache.MemoryBackend(max_bytes=1024)
+    old_key = f"events:{backend.generation('events')}:/student/events/?:public"
+    backend.set(old_key, ("{}", b"[]"))
+    backend.invalidate("events")
+    new_key = f"events:{backend.generation('events')}:/student/events/?:public"
+    assert new_key != old_key
+    assert backend.get(new_key) is None
+    # The orphaned entry is left for the LRU to evict
+    assert backend.stats()["entries"] == 1
+
+
+def test_memory_backend_evicts_orphans_within_max_bytes():
+    backend = response_cache.MemoryBackend(max_bytes=10)
+    for generation in range(5):
+        backend.set(f"events:{generation}:/x?:all", ("{}", b"12345"))
+    assert backend.stats()["bytes"] <= 10
+
+
+def test_memory_backend_is_refused_with_several_workers(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        response_cache._create_backend()
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert isinstance(response_cache._create_backend(), response_cache.MemoryBackend)
+
+
+
+def test_seat_changes_invalidate_listings_through_their_own_namespace(monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", response_cache.MemoryBackend(max_bytes=1024))
+    request = Request({"type": "http", "method": "GET", "path": "/student/events/", "query_string": b"", "headers": []})
+    builds = []
+
+    def listing():
+        def build():
+            builds.append(1)
+            return [{"confirmation_count": len(builds)}]
+        return response_cache.cached_response(
+            request, Response(), "events", "public", List[dict], build, also=("event-seats",)
+        ).body
+
+    assert listing() == listing() == b'[{"confirmation_count":1}]'
+    response_cache.invalidate_responses("event-seats")
+    assert listing() == b'[{"confirmation_count":2}]'
+    response_cache.invalidate_responses("opportunities")
+    assert listing() == b'[{"confirmation_count":2}]'
+    assert len(builds) == 2
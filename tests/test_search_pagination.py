@@ -0,0 +1,49 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from event_api import crud, models
+from event_api.pagination import decode_cursor, encode_cursor
+
+
+def _seed_events(db, count):
+    start = datetime(2030, 1, 1)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            # Identical documents rank identically; a few repeat the term to rank higher
+            "title": "Robotics workshop robotics" if number % 10 == 0 else "Robotics workshop",
+            "description": "Hands-on session",
+            "start_time": start + timedelta(hours=number),
+            "is_public": True,
+            "creator_role": models.RoleEnum.HEAD,
+            "confirmation_count": 0,
+            "created_at": start,
+            "updated_at": start,
+        }
+        for number in range(count)
+    ]
+    db.execute(insert(models.Event), rows)
+    db.commit()
+    return {row["id"] for row in rows}
+
+
+def test_rank_cursor_pages_through_tied_ranks(session_factory, make_user):
+    student = make_user()
+    with session_factory() as db:
+        expected = _seed_events(db, 57)
+        seen, ranks, cursor = [], [], None
+        while True:
+            page = crud.search(db, user=student, q="robotics", kind="event", limit=10, cursor=cursor)
+            seen += [row.id for row in page]
+            ranks += [row.rank for row in page]
+            if len(page) < 10:
+                break
+            # Round-trip through the X-Next-Cursor encoding, as a client would
+            cursor = decode_cursor(encode_cursor(page[-1].rank, page[-1].id))
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == expected
+    assert ranks == sorted(ranks, reverse=True)
+    assert len(set(ranks)) == 2
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from event_api import crud, models, recurrence, schemas
+
+FIRST = datetime(2030, 1, 1, 9, 0)  # a Tuesday, the make_event default start
+LAB = {"title": "Tuesday lab", "department": "Eng"}
+
+
+def test_endless_series_stops_at_the_horizon(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD, department="Eng")
+    student = make_user()
+    horizon = FIRST + timedelta(days=recurrence.RECURRENCE_HORIZON_DAYS)
+    with session_factory() as db:
+        series = make_event(db, head, **LAB, recurrence_rule="FREQ=WEEKLY;BYDAY=TU")
+        assert series.recurrence.until == horizon
+        visible = crud.student_visible_events(student.id)
+        before = crud.calendar_entries(db, horizon - timedelta(days=14), horizon, visible)
+        after = crud.calendar_entries(db, horizon + timedelta(days=1), horizon + timedelta(days=60), visible)
+    assert len(before) == 2
+    assert after == []
+
+
+def test_series_with_dependents_keeps_its_start_and_rule(session_factory, make_user, make_event):
+    head = make_user(role=models.RoleEnum.HEAD, department="Eng")
+    student = make_user()
+    with session_factory() as db:
+        series = make_event(db, head, **LAB, recurrence_rule="FREQ=WEEKLY;BYDAY=TU")
+        second = FIRST + timedelta(weeks=1)
+        crud.create_occurrence_confirmation(
+            db, schemas.EventConfirmationCreate(event_id=series.id, note=None, occurrence_start=second), student_id=student.id
+        )
+        with pytest.raises(crud.SeriesHasDependentsError):
+            crud.update_event(db, series, make_event(**LAB, start_time=FIRST + timedelta(hours=1)))
+        with pytest.raises(crud.SeriesHasDependentsError):
+            crud.update_event(db, series, make_event(**LAB, recurrence_rule="FREQ=DAILY"))
+
+        renamed, _ = crud.update_event(db, series, make_event(department="Eng", title="Renamed lab"))
+        assert renamed.title == "Renamed lab"
+
+        crud.cancel_occurrence_confirmation(db, event_id=series.id, occurrence_start=second, student_id=student.id)
+        moved, _ = crud.update_event(db, series, make_event(department="Eng", title="Renamed lab", start_time=FIRST + timedelta(hours=1)))
+        assert moved.start_time == FIRST + timedelta(hours=1)